@@ -15,10 +15,19 @@ from enum import Enum
 import math
 import time
 import hashlib
+from collections import deque
+
+from liquidity_stableswap import StableSwapInvariant
+from liquidity_swap_router import RouteQuote, SwapRouter
 
 # Set high precision for financial calculations
 getcontext().prec = 28
 
+STABLE_SWAP_AMPLIFICATION = 100  # Default A for stable pools
+ANALYTICS_WINDOW_SECONDS = 24 * 3600
+ANALYTICS_BUCKET_SECONDS = 3600
+SWAP_HISTORY_MAX = 10000  # Swaps kept in memory; all of them are in the swap_transactions table
+
 class PoolType(Enum):
     """Types of liquidity pools"""
     CONSTANT_PRODUCT = "constant_product"  # x * y = k (Uniswap style)
@@ -80,6 +89,92 @@ class SwapTransaction:
     timestamp: datetime
     slippage: Decimal
 
+class SwapWindowBucket:
+    """Swap totals and price-return statistics for one time bucket"""
+    __slots__ = ('index', 'volume', 'fees', 'count', 'returns', 'return_mean', 'return_m2')
+    
+    def __init__(self, index: int):
+        self.index = index
+        self.volume = Decimal('0')
+        self.fees = Decimal('0')
+        self.count = 0
+        self.returns = 0
+        self.return_mean = 0.0
+        self.return_m2 = 0.0
+
+class PoolSwapWindow:
+    """
+    Rolling per-pool swap analytics, updated once per swap.
+    
+    Volume, fees and swap count are kept per time bucket with running
+    totals, and whole buckets drop out as they leave the window, so the
+    window is accurate to one bucket. Price returns feed a Welford mean and
+    variance; an expiring bucket's share is removed by reversing the
+    parallel-variance merge.
+    """
+    
+    def __init__(self, window_seconds: int = ANALYTICS_WINDOW_SECONDS,
+                 bucket_seconds: int = ANALYTICS_BUCKET_SECONDS):
+        self.bucket_seconds = bucket_seconds
+        self.span = max(1, window_seconds // bucket_seconds)
+        self.buckets = deque()
+        self.total = SwapWindowBucket(0)
+        self.last_price = None
+    
+    def record(self, timestamp: datetime, volume: Decimal, fees: Decimal, price: Optional[float]):
+        index = int(timestamp.timestamp() // self.bucket_seconds)
+        self._expire(index)
+        if not self.buckets or self.buckets[-1].index != index:
+            self.buckets.append(SwapWindowBucket(index))
+        bucket = self.buckets[-1]
+        
+        for stats in (bucket, self.total):
+            stats.volume += volume
+            stats.fees += fees
+            stats.count += 1
+        
+        if price and self.last_price:
+            price_return = price / self.last_price - 1
+            for stats in (bucket, self.total):
+                stats.returns += 1
+                delta = price_return - stats.return_mean
+                stats.return_mean += delta / stats.returns
+                stats.return_m2 += delta * (price_return - stats.return_mean)
+        if price:
+            self.last_price = price
+    
+    def _expire(self, index: int):
+        while self.buckets and self.buckets[0].index <= index - self.span:
+            self._remove(self.buckets.popleft())
+    
+    def _remove(self, bucket: SwapWindowBucket):
+        total = self.total
+        total.volume -= bucket.volume
+        total.fees -= bucket.fees
+        total.count -= bucket.count
+        
+        remaining = total.returns - bucket.returns
+        if remaining <= 0:
+            total.returns, total.return_mean, total.return_m2 = 0, 0.0, 0.0
+            return
+        if bucket.returns:
+            mean = (total.returns * total.return_mean - bucket.returns * bucket.return_mean) / remaining
+            delta = bucket.return_mean - mean
+            total.return_m2 = max(0.0, total.return_m2 - bucket.return_m2
+                                  - delta * delta * remaining * bucket.returns / total.returns)
+            total.return_mean = mean
+            total.returns = remaining
+    
+    def snapshot(self, now: Optional[datetime] = None) -> SwapWindowBucket:
+        """Totals over the window ending now"""
+        self._expire(int((now or datetime.now()).timestamp() // self.bucket_seconds))
+        return self.total
+    
+    def volatility(self, now: Optional[datetime] = None) -> float:
+        """Population standard deviation of price returns over the window"""
+        total = self.snapshot(now)
+        return math.sqrt(total.return_m2 / total.returns) if total.returns > 1 else 0.0
+
 class AdvancedLiquidityPoolFramework:
     """Comprehensive liquidity pool management system"""
     
@@ -87,7 +182,10 @@ class AdvancedLiquidityPoolFramework:
         self.pools = {}
         self.tokens = {}
         self.positions = {}
-        self.swap_history = []
+        self.pool_positions = {}  # pool_id -> {position_id: LiquidityPosition}
+        self.swap_history = deque(maxlen=SWAP_HISTORY_MAX)
+        self.swap_windows = {}  # pool_id -> PoolSwapWindow
+        self.total_swaps = 0
         
         # Protocol configuration
         self.protocol_config = {
@@ -114,6 +212,9 @@ class AdvancedLiquidityPoolFramework:
         self.reward_programs = {}
         self.yield_strategies = {}
         
+        # Multi-hop quotes over every pool
+        self.router = SwapRouter(self)
+        
         # Risk management
         self.risk_parameters = {
             'max_pool_concentration': Decimal('0.30'),  # 30% max single asset
@@ -236,11 +337,14 @@ class AdvancedLiquidityPoolFramework:
     
     def create_liquidity_pool(self, pool_id: str, name: str, pool_type: PoolType,
                              tokens: List[str], initial_reserves: Dict[str, Decimal],
-                             swap_fee: Optional[Decimal] = None) -> str:
-        """Create new liquidity pool"""
+                             swap_fee: Optional[Decimal] = None,
+                             amplification: Optional[int] = None) -> str:
+        """Create new liquidity pool; amplification only applies to stable pools"""
         
         if swap_fee is None:
             swap_fee = self.protocol_config['default_swap_fee']
+        if amplification is None:
+            amplification = STABLE_SWAP_AMPLIFICATION
         
         # Validate tokens exist
         for token_addr in tokens:
@@ -268,10 +372,15 @@ class AdvancedLiquidityPoolFramework:
             'created_timestamp': datetime.now(),
             'last_updated': datetime.now(),
             'price_impact_cache': {},
-            'k_value': self._calculate_k_value(initial_reserves, pool_type)
+            'k_value': self._calculate_k_value(initial_reserves, pool_type),
+            'amplification': amplification,
+            'stableswap': StableSwapInvariant(tokens, amplification) if pool_type == PoolType.STABLE_SWAP else None
         }
         
         self.pools[pool_id] = pool_data
+        self.pool_positions[pool_id] = {}
+        self.swap_windows[pool_id] = PoolSwapWindow()
+        self.router.invalidate()
         
         # Store in database
         conn = sqlite3.connect(self.database_path)
@@ -355,6 +464,7 @@ class AdvancedLiquidityPoolFramework:
         )
         
         self.positions[position_id] = position
+        self.pool_positions[pool_id][position_id] = position
         
         # Store in database
         self._update_pool_database(pool_id)
@@ -413,6 +523,7 @@ class AdvancedLiquidityPoolFramework:
         # Remove position if fully withdrawn
         if position.lp_token_amount == 0:
             del self.positions[position_id]
+            del self.pool_positions[position.pool_id][position_id]
         
         # Update databases
         self._update_pool_database(position.pool_id)
@@ -449,7 +560,7 @@ class AdvancedLiquidityPoolFramework:
         amount_out = self._calculate_swap_output(pool, token_in, token_out, amount_in)
         
         # Calculate price impact
-        price_impact = self._calculate_price_impact(pool, token_in, token_out, amount_in)
+        price_impact = self._calculate_price_impact(pool, token_in, token_out, amount_in, amount_out)
         
         # Check price impact limits
         if price_impact > self.protocol_config['max_price_impact']:
@@ -470,8 +581,16 @@ class AdvancedLiquidityPoolFramework:
         
         # Update pool metrics
         trade_value = amount_in * self.tokens[token_in].price_usd
-        pool['volume_24h'] += trade_value
-        pool['fees_collected'] += swap_fee_amount * self.tokens[token_in].price_usd
+        fee_value = swap_fee_amount * self.tokens[token_in].price_usd
+        # Price of the pool's first token in the second, whichever way the swap went
+        if token_in == pool['tokens'][0]:
+            price = float(amount_out / amount_in) if amount_in > 0 else None
+        else:
+            price = float(amount_in / amount_out) if amount_out > 0 else None
+        window = self.swap_windows[pool_id]
+        window.record(datetime.now(), trade_value, fee_value, price)
+        pool['volume_24h'] = window.total.volume
+        pool['fees_collected'] += fee_value
         pool['last_updated'] = datetime.now()
         
         # Create swap transaction record
@@ -494,6 +613,12 @@ class AdvancedLiquidityPoolFramework:
         )
         
         self.swap_history.append(swap_tx)
+        self.total_swaps += 1
+        
+        # Older swaps live only in the swap_transactions table
+        horizon = swap_tx.timestamp - timedelta(seconds=ANALYTICS_WINDOW_SECONDS)
+        while self.swap_history[0].timestamp < horizon:
+            self.swap_history.popleft()
         
         # Distribute fees to LP holders
         self._distribute_trading_fees(pool_id, swap_fee_amount * self.tokens[token_in].price_usd)
@@ -568,22 +693,16 @@ class AdvancedLiquidityPoolFramework:
     
     def _calculate_stable_swap_output(self, pool: Dict, token_in: str, token_out: str, amount_in: Decimal) -> Decimal:
         """StableSwap calculation for correlated assets"""
-        # Simplified StableSwap calculation
-        # In practice, this would use the full StableSwap invariant
-        A = Decimal('100')  # Amplification parameter
-        
-        reserve_in = pool['reserves'][token_in]
-        reserve_out = pool['reserves'][token_out]
         
         # Apply swap fee
         amount_in_with_fee = amount_in * (Decimal('1') - pool['swap_fee'])
         
-        # Simplified calculation (full StableSwap is more complex)
-        fee_adjusted_ratio = amount_in_with_fee / (reserve_in + amount_in_with_fee)
-        return reserve_out * fee_adjusted_ratio * (Decimal('1') - fee_adjusted_ratio / A)
+        # Solve the invariant; D is reused while reserves are unchanged
+        return pool['stableswap'].output(pool['reserves'], token_in, token_out, amount_in_with_fee)
     
-    def _calculate_price_impact(self, pool: Dict, token_in: str, token_out: str, amount_in: Decimal) -> Decimal:
-        """Calculate price impact of swap"""
+    def _calculate_price_impact(self, pool: Dict, token_in: str, token_out: str, amount_in: Decimal,
+                                amount_out: Optional[Decimal] = None) -> Decimal:
+        """Calculate price impact of swap; pass amount_out when it is already known"""
         
         reserve_in = pool['reserves'][token_in]
         reserve_out = pool['reserves'][token_out]
@@ -592,7 +711,8 @@ class AdvancedLiquidityPoolFramework:
         current_price = reserve_out / reserve_in
         
         # Price after swap
-        amount_out = self._calculate_swap_output(pool, token_in, token_out, amount_in)
+        if amount_out is None:
+            amount_out = self._calculate_swap_output(pool, token_in, token_out, amount_in)
         new_reserve_in = reserve_in + amount_in
         new_reserve_out = reserve_out - amount_out
         new_price = new_reserve_out / new_reserve_in
@@ -600,6 +720,49 @@ class AdvancedLiquidityPoolFramework:
         # Price impact as percentage
         return abs(new_price - current_price) / current_price
     
+    def quote_swap(self, token_in: str, token_out: str, amount_in: Decimal,
+                   allow_split: bool = True) -> RouteQuote:
+        """Quote the best direct, multi-hop or split route without executing it"""
+        
+        for token_addr in (token_in, token_out):
+            if token_addr not in self.tokens:
+                raise ValueError(f"Token {token_addr} not registered")
+        
+        return self.router.quote(token_in, token_out, amount_in, allow_split)
+    
+    def execute_route(self, quote: RouteQuote, user_address: str,
+                      min_amount_out: Optional[Decimal] = None) -> List[SwapTransaction]:
+        """Execute a quoted route hop by hop; every check runs before any pool is touched"""
+        
+        # Re-price against current reserves so a stale quote cannot slip through
+        total_out = Decimal('0')
+        for leg in quote.legs:
+            amount = leg.amount_in
+            for hop, pool_id in enumerate(leg.pools):
+                pool = self.pools[pool_id]
+                if pool['status'] != PoolStatus.ACTIVE:
+                    raise ValueError(f"Pool {pool_id} is not active")
+                amount_out = self._calculate_swap_output(pool, leg.tokens[hop], leg.tokens[hop + 1], amount)
+                price_impact = self._calculate_price_impact(pool, leg.tokens[hop], leg.tokens[hop + 1], amount, amount_out)
+                if price_impact > self.protocol_config['max_price_impact']:
+                    raise ValueError(f"Price impact too high in {pool_id}: {price_impact:.2%}")
+                amount = amount_out
+            total_out += amount
+        
+        if min_amount_out and total_out < min_amount_out:
+            slippage = (min_amount_out - total_out) / min_amount_out
+            raise ValueError(f"Slippage too high: {slippage:.2%}")
+        
+        swaps = []
+        for leg in quote.legs:
+            amount = leg.amount_in
+            for hop, pool_id in enumerate(leg.pools):
+                swap_tx = self.execute_swap(pool_id, user_address, leg.tokens[hop], leg.tokens[hop + 1], amount)
+                swaps.append(swap_tx)
+                amount = swap_tx.amount_out
+        
+        return swaps
+    
     def _calculate_impermanent_loss(self, position: LiquidityPosition) -> Decimal:
         """Calculate impermanent loss for a position"""
         
@@ -637,14 +800,13 @@ class AdvancedLiquidityPoolFramework:
         
         pool = self.pools[pool_id]
         
-        # Find all positions in this pool
-        pool_positions = [pos for pos in self.positions.values() if pos.pool_id == pool_id]
+        pool_positions = self.pool_positions.get(pool_id)
         
         if not pool_positions:
             return
         
         # Distribute fees proportionally
-        for position in pool_positions:
+        for position in pool_positions.values():
             lp_share = position.lp_token_amount / pool['lp_token_supply']
             fee_share = fee_amount_usd * lp_share
             
@@ -678,20 +840,15 @@ class AdvancedLiquidityPoolFramework:
             raise ValueError(f"Pool {pool_id} not found")
         
         pool = self.pools[pool_id]
+        window = self.swap_windows[pool_id]
+        recent = window.snapshot()
+        pool['volume_24h'] = recent.volume
         
         # Calculate APY based on fees
-        daily_volume = pool['volume_24h']
-        daily_fees = daily_volume * pool['swap_fee']
+        daily_fees = recent.fees
         annual_fees = daily_fees * 365
         apy = (annual_fees / pool['total_liquidity']) * 100 if pool['total_liquidity'] > 0 else 0
         
-        # Get recent swaps for volatility calculation
-        recent_swaps = [tx for tx in self.swap_history 
-                       if tx.pool_id == pool_id and 
-                       tx.timestamp > datetime.now() - timedelta(days=1)]
-        
-        volatility = self._calculate_volatility(recent_swaps)
-        
         analytics = {
             'pool_id': pool_id,
             'name': pool['name'],
@@ -703,9 +860,9 @@ class AdvancedLiquidityPoolFramework:
             'apy': float(apy),
             'lp_token_supply': float(pool['lp_token_supply']),
             'swap_fee': float(pool['swap_fee'] * 100),  # As percentage
-            'liquidity_providers': len([p for p in self.positions.values() if p.pool_id == pool_id]),
-            'total_swaps': len(recent_swaps),
-            'volatility': float(volatility),
+            'liquidity_providers': len(self.pool_positions[pool_id]),
+            'total_swaps': recent.count,
+            'volatility': window.volatility(),
             'reserves': {addr: float(amount) for addr, amount in pool['reserves'].items()},
             'token_symbols': [self.tokens[addr].symbol for addr in pool['tokens']],
             'last_updated': pool['last_updated'].isoformat()
@@ -713,33 +870,6 @@ class AdvancedLiquidityPoolFramework:
         
         return analytics
     
-    def _calculate_volatility(self, transactions: List[SwapTransaction]) -> Decimal:
-        """Calculate price volatility from transaction history"""
-        
-        if len(transactions) < 2:
-            return Decimal('0')
-        
-        price_changes = []
-        for i in range(1, len(transactions)):
-            prev_tx = transactions[i-1]
-            curr_tx = transactions[i]
-            
-            # Calculate price change
-            prev_price = prev_tx.amount_out / prev_tx.amount_in
-            curr_price = curr_tx.amount_out / curr_tx.amount_in
-            
-            price_change = abs(curr_price - prev_price) / prev_price
-            price_changes.append(price_change)
-        
-        if not price_changes:
-            return Decimal('0')
-        
-        # Standard deviation of price changes
-        mean_change = sum(price_changes) / len(price_changes)
-        variance = sum((change - mean_change) ** 2 for change in price_changes) / len(price_changes)
-        
-        return variance ** Decimal('0.5')
-    
     def _update_pool_database(self, pool_id: str):
         """Update pool data in database"""
         
@@ -837,7 +967,7 @@ class AdvancedLiquidityPoolFramework:
         """Get comprehensive framework status"""
         
         total_tvl = sum(float(pool['total_liquidity']) for pool in self.pools.values())
-        total_volume = sum(float(pool['volume_24h']) for pool in self.pools.values())
+        total_volume = sum(float(window.snapshot().volume) for window in self.swap_windows.values())
         total_fees = sum(float(pool['fees_collected']) for pool in self.pools.values())
         
         return {
@@ -846,9 +976,10 @@ class AdvancedLiquidityPoolFramework:
             'total_volume_24h': total_volume,
             'total_fees_collected': total_fees,
             'total_positions': len(self.positions),
-            'total_swaps': len(self.swap_history),
+            'total_swaps': self.total_swaps,
             'registered_tokens': len(self.tokens),
             'active_pools': len([p for p in self.pools.values() if p['status'] == PoolStatus.ACTIVE]),
+            'router': self.router.get_status(),
             'protocol_config': {k: float(v) if isinstance(v, Decimal) else v 
                               for k, v in self.protocol_config.items()},
             'timestamp': datetime.now().isoformat()
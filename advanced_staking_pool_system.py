@@ -20,6 +20,8 @@ import random
 # Set high precision for financial calculations
 getcontext().prec = 28
 
+SECONDS_PER_YEAR = Decimal('365') * Decimal('24') * Decimal('3600')
+
 class StakingType(Enum):
     """Types of staking mechanisms"""
     FLEXIBLE = "flexible"           # Unstake anytime
@@ -61,6 +63,8 @@ class StakePosition:
     multiplier: Decimal = Decimal('1.0')
     penalty_applied: Decimal = Decimal('0')
     governance_power: Decimal = Decimal('0')
+    reward_debt: Dict[str, Decimal] = field(default_factory=dict)  # weight * acc_reward_per_share when last settled
+    unclaimed_rewards: Dict[str, Decimal] = field(default_factory=dict)  # settled but not yet claimed
 
 @dataclass
 class RewardProgram:
@@ -98,6 +102,11 @@ class AdvancedStakingPoolSystem:
         self.reward_programs = {}
         self.validator_nodes = {}
         
+        # Indexes so per-user and per-validator work never scans every position
+        self.user_positions = {}  # user_address -> {stake_id: StakePosition}, oldest first
+        self.user_governance_power = {}  # user_address -> governance power of active positions
+        self.validator_delegations = {}  # validator_id -> {stake_id: StakePosition}
+        
         # System configuration
         self.config = {
             'min_stake_amount': Decimal('10'),
@@ -287,8 +296,12 @@ class AdvancedStakingPoolSystem:
             'active': True,
             'created_timestamp': datetime.now(),
             'last_updated': datetime.now(),
-            'stake_positions': [],
-            'reward_programs': []
+            'stake_positions': set(),
+            'reward_programs': [],
+            # Rewards owed per unit of weight (amount * multiplier) since the pool opened
+            'acc_reward_per_share': {token: Decimal('0') for token in reward_tokens},
+            'total_weight': Decimal('0'),
+            'last_reward_time': datetime.now()
         }
         
         self.staking_pools[pool_id] = pool_data
@@ -370,10 +383,16 @@ class AdvancedStakingPoolSystem:
         )
         
         self.stake_positions[stake_id] = position
+        self.user_positions.setdefault(user_address, {})[stake_id] = position
+        self._adjust_governance_power(user_address, governance_power)
         
-        # Update pool totals
+        # Update pool totals; the new stake only earns from now on
+        self._update_pool_rewards(pool)
         pool['total_staked'] += amount
-        pool['stake_positions'].append(stake_id)
+        pool['total_weight'] += amount * multiplier
+        position.reward_debt = {token: amount * multiplier * acc
+                                for token, acc in pool['acc_reward_per_share'].items()}
+        pool['stake_positions'].add(stake_id)
         pool['last_updated'] = datetime.now()
         
         # Store in database
@@ -419,12 +438,16 @@ class AdvancedStakingPoolSystem:
         if amount > position.amount:
             raise ValueError("Cannot unstake more than staked amount")
         
-        # Calculate pending rewards before unstaking
-        pending_rewards = self._calculate_pending_rewards(stake_id)
+        # Settle rewards earned on the old amount before it changes
+        self._settle_rewards(position)
+        pending_rewards = dict(position.unclaimed_rewards)
         
         # Update position
+        pool['total_weight'] -= amount * position.multiplier
         position.amount -= amount
         pool['total_staked'] -= amount
+        self._reset_reward_debt(position)
+        governance_before = self._active_governance_power(position)
         
         withdrawal_result = {
             'stake_id': stake_id,
@@ -440,13 +463,15 @@ class AdvancedStakingPoolSystem:
         if position.amount == 0:
             # Full unstake
             position.status = StakeStatus.WITHDRAWN
-            pool['stake_positions'].remove(stake_id)
+            pool['stake_positions'].discard(stake_id)
         elif position.staking_type == StakingType.FLEXIBLE:
             # Partial flexible unstake - immediate
             pass
         else:
             # Partial fixed-term unstake - start unbonding
             position.status = StakeStatus.UNBONDING
+        self._adjust_governance_power(position.user_address,
+                                      self._active_governance_power(position) - governance_before)
         
         # Apply penalty if early withdrawal
         if penalty > 0:
@@ -477,8 +502,10 @@ class AdvancedStakingPoolSystem:
         if position.status != StakeStatus.ACTIVE:
             raise ValueError(f"Stake {stake_id} is not active")
         
-        # Calculate pending rewards
-        pending_rewards = self._calculate_pending_rewards(stake_id)
+        # Settle pending rewards and pay out everything unclaimed
+        self._settle_rewards(position)
+        pending_rewards = position.unclaimed_rewards
+        position.unclaimed_rewards = {}
         
         # Add to accumulated rewards
         for token, amount in pending_rewards.items():
@@ -590,6 +617,8 @@ class AdvancedStakingPoolSystem:
         )
         
         self.stake_positions[delegation_id] = position
+        self.user_positions.setdefault(user_address, {})[delegation_id] = position
+        self.validator_delegations.setdefault(validator_id, {})[delegation_id] = position
         
         # Update validator delegated stake
         validator.delegated_stake += amount
@@ -624,10 +653,9 @@ class AdvancedStakingPoolSystem:
         
         # Apply penalty to all delegated positions
         affected_delegations = []
-        for stake_id, position in self.stake_positions.items():
-            if (position.pool_id == validator_id and 
-                position.staking_type == StakingType.VALIDATOR and
-                position.status == StakeStatus.ACTIVE):
+        for stake_id, position in self.validator_delegations.get(validator_id, {}).items():
+            if position.status == StakeStatus.ACTIVE:
+                self._adjust_governance_power(position.user_address, -position.governance_power)
                 
                 delegation_penalty = position.amount * penalty_percentage
                 position.amount -= delegation_penalty
@@ -756,40 +784,95 @@ class AdvancedStakingPoolSystem:
         
         return True
     
+    def distribute_rewards(self, pool_id: str, reward_token: str, amount: Decimal) -> Decimal:
+        """Distribute a reward epoch pro rata to every staker in the pool in O(1)"""
+        
+        if pool_id not in self.staking_pools:
+            raise ValueError(f"Staking pool {pool_id} not found")
+        
+        pool = self.staking_pools[pool_id]
+        
+        if reward_token not in pool['acc_reward_per_share']:
+            raise ValueError(f"{reward_token} is not a reward token of pool {pool_id}")
+        if pool['total_weight'] <= 0:
+            raise ValueError(f"Staking pool {pool_id} has no stake to distribute to")
+        
+        self._update_pool_rewards(pool)
+        pool['acc_reward_per_share'][reward_token] += amount / pool['total_weight']
+        pool['last_updated'] = datetime.now()
+        
+        return pool['acc_reward_per_share'][reward_token]
+    
+    def _accrued_reward_per_share(self, pool: Dict[str, Any], now: datetime) -> Dict[str, Decimal]:
+        """Accumulator values including APY emission since the pool was last updated"""
+        
+        seconds_elapsed = Decimal((now - pool['last_reward_time']).total_seconds())
+        if seconds_elapsed <= 0:
+            return pool['acc_reward_per_share']
+        
+        # APY accrues per unit of weight, so the increment does not depend on who is staked
+        increment = pool['apy'] * seconds_elapsed / SECONDS_PER_YEAR / len(pool['reward_tokens'])
+        return {token: acc + increment for token, acc in pool['acc_reward_per_share'].items()}
+    
+    def _update_pool_rewards(self, pool: Dict[str, Any]):
+        """Fold APY emission up to now into the pool accumulators"""
+        
+        now = datetime.now()
+        pool['acc_reward_per_share'] = self._accrued_reward_per_share(pool, now)
+        pool['last_reward_time'] = now
+    
+    def _settle_rewards(self, position: StakePosition):
+        """Move a position's pending rewards into unclaimed_rewards; call before its weight changes"""
+        
+        pool = self.staking_pools.get(position.pool_id)
+        if pool is None:
+            return
+        
+        self._update_pool_rewards(pool)
+        weight = position.amount * position.multiplier
+        for token, acc in pool['acc_reward_per_share'].items():
+            pending = weight * acc - position.reward_debt.get(token, Decimal('0'))
+            if pending > 0:
+                position.unclaimed_rewards[token] = position.unclaimed_rewards.get(token, Decimal('0')) + pending
+        self._reset_reward_debt(position)
+    
+    def _reset_reward_debt(self, position: StakePosition):
+        pool = self.staking_pools.get(position.pool_id)
+        if pool is None:
+            return
+        
+        weight = position.amount * position.multiplier
+        position.reward_debt = {token: weight * acc for token, acc in pool['acc_reward_per_share'].items()}
+    
     def _calculate_pending_rewards(self, stake_id: str) -> Dict[str, Decimal]:
         """Calculate pending rewards for a stake position"""
         
         position = self.stake_positions[stake_id]
-        pool = self.staking_pools[position.pool_id]
-        
-        # Calculate time elapsed since last reward claim
-        time_elapsed = datetime.now() - position.last_reward_claim
-        seconds_elapsed = Decimal(time_elapsed.total_seconds())
+        pool = self.staking_pools.get(position.pool_id)
         
-        # Calculate base rewards
-        annual_rate = pool['apy'] * position.multiplier
-        reward_per_second = (position.amount * annual_rate) / (Decimal('365') * Decimal('24') * Decimal('3600'))
+        # Validator delegations are not pool stakes and earn no pool rewards
+        if pool is None:
+            return {}
         
-        pending_amount = reward_per_second * seconds_elapsed
-        
-        # Return rewards by token
+        weight = position.amount * position.multiplier
         rewards = {}
-        for reward_token in pool['reward_tokens']:
-            rewards[reward_token] = pending_amount / len(pool['reward_tokens'])
+        for token, acc in self._accrued_reward_per_share(pool, datetime.now()).items():
+            pending = weight * acc - position.reward_debt.get(token, Decimal('0'))
+            rewards[token] = position.unclaimed_rewards.get(token, Decimal('0')) + max(pending, Decimal('0'))
         
         return rewards
     
+    def _active_governance_power(self, position: StakePosition) -> Decimal:
+        return position.governance_power if position.status == StakeStatus.ACTIVE else Decimal('0')
+    
+    def _adjust_governance_power(self, user_address: str, delta: Decimal):
+        if delta:
+            self.user_governance_power[user_address] = self.user_governance_power.get(user_address, Decimal('0')) + delta
+    
     def _get_user_governance_power(self, user_address: str) -> Decimal:
         """Get total governance power for a user"""
         
-        total_power = Decimal('0')
-        
-        for position in self.stake_positions.values():
-            if (position.user_address == user_address and 
-                position.status == StakeStatus.ACTIVE):
-                total_power += position.governance_power
-        
-        return total_power
+        return self.user_governance_power.get(user_address, Decimal('0'))
     
     def _store_stake_position(self, position: StakePosition):
         """Store stake position in database"""
@@ -916,28 +999,27 @@ class AdvancedStakingPoolSystem:
         
         user_positions = []
         
-        for stake_id, position in self.stake_positions.items():
-            if position.user_address == user_address:
-                pool = self.staking_pools.get(position.pool_id, {})
-                pending_rewards = self._calculate_pending_rewards(stake_id)
-                
-                position_data = {
-                    'stake_id': stake_id,
-                    'pool_name': pool.get('name', 'Unknown'),
-                    'pool_id': position.pool_id,
-                    'amount': float(position.amount),
-                    'staking_type': position.staking_type.value,
-                    'status': position.status.value,
-                    'multiplier': float(position.multiplier),
-                    'pending_rewards': {k: float(v) for k, v in pending_rewards.items()},
-                    'accumulated_rewards': {k: float(v) for k, v in position.accumulated_rewards.items()},
-                    'governance_power': float(position.governance_power),
-                    'stake_timestamp': position.stake_timestamp.isoformat(),
-                    'unlock_timestamp': position.unlock_timestamp.isoformat() if position.unlock_timestamp else None,
-                    'penalty_applied': float(position.penalty_applied)
-                }
-                
-                user_positions.append(position_data)
+        for stake_id, position in self.user_positions.get(user_address, {}).items():
+            pool = self.staking_pools.get(position.pool_id, {})
+            pending_rewards = self._calculate_pending_rewards(stake_id)
+            
+            position_data = {
+                'stake_id': stake_id,
+                'pool_name': pool.get('name', 'Unknown'),
+                'pool_id': position.pool_id,
+                'amount': float(position.amount),
+                'staking_type': position.staking_type.value,
+                'status': position.status.value,
+                'multiplier': float(position.multiplier),
+                'pending_rewards': {k: float(v) for k, v in pending_rewards.items()},
+                'accumulated_rewards': {k: float(v) for k, v in position.accumulated_rewards.items()},
+                'governance_power': float(position.governance_power),
+                'stake_timestamp': position.stake_timestamp.isoformat(),
+                'unlock_timestamp': position.unlock_timestamp.isoformat() if position.unlock_timestamp else None,
+                'penalty_applied': float(position.penalty_applied)
+            }
+            
+            user_positions.append(position_data)
         
         return user_positions
     
@@ -0,0 +1,115 @@
+"""
+Agent Registry for the GuardianShield API
+Long-lived agent instances whose results are cached and refreshed off the request path
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+AGENT_EXECUTOR_WORKERS = 2  # Threads for agent start-up and cycles; requests never run them
+AGENT_RETRY_SECONDS = 10  # After a failed cycle, serve what we have this long before retrying
+
+class AgentEntry:
+    """One registered agent: how to build it, how to run a cycle, and its latest result"""
+    
+    def __init__(self, name: str, factory: Callable[[], Any], compute: Callable[[Any], Any], ttl: float):
+        self.name = name
+        self.factory = factory
+        self.compute = compute
+        self.ttl = ttl
+        self.agent = None
+        self.result = None
+        self.computed_at = 0.0
+        self.expires_at = 0.0
+        self.duration = 0.0
+        self.error = None
+        self.refresh_task: Optional[asyncio.Task] = None
+    
+    def is_fresh(self, now: float) -> bool:
+        return self.result is not None and now < self.expires_at
+
+class AgentRegistry:
+    """
+    Creates each agent once and serves the result of its latest cycle.
+    
+    Agent construction and cycles run on a small thread pool. A result
+    younger than its TTL is returned as is; an older one is still returned
+    while a single refresh runs in the background, so requests only wait
+    for the very first cycle of an agent.
+    """
+    
+    def __init__(self, max_workers: int = AGENT_EXECUTOR_WORKERS):
+        self.entries: Dict[str, AgentEntry] = {}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+    
+    def register(self, name: str, factory: Callable[[], Any], compute: Callable[[Any], Any], ttl: float):
+        self.entries[name] = AgentEntry(name, factory, compute, ttl)
+    
+    async def start(self):
+        """Build every agent and run its first cycle in the background"""
+        for entry in self.entries.values():
+            self._schedule_refresh(entry)
+    
+    async def get_result(self, name: str) -> Any:
+        entry = self.entries[name]
+        if entry.is_fresh(time.time()):
+            return entry.result
+        task = self._schedule_refresh(entry)
+        if entry.result is None:
+            # Nothing to serve yet; wait for the first cycle
+            await asyncio.shield(task)
+        return entry.result
+    
+    def _schedule_refresh(self, entry: AgentEntry) -> asyncio.Task:
+        if entry.refresh_task is None or entry.refresh_task.done():
+            entry.refresh_task = asyncio.get_running_loop().create_task(self._refresh(entry))
+        return entry.refresh_task
+    
+    async def _refresh(self, entry: AgentEntry):
+        loop = asyncio.get_running_loop()
+        started = time.time()
+        try:
+            if entry.agent is None:
+                entry.agent = await loop.run_in_executor(self.executor, entry.factory)
+            result = await loop.run_in_executor(self.executor, entry.compute, entry.agent)
+            if isinstance(result, dict) and "error" in result:
+                # Agents report some failures as a result rather than raising
+                raise RuntimeError(result["error"])
+        except Exception as e:
+            logger.error(f"Agent {entry.name} cycle failed: {e}")
+            entry.error = str(e)
+            if entry.result is None:
+                entry.result = {"error": str(e)}
+            # Keep serving the last good result, but do not retry on every request
+            entry.expires_at = time.time() + min(entry.ttl, AGENT_RETRY_SECONDS)
+            return
+        entry.result = result
+        entry.error = None
+        entry.computed_at = time.time()
+        entry.expires_at = entry.computed_at + entry.ttl
+        entry.duration = entry.computed_at - started
+    
+    def get_status(self) -> Dict[str, Dict]:
+        now = time.time()
+        return {
+            name: {
+                "initialized": entry.agent is not None,
+                "result_age": now - entry.computed_at if entry.computed_at else None,
+                "ttl": entry.ttl,
+                "last_cycle_seconds": entry.duration,
+                "refreshing": entry.refresh_task is not None and not entry.refresh_task.done(),
+                "last_error": entry.error
+            }
+            for name, entry in self.entries.items()
+        }
+    
+    def shutdown(self):
+        for entry in self.entries.values():
+            if entry.refresh_task is not None:
+                entry.refresh_task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -5,7 +5,9 @@ PERFORMANCE TARGETS: 95%+ accuracy, <2% false positives, continuous improvement
 """
 
 import asyncio
+import atexit
 import logging
+import weakref
 import json
 import numpy as np
 from datetime import datetime, timedelta
@@ -28,6 +30,18 @@ PERFORMANCE_TARGET_FALSE_POSITIVE_RATE = 2.0
 PERFORMANCE_TARGET_RESPONSE_TIME = 0.5
 CONTINUOUS_IMPROVEMENT_ENABLED = True
 
+# Write-behind pattern store flush triggers
+PATTERN_BUFFER_MAX_PENDING = 500
+PATTERN_BUFFER_FLUSH_INTERVAL = 5.0  # seconds
+
+# Open buffers, drained once at interpreter exit without keeping their engines alive
+_open_pattern_buffers = weakref.WeakSet()
+
+@atexit.register
+def _close_pattern_buffers():
+    for buffer in list(_open_pattern_buffers):
+        buffer.close()
+
 class ThreatType(Enum):
     """Types of security threats"""
     MALWARE = "malware"
@@ -72,6 +86,160 @@ class DetectionResult:
     recommended_actions: List[str]
     timestamp: datetime
 
+class PatternWriteBuffer:
+    """
+    Write-behind buffer for the pattern database.
+
+    Occurrence counts are aggregated per pattern_hash in memory and performance
+    metrics are queued; both are flushed as batched UPSERTs/INSERTs in a single
+    transaction once the buffer reaches max_pending writes or flush_interval
+    seconds have passed since the last flush. Both triggers are only checked
+    when a write is recorded, so an idle buffer holds its rows until flush()
+    or close() is called; the engine flushes at the start of each learning
+    cycle and on shutdown. A failed flush keeps its rows for the next one.
+    """
+    
+    def __init__(self, conn: sqlite3.Connection, max_pending: int = PATTERN_BUFFER_MAX_PENDING,
+                 flush_interval: float = PATTERN_BUFFER_FLUSH_INTERVAL):
+        self.conn = conn
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.pending_patterns: Dict[str, Dict[str, Any]] = {}
+        self.pending_metrics: List[Tuple] = []
+        self.pending_writes = 0
+        self.last_flush = time.time()
+        self.closed = False
+        self.stats = {'flushes': 0, 'rows_written': 0, 'new_patterns': 0, 'failed_flushes': 0}
+        _open_pattern_buffers.add(self)
+    
+    def record_pattern(self, pattern_hash: str, threat_type: str, features: List[float], confidence: float) -> int:
+        """Queue one occurrence of a pattern; returns the number of new patterns flushed"""
+        now = datetime.now()
+        entry = self.pending_patterns.get(pattern_hash)
+        if entry:
+            entry['occurrences'] += 1
+            entry['last_seen'] = now
+        else:
+            self.pending_patterns[pattern_hash] = {
+                'threat_type': threat_type,
+                'features': json.dumps(features),
+                'confidence': confidence,
+                'occurrences': 1,
+                'first_seen': now,
+                'last_seen': now
+            }
+        self.pending_writes += 1
+        return self.maybe_flush()
+    
+    def record_metric(self, metric_name: str, value: float, target: float, model_type: str = 'ensemble') -> int:
+        """Queue one performance metric row"""
+        now = datetime.now()
+        self.pending_metrics.append((
+            now.isoformat(),
+            metric_name,
+            value,
+            target,
+            model_type,
+            f"session_{now.strftime('%Y%m%d_%H')}"
+        ))
+        self.pending_writes += 1
+        return self.maybe_flush()
+    
+    def maybe_flush(self) -> int:
+        """Flush when the size or time trigger fires"""
+        if self.pending_writes >= self.max_pending or time.time() - self.last_flush >= self.flush_interval:
+            return self.flush()
+        return 0
+    
+    def flush(self) -> int:
+        """Write all pending rows in one transaction; returns the number of new patterns"""
+        self.last_flush = time.time()
+        if self.closed or not self.pending_writes:
+            return 0
+        
+        patterns, metrics = self.pending_patterns, self.pending_metrics
+        self.pending_patterns, self.pending_metrics = {}, []
+        rows = self.pending_writes
+        self.pending_writes = 0
+        
+        new_patterns = 0
+        try:
+            with self.conn:
+                if patterns:
+                    hashes = list(patterns.keys())
+                    existing = set()
+                    for start in range(0, len(hashes), 500):
+                        chunk = hashes[start:start + 500]
+                        placeholders = ','.join('?' * len(chunk))
+                        existing.update(row[0] for row in self.conn.execute(
+                            f"SELECT pattern_hash FROM threat_patterns WHERE pattern_hash IN ({placeholders})",
+                            chunk
+                        ))
+                    new_patterns = len(hashes) - len(existing)
+                    
+                    self.conn.executemany(
+                        '''INSERT INTO threat_patterns 
+                           (pattern_hash, threat_type, features, confidence, occurrences, first_seen, last_seen, accuracy)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                           ON CONFLICT(pattern_hash) DO UPDATE SET
+                               occurrences = occurrences + excluded.occurrences,
+                               last_seen = excluded.last_seen''',
+                        [
+                            (pattern_hash, entry['threat_type'], entry['features'], entry['confidence'],
+                             entry['occurrences'], entry['first_seen'], entry['last_seen'],
+                             0.85)  # Initial accuracy estimate
+                            for pattern_hash, entry in patterns.items()
+                        ]
+                    )
+                
+                if metrics:
+                    self.conn.executemany(
+                        """INSERT INTO performance_metrics 
+                           (timestamp, metric_name, metric_value, target_value, model_type, session_id)
+                           VALUES (?, ?, ?, ?, ?, ?)""",
+                        metrics
+                    )
+            
+            self.stats['flushes'] += 1
+            self.stats['rows_written'] += rows
+            self.stats['new_patterns'] += new_patterns
+            
+        except Exception as e:
+            logger.error(f"Error flushing pattern buffer: {e}")
+            self.stats['failed_flushes'] += 1
+            self._requeue(patterns, metrics, rows)
+            return 0
+        
+        return new_patterns
+    
+    def _requeue(self, patterns: Dict[str, Dict[str, Any]], metrics: List[Tuple], rows: int):
+        """Merge rows from a failed flush back in front of anything queued since"""
+        for pattern_hash, entry in patterns.items():
+            newer = self.pending_patterns.get(pattern_hash)
+            if newer:
+                entry['occurrences'] += newer['occurrences']
+                entry['last_seen'] = newer['last_seen']
+            self.pending_patterns[pattern_hash] = entry
+        self.pending_metrics[:0] = metrics
+        self.pending_writes += rows
+    
+    def close(self):
+        """Flush remaining writes; safe to call more than once"""
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        _open_pattern_buffers.discard(self)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """Buffer counters for status reporting"""
+        return {
+            'pending_writes': self.pending_writes,
+            'pending_patterns': len(self.pending_patterns),
+            'pending_metrics': len(self.pending_metrics),
+            **self.stats
+        }
+
 class AdvancedThreatDetectionEngine:
     """
     Advanced threat detection using machine learning and pattern recognition
@@ -94,8 +262,9 @@ class AdvancedThreatDetectionEngine:
         self.threat_models = {}
         self.initialize_models()
         
-        # Pattern recognition database
+        # Pattern recognition database with write-behind buffer
         self.pattern_db = self._init_pattern_database()
+        self.pattern_buffer = PatternWriteBuffer(self.pattern_db)
         
         # Learning metrics
         self.learning_metrics = {
@@ -500,6 +669,151 @@ class AdvancedThreatDetectionEngine:
         
         return result
     
+    async def analyze_batch(self, vectors: List[ThreatVector]) -> List[DetectionResult]:
+        """Analyze many threat vectors at once, scoring every model as array operations.
+
+        Produces the same DetectionResults as calling analyze_threat_vector on each
+        vector, but evaluates the model ensemble over a stacked feature matrix and
+        writes patterns and metrics for the whole batch in one round trip.
+        """
+        if not vectors:
+            return []
+
+        start_time = time.time()
+        features_matrix, valid_mask, lengths, features_used_list = self._build_feature_matrix(vectors)
+        model_scores = self._score_models_batch(features_matrix, valid_mask, lengths)
+
+        # Apply relevance penalties and per-threat thresholds column by column
+        threat_types = list(model_scores.keys())
+        confidences = np.zeros((len(vectors), len(threat_types)))
+        for column, threat_type in enumerate(threat_types):
+            penalties = np.array([
+                self._relevance_penalty(threat_type, features_used)
+                for features_used in features_used_list
+            ])
+            scores = model_scores[threat_type] * penalties
+            keep = (scores >= self._get_min_confidence_threshold(threat_type)) & (scores > 0.5)
+            confidences[:, column] = np.where(keep, scores, -np.inf)
+
+        results = []
+        detected = []
+        # Low-confidence rows return early on the single path, so they are not stored either
+        stored = []
+        for row, features_used in enumerate(features_used_list):
+            row_scores = confidences[row]
+            candidates = np.flatnonzero(np.isfinite(row_scores))
+
+            if candidates.size == 0:
+                result = self._no_threat_result(features_used, "No significant threats detected in analysis")
+                results.append(result)
+                stored.append((vectors[row], result))
+                continue
+
+            # Stable descending order keeps the first model on ties, like the single path
+            order = candidates[np.argsort(-row_scores[candidates], kind='stable')]
+            best_threat = threat_types[order[0]]
+            best_confidence = float(row_scores[order[0]])
+            if order.size > 1 and best_confidence - float(row_scores[order[1]]) < 0.2:
+                best_confidence *= 0.8
+
+            if best_confidence < 0.6:
+                results.append(self._no_threat_result(
+                    features_used, "Insufficient confidence for threat classification"
+                ))
+                continue
+
+            severity = self._calculate_severity(best_threat, best_confidence)
+            result = DetectionResult(
+                threat_detected=True,
+                threat_type=best_threat,
+                confidence=best_confidence,
+                severity=severity,
+                features_used=features_used,
+                explanation=self._generate_explanation(best_threat, best_confidence, features_used),
+                recommended_actions=self._generate_recommendations(best_threat, severity),
+                timestamp=datetime.now()
+            )
+            results.append(result)
+            detected.append(result)
+            stored.append((vectors[row], result))
+
+        if detected:
+            response_time = (time.time() - start_time) / len(vectors)
+            await self._track_batch_performance(detected, response_time)
+
+        await self._store_detection_patterns(stored)
+
+        if CONTINUOUS_IMPROVEMENT_ENABLED:
+            for result in detected:
+                await self._check_and_apply_improvements(result)
+
+        return results
+
+    def _no_threat_result(self, features_used: List[str], explanation: str) -> DetectionResult:
+        """Build the negative DetectionResult shared by the single and batch paths"""
+        return DetectionResult(
+            threat_detected=False,
+            threat_type=None,
+            confidence=0.0,
+            severity=AlertSeverity.LOW,
+            features_used=features_used,
+            explanation=explanation,
+            recommended_actions=["Continue monitoring"],
+            timestamp=datetime.now()
+        )
+
+    def _build_feature_matrix(self, vectors: List[ThreatVector]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, List[List[str]]]:
+        """Stack per-vector feature lists into a zero-padded matrix plus validity mask"""
+        rows = []
+        features_used_list = []
+        for vector in vectors:
+            extracted = []
+            features_used = []
+            for feature_type, extractor in self.feature_extractors.items():
+                if feature_type in vector.metadata:
+                    extracted.extend(extractor(vector.metadata[feature_type]))
+                    features_used.append(feature_type)
+            rows.append(list(vector.features) + extracted)
+            features_used_list.append(features_used)
+
+        lengths = np.array([len(row) for row in rows], dtype=np.int64)
+        width = max(int(lengths.max()), 5)
+        features_matrix = np.zeros((len(rows), width), dtype=np.float64)
+        for index, row in enumerate(rows):
+            features_matrix[index, :len(row)] = row
+        valid_mask = np.arange(width)[None, :] < lengths[:, None]
+
+        return features_matrix, valid_mask, lengths, features_used_list
+
+    def _relevance_penalty(self, threat_type: ThreatType, features_used: List[str]) -> float:
+        """Confidence multiplier for feature types that do not fit the threat model"""
+        relevant_features = self._get_relevant_features_for_threat(threat_type, features_used)
+        if not relevant_features:
+            return 0.3
+        if len(relevant_features) == 1 and len(features_used) > 2:
+            return 0.6
+        return 1.0
+
+    async def _track_batch_performance(self, results: List[DetectionResult], response_time: float):
+        """Batched counterpart of _track_detection_performance"""
+        try:
+            if response_time > PERFORMANCE_TARGET_RESPONSE_TIME:
+                logger.warning(f"Response time {response_time:.3f}s exceeds target {PERFORMANCE_TARGET_RESPONSE_TIME}s")
+                await self._optimize_response_time()
+
+            metrics = []
+            for result in results:
+                if result.confidence < 0.7:
+                    logger.info(f"Low confidence detection: {result.confidence:.2f} for {result.threat_type.value}")
+                    await self._calibrate_confidence_for_threat_type(result.threat_type)
+                metrics.append(("response_time", response_time, PERFORMANCE_TARGET_RESPONSE_TIME))
+                metrics.append(("detection_confidence", result.confidence, 0.8))
+
+            await self._log_performance_metrics(metrics)
+
+        except Exception as e:
+            logger.error(f"Error tracking performance: {e}")
+    
     async def _track_detection_performance(self, result: DetectionResult, response_time: float):
         """Track detection performance for continuous improvement"""
         try:
@@ -543,25 +857,13 @@ class AdvancedThreatDetectionEngine:
     
     async def _log_performance_metric(self, metric_name: str, value: float, target: float):
         """Log performance metric to database"""
+        await self._log_performance_metrics([(metric_name, value, target)])
+
+    async def _log_performance_metrics(self, metrics: List[Tuple[str, float, float]]):
+        """Queue several (metric_name, value, target) rows on the write-behind buffer"""
         try:
-            conn = sqlite3.connect(str(self.model_path / "patterns.db"))
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                INSERT INTO performance_metrics 
-                (timestamp, metric_name, metric_value, target_value, model_type, session_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                datetime.now().isoformat(),
-                metric_name,
-                value,
-                target,
-                'ensemble',
-                f"session_{datetime.now().strftime('%Y%m%d_%H')}"
-            ))
-            
-            conn.commit()
-            conn.close()
+            for metric_name, value, target in metrics:
+                self.learning_metrics['patterns_learned'] += self.pattern_buffer.record_metric(metric_name, value, target)
             
         except Exception as e:
             logger.error(f"Error logging performance metric: {e}")
@@ -800,6 +1102,75 @@ class AdvancedThreatDetectionEngine:
         confidence = min(suspicious_patterns / 3.0, 1.0)
         return confidence
     
+    def _score_models_batch(self, features: np.ndarray, valid: np.ndarray, lengths: np.ndarray) -> Dict[ThreatType, np.ndarray]:
+        """Evaluate every threat model over a feature matrix, one score per row"""
+        scorers = {
+            'ensemble': self._score_ensemble_batch,
+            'neural_network': self._score_neural_batch,
+            'anomaly_detection': self._score_anomaly_batch,
+            'behavioral_analysis': self._score_behavioral_batch,
+            'static_analysis': self._score_static_batch,
+            'transaction_analysis': self._score_transaction_batch
+        }
+
+        scores = {}
+        for threat_type, model in self.threat_models.items():
+            scorer = scorers.get(model['type'])
+            if scorer is None:
+                scores[threat_type] = np.zeros(len(lengths))
+            else:
+                scores[threat_type] = scorer(features, valid, lengths)
+        return scores
+
+    def _score_ensemble_batch(self, features: np.ndarray, valid: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """Array form of _evaluate_ensemble_model"""
+        head = features[:, :3]
+        scores = np.where(head > np.array([0.85, 0.8, 0.75]), head, 0.0)
+        indicators = (scores > 0).sum(axis=1)
+        mean_scores = scores.sum(axis=1) / np.maximum(indicators, 1)
+        return np.where((lengths >= 4) & (indicators >= 2), mean_scores, 0.0)
+
+    def _score_neural_batch(self, features: np.ndarray, valid: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """Array form of _evaluate_neural_model"""
+        # Accumulate left to right like the scalar sum(); a matrix product may round differently
+        weighted_sum = np.zeros(len(lengths))
+        for column, weight in enumerate([0.4, 0.3, 0.2, 0.1][:features.shape[1]]):
+            weighted_sum = weighted_sum + weight * features[:, column]
+        confidence = 1 / (1 + np.exp(-(weighted_sum - 0.5) * 6))
+        keep = (lengths >= 3) & (weighted_sum >= 0.6) & (confidence >= 0.7)
+        return np.where(keep, confidence, 0.0)
+
+    def _score_anomaly_batch(self, features: np.ndarray, valid: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """Array form of _evaluate_anomaly_model"""
+        max_deviation = np.where(valid, np.abs(features - 0.5), 0.0).max(axis=1)
+        avg_feature = features.sum(axis=1) / np.maximum(lengths, 1)
+        confidence = np.minimum(max_deviation * 1.5, 1.0)
+        keep = (lengths > 0) & (max_deviation >= 0.4) & (avg_feature >= 0.3) & (confidence >= 0.6)
+        return np.where(keep, confidence, 0.0)
+
+    def _score_behavioral_batch(self, features: np.ndarray, valid: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """Array form of _evaluate_behavioral_model"""
+        head = features[:, :4]
+        anomalous = head > 0.7
+        count = anomalous.sum(axis=1)
+        mean_scores = np.where(anomalous, head, 0.0).sum(axis=1) / np.maximum(count, 1)
+        return np.where((lengths >= 2) & (count > 0), mean_scores, 0.0)
+
+    def _score_static_batch(self, features: np.ndarray, valid: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """Array form of _evaluate_static_model"""
+        indicators = valid & (features > 0.6)
+        critical = np.where(indicators, features, 0.0).max(axis=1)
+        return np.where(indicators.any(axis=1), critical, 0.0)
+
+    def _score_transaction_batch(self, features: np.ndarray, valid: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """Array form of _evaluate_transaction_model"""
+        suspicious = (
+            (features[:, 0] > 0.8).astype(np.int64)
+            + ((lengths > 4) & (features[:, 4] > 0.7))
+            + (features[:, 2] > 0.6)
+        )
+        return np.where(lengths >= 3, np.minimum(suspicious / 3.0, 1.0), 0.0)
+    
     def _calculate_severity(self, threat_type: ThreatType, confidence: float) -> AlertSeverity:
         """Calculate alert severity based on threat type and confidence"""
         
@@ -899,58 +1270,50 @@ class AdvancedThreatDetectionEngine:
     
     async def _store_detection_pattern(self, vector: ThreatVector, result: DetectionResult):
         """Store detection pattern for continuous learning"""
-        
-        # Create pattern hash
-        pattern_data = {
-            'features': vector.features,
-            'metadata_keys': list(vector.metadata.keys()),
-            'threat_type': result.threat_type.value if result.threat_type else None,
-            'confidence': result.confidence
-        }
-        
-        pattern_hash = hashlib.sha256(json.dumps(pattern_data, sort_keys=True).encode()).hexdigest()
-        
-        # Store in database
+        await self._store_detection_patterns([(vector, result)])
+
+    async def _store_detection_patterns(self, detections: List[Tuple[ThreatVector, DetectionResult]]):
+        """Queue a batch of detection patterns on the write-behind buffer"""
         try:
-            cursor = self.pattern_db.cursor()
-            
-            # Check if pattern exists
-            cursor.execute("SELECT id, occurrences FROM threat_patterns WHERE pattern_hash = ?", (pattern_hash,))
-            existing = cursor.fetchone()
-            
-            if existing:
-                # Update existing pattern
-                cursor.execute(
-                    "UPDATE threat_patterns SET occurrences = occurrences + 1, last_seen = ? WHERE pattern_hash = ?",
-                    (datetime.now(), pattern_hash)
-                )
-            else:
-                # Insert new pattern
-                cursor.execute(
-                    '''INSERT INTO threat_patterns 
-                       (pattern_hash, threat_type, features, confidence, first_seen, last_seen, accuracy)
-                       VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                    (pattern_hash, 
-                     result.threat_type.value if result.threat_type else 'none',
-                     json.dumps(vector.features),
-                     result.confidence,
-                     datetime.now(),
-                     datetime.now(),
-                     0.85)  # Initial accuracy estimate
-                )
+            for vector, result in detections:
+                # Create pattern hash
+                pattern_data = {
+                    'features': vector.features,
+                    'metadata_keys': list(vector.metadata.keys()),
+                    'threat_type': result.threat_type.value if result.threat_type else None,
+                    'confidence': result.confidence
+                }
                 
-                self.learning_metrics['patterns_learned'] += 1
-            
-            self.pattern_db.commit()
+                pattern_hash = hashlib.sha256(json.dumps(pattern_data, sort_keys=True).encode()).hexdigest()
+                
+                self.learning_metrics['patterns_learned'] += self.pattern_buffer.record_pattern(
+                    pattern_hash,
+                    result.threat_type.value if result.threat_type else 'none',
+                    vector.features,
+                    result.confidence
+                )
             
         except Exception as e:
             logger.error(f"Error storing detection pattern: {e}")
     
+    def flush_pattern_buffer(self):
+        """Write all buffered patterns and metrics to the pattern database"""
+        self.learning_metrics['patterns_learned'] += self.pattern_buffer.flush()
+    
+    def shutdown(self):
+        """Flush pending writes and close the pattern database"""
+        self.learning_metrics['patterns_learned'] += self.pattern_buffer.flush()
+        self.pattern_buffer.close()
+        self.pattern_db.close()
+    
     async def continuous_learning_cycle(self):
         """Continuous learning and model improvement cycle"""
         
         while True:
             try:
+                # Drain buffered writes so the analysis sees them
+                self.flush_pattern_buffer()
+                
                 # Analyze recent patterns
                 await self._analyze_pattern_effectiveness()
                 
@@ -970,6 +1333,7 @@ class AdvancedThreatDetectionEngine:
     async def _analyze_pattern_effectiveness(self):
         """Analyze effectiveness of learned patterns"""
         
+        self.flush_pattern_buffer()
         cursor = self.pattern_db.cursor()
         
         # Get patterns from last 24 hours
@@ -1018,6 +1382,7 @@ class AdvancedThreatDetectionEngine:
         """Optimize model parameters based on learning"""
         
         # Get recent accuracy data
+        self.flush_pattern_buffer()
         cursor = self.pattern_db.cursor()
         cursor.execute(
             "SELECT threat_type, AVG(accuracy) as avg_accuracy FROM threat_patterns GROUP BY threat_type"
@@ -1070,6 +1435,7 @@ class AdvancedThreatDetectionEngine:
             }
         
         # Pattern statistics
+        self.flush_pattern_buffer()
         cursor = self.pattern_db.cursor()
         cursor.execute("SELECT COUNT(*) FROM threat_patterns")
         total_patterns = cursor.fetchone()[0]
@@ -1111,6 +1477,8 @@ class AdvancedThreatDetectionEngine:
             }
         
         # Database statistics
+        buffer_status = self.pattern_buffer.get_status()
+        self.flush_pattern_buffer()
         cursor = self.pattern_db.cursor()
         cursor.execute("SELECT COUNT(*) FROM threat_patterns")
         pattern_count = cursor.fetchone()[0]
@@ -1120,7 +1488,8 @@ class AdvancedThreatDetectionEngine:
         
         status['database_stats'] = {
             'total_patterns': pattern_count,
-            'learning_events': learning_events
+            'learning_events': learning_events,
+            'write_buffer': buffer_status
         }
         
         return status
@@ -1167,6 +1536,32 @@ class AdvancedAIAgentManager:
         
         return result
     
+    def shutdown(self):
+        """Stop learning and flush buffered detection data to disk"""
+        
+        self.learning_active = False
+        self.detection_engine.shutdown()
+        
+        logger.info("Advanced AI Agent System shut down")
+    
+    async def process_threat_batch(self, batch: List[Dict[str, Any]]) -> List[DetectionResult]:
+        """Process many threat data records through the batched detection path"""
+        
+        vectors = [
+            ThreatVector(
+                vector_id=data.get('id', hashlib.sha256(str(data).encode()).hexdigest()[:16]),
+                threat_type=ThreatType(data.get('threat_type', 'malware')),
+                features=data.get('features', []),
+                confidence=data.get('initial_confidence', 0.5),
+                timestamp=datetime.now(),
+                source=data.get('source', 'unknown'),
+                metadata=data.get('metadata', {})
+            )
+            for data in batch
+        ]
+        
+        return await self.detection_engine.analyze_batch(vectors)
+    
     def get_system_status(self) -> Dict[str, Any]:
         """Get comprehensive system status"""
         
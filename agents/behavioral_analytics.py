@@ -9,6 +9,8 @@ from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 import logging
 import time
+from collections import deque
+from itertools import islice
 from typing import List, Dict, Optional, Tuple
 import os
 
@@ -16,11 +18,76 @@ import os
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DECISION_MAP = {'safe': 0, 'threat': 1, 'anomaly': 2}
+FEATURE_COUNT = 4
+
+
+class BehaviorFeatureRing:
+    """Fixed-capacity ring buffer of precomputed feature rows with running statistics.
+
+    Mean and variance of the primary (value) column are maintained with a windowed
+    Welford update, so adding an event and evicting the oldest one are both O(1).
+    """
+    
+    def __init__(self, capacity: int, n_features: int = FEATURE_COUNT):
+        self.capacity = capacity
+        self.rows = np.zeros((capacity, n_features), dtype=np.float64)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.head = 0
+        self.size = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+    
+    def append(self, event_id: int, row: List[float]):
+        """Store a feature row, evicting the oldest one when full"""
+        if self.size == self.capacity:
+            self._remove_stat(self.rows[self.head, 0])
+        else:
+            self.size += 1
+        
+        self.rows[self.head] = row
+        self.ids[self.head] = event_id
+        self.head = (self.head + 1) % self.capacity
+        self._add_stat(row[0])
+    
+    def _add_stat(self, value: float):
+        n = self.size
+        delta = value - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (value - self.mean)
+    
+    def _remove_stat(self, value: float):
+        n = self.size
+        if n <= 1:
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        old_mean = self.mean
+        self.mean = (n * old_mean - value) / (n - 1)
+        self.m2 = max(0.0, self.m2 - (value - old_mean) * (value - self.mean))
+    
+    @property
+    def std(self) -> float:
+        """Population standard deviation of the value column over the window"""
+        return float(np.sqrt(self.m2 / self.size)) if self.size else 0.0
+    
+    def latest(self, count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the newest count rows and their event ids in arrival order"""
+        count = min(count, self.size)
+        positions = (self.head - count + np.arange(count)) % self.capacity
+        return self.rows[positions], self.ids[positions]
+    
+    def window(self) -> np.ndarray:
+        """Return every resident row in arrival order"""
+        return self.latest(self.size)[0]
+
+
 class BehavioralAnalyticsAgent:
-    def __init__(self, max_log_size: int = 10000):
+    def __init__(self, max_log_size: int = 10000, streaming: bool = True, refit_interval: int = 500):
         self.name = "Turlo"
-        self.behavior_log = []
+        self.behavior_log = deque(maxlen=max_log_size)
         self.max_log_size = max_log_size
+        self.events_logged = 0
         self.anomaly_threshold = 2.5
         self.scaler = StandardScaler()
         self.isolation_forest = IsolationForest(contamination=0.1, random_state=42)
@@ -38,6 +105,14 @@ class BehavioralAnalyticsAgent:
         self.user_profiles = {}
         self.training_specialization = 'behavioral_analysis'
         
+        # Streaming mode (default): precomputed feature rows, periodic IsolationForest refits.
+        # streaming=False re-scores the whole log and refits on every analysis.
+        self.streaming = streaming
+        self.refit_interval = refit_interval
+        self.feature_ring = BehaviorFeatureRing(max_log_size) if streaming else None
+        self.pending_events = 0
+        self.events_since_refit = 0
+        
     async def continuous_learn(self, training_data: list):
         """Specialized continuous learning for behavioral analysis"""
         behavioral_events = []
@@ -151,25 +226,37 @@ class BehavioralAnalyticsAgent:
                 event['timestamp'] = time.time()
             
             # Add unique ID
-            event['id'] = len(self.behavior_log)
+            event['id'] = self.events_logged
+            self.events_logged += 1
             
+            # Bounded log; the deque drops the oldest event in O(1)
             self.behavior_log.append(event)
             
-            # Maintain log size
-            if len(self.behavior_log) > self.max_log_size:
-                self.behavior_log.pop(0)
+            if self.streaming:
+                self.feature_ring.append(event['id'], self._event_features(event))
+                self.pending_events += 1
+                self.events_since_refit += 1
                 
             # Auto-save periodically
-            if len(self.behavior_log) % 100 == 0:
+            if self.events_logged % 100 == 0:
                 self.save_log()
                 
         except Exception as e:
             logger.error(f"Error logging behavior: {e}")
 
+    def recent_events(self, count: int = 10) -> List[Dict]:
+        """Return the newest count logged events, oldest first"""
+        recent = list(islice(reversed(self.behavior_log), count))
+        recent.reverse()
+        return recent
+
     def analyze_behavior(self) -> Optional[List[Tuple]]:
         """Enhanced anomaly detection using multiple algorithms"""
         if not self.behavior_log:
             return None
+        
+        if self.streaming:
+            return self._analyze_stream()
             
         try:
             # Extract numerical features
@@ -184,7 +271,7 @@ class BehavioralAnalyticsAgent:
             ml_anomalies = self._detect_ml_anomalies(values)
             
             # Combine results
-            all_anomalies = list(set(statistical_anomalies + ml_anomalies))
+            all_anomalies = self._rank_anomalies(set(statistical_anomalies + ml_anomalies))
             
             # Update performance metrics
             self._update_performance_metrics(all_anomalies)
@@ -195,40 +282,84 @@ class BehavioralAnalyticsAgent:
             logger.error(f"Error analyzing behavior: {e}")
             return None
 
-    def _extract_numerical_features(self) -> np.ndarray:
-        """Extract numerical features from behavior log"""
-        features = []
-        for event in self.behavior_log:
-            feature_vector = []
+    def _analyze_stream(self) -> Optional[List[Tuple]]:
+        """Score only the events logged since the last analysis against the ring buffer"""
+        ring = self.feature_ring
+        if ring.size < 2:
+            return None
+        
+        try:
+            rows, ids = ring.latest(self.pending_events)
+            self.pending_events = 0
+            if len(rows) == 0:
+                return []
             
-            # Extract 'value' field
-            if 'value' in event and isinstance(event['value'], (int, float)):
-                feature_vector.append(event['value'])
-            else:
-                feature_vector.append(0.0)
+            anomalies = set()
+            
+            # Z-score against running mean/variance of the window
+            std = ring.std
+            if std > 0:
+                z_scores = np.abs((rows[:, 0] - ring.mean) / std)
+                for index in np.flatnonzero(z_scores > self.anomaly_threshold):
+                    anomalies.add((int(ids[index]), rows[index, 0], z_scores[index]))
             
-            # Extract timestamp-based features
-            if 'timestamp' in event:
-                # Hour of day
-                hour = time.localtime(event['timestamp']).tm_hour
-                feature_vector.append(hour)
+            # IsolationForest refit every refit_interval events, predict in between
+            if ring.size >= 10:
+                if not self.is_trained or self.events_since_refit >= self.refit_interval:
+                    window = ring.window()
+                    self.isolation_forest.fit(self.scaler.fit_transform(window))
+                    self.is_trained = True
+                    self.events_since_refit = 0
                 
-                # Day of week
-                day = time.localtime(event['timestamp']).tm_wday
-                feature_vector.append(day)
-            else:
-                feature_vector.extend([0.0, 0.0])
+                outliers = self.isolation_forest.predict(self.scaler.transform(rows))
+                for index in np.flatnonzero(outliers == -1):
+                    anomalies.add((int(ids[index]), rows[index, 0], -1))
             
-            # Extract decision-based features
-            if 'decision' in event:
-                decision_map = {'safe': 0, 'threat': 1, 'anomaly': 2}
-                feature_vector.append(decision_map.get(event['decision'], -1))
-            else:
-                feature_vector.append(0.0)
+            all_anomalies = self._rank_anomalies(anomalies)
+            self._update_performance_metrics(all_anomalies, len(rows))
             
-            features.append(feature_vector)
+            return all_anomalies
+            
+        except Exception as e:
+            logger.error(f"Error analyzing behavior stream: {e}")
+            return None
+
+    @staticmethod
+    def _rank_anomalies(anomalies) -> List[Tuple]:
+        """Order anomalies by z-score, highest first; IsolationForest hits (-1) follow, oldest first"""
+        return sorted(anomalies, key=lambda anomaly: (-anomaly[2], anomaly[0]))
+
+    def _event_features(self, event: Dict) -> List[float]:
+        """Compute the numerical feature row for a single event"""
+        feature_vector = []
         
-        return np.array(features)
+        # Extract 'value' field
+        if 'value' in event and isinstance(event['value'], (int, float)):
+            feature_vector.append(event['value'])
+        else:
+            feature_vector.append(0.0)
+        
+        # Extract timestamp-based features (hour of day, day of week)
+        if 'timestamp' in event:
+            local_time = time.localtime(event['timestamp'])
+            feature_vector.append(local_time.tm_hour)
+            feature_vector.append(local_time.tm_wday)
+        else:
+            feature_vector.extend([0.0, 0.0])
+        
+        # Extract decision-based features
+        if 'decision' in event:
+            feature_vector.append(DECISION_MAP.get(event['decision'], -1))
+        else:
+            feature_vector.append(0.0)
+        
+        return feature_vector
+
+    def _extract_numerical_features(self) -> np.ndarray:
+        """Extract numerical features from behavior log"""
+        if self.streaming:
+            return self.feature_ring.window()
+        return np.array([self._event_features(event) for event in self.behavior_log])
 
     def _detect_statistical_anomalies(self, values: np.ndarray) -> List[Tuple]:
         """Statistical anomaly detection using Z-score"""
@@ -273,13 +404,15 @@ class BehavioralAnalyticsAgent:
         
         return anomalies
 
-    def _update_performance_metrics(self, anomalies: List[Tuple]):
+    def _update_performance_metrics(self, anomalies: List[Tuple], sample_size: Optional[int] = None):
         """Update performance metrics for recursive improvement"""
         self.performance_metrics['total_predictions'] += 1
         
         # This is a placeholder - in production, you'd have ground truth labels
         # For now, assume anomalies are rare (< 5% of data)
-        anomaly_rate = len(anomalies) / max(len(self.behavior_log), 1)
+        if sample_size is None:
+            sample_size = len(self.behavior_log)
+        anomaly_rate = len(anomalies) / max(sample_size, 1)
         
         if anomaly_rate < 0.05:
             self.performance_metrics['true_positives'] += len(anomalies)
@@ -320,7 +453,7 @@ class BehavioralAnalyticsAgent:
                 os.rename(path, backup_path)
             
             with open(path, "w") as f:
-                json.dump(self.behavior_log, f, indent=2)
+                json.dump(list(self.behavior_log), f, indent=2)
                 
             logger.info(f"Behavior log saved to {path}")
             
@@ -332,14 +465,28 @@ class BehavioralAnalyticsAgent:
         try:
             if os.path.exists(path):
                 with open(path, "r") as f:
-                    self.behavior_log = json.load(f)
+                    self.behavior_log = deque(json.load(f), maxlen=self.max_log_size)
                 logger.info(f"Behavior log loaded from {path}")
             else:
                 logger.warning(f"Behavior log file {path} not found")
-                self.behavior_log = []
+                self.behavior_log = deque(maxlen=self.max_log_size)
         except Exception as e:
             logger.error(f"Error loading behavior log: {e}")
-            self.behavior_log = []
+            self.behavior_log = deque(maxlen=self.max_log_size)
+        
+        # A capped log no longer starts at id 0, so continue after the highest loaded id
+        next_id = max((event.get('id', -1) for event in self.behavior_log), default=-1) + 1
+        self.events_logged = max(self.events_logged, next_id, len(self.behavior_log))
+        if self.streaming:
+            self._rebuild_feature_ring()
+
+    def _rebuild_feature_ring(self):
+        """Recompute the streaming feature ring from the current behavior log"""
+        self.feature_ring = BehaviorFeatureRing(self.max_log_size)
+        for index, event in enumerate(self.behavior_log):
+            self.feature_ring.append(event.get('id', index), self._event_features(event))
+        self.pending_events = len(self.behavior_log)
+        self.events_since_refit = self.refit_interval
 
     def run(self) -> Dict:
         """Run behavioral analytics and return results"""
@@ -351,7 +498,8 @@ class BehavioralAnalyticsAgent:
                 'anomalies_detected': len(anomalies) if anomalies else 0,
                 'total_events': len(self.behavior_log),
                 'performance_metrics': self.performance_metrics,
-                'anomalies': anomalies[:10] if anomalies else []  # Return top 10
+                'anomalies': anomalies[:10] if anomalies else [],  # Return top 10
+                'mode': 'streaming' if self.streaming else 'batch'
             }
         except Exception as e:
             logger.error(f"Error in behavioral analytics run: {e}")
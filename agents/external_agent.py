@@ -254,7 +254,7 @@ class Mediator:
         """
         Detect if there's an opportunity for recursive improvement
         """
-        recent_decisions = self.behavior_analytics.behavior_log[-10:]  # Last 10 decisions
+        recent_decisions = self.behavior_analytics.recent_events(10)  # Last 10 decisions
         if len(recent_decisions) >= 5:
             # Check for repeated suboptimal decisions
             threat_decisions = [d for d in recent_decisions if d.get('decision') == 'threat']
@@ -7,6 +7,8 @@ import os
 import time
 import hashlib
 import logging
+import re
+from collections import deque
 from typing import Dict, List, Set, Optional, Any
 from datetime import datetime, timedelta
 
@@ -14,6 +16,260 @@ from datetime import datetime, timedelta
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Categories matched as whole tokens through hash sets; everything else is a substring match
+EXACT_MATCH_CATEGORIES = ("scam_addresses", "malicious_ips")
+_TOKEN_SPLIT_RE = re.compile(r"[\s,;:@#/\\'\"()<>\[\]{}=?&|!]+")
+
+
+class AhoCorasickAutomaton:
+    """Multi-pattern substring matcher; patterns can be added after the automaton is built"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Set[str]] = [set()]
+        self._own: List[Set[str]] = [set()]
+        self._links_dirty = False
+
+    def add(self, pattern: str, label: str):
+        """Insert a pattern; failure links are recomputed lazily on the next search"""
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(set())
+                self._own.append(set())
+            node = nxt
+        self._own[node].add(label)
+        self._links_dirty = True
+
+    def _build_links(self):
+        """Breadth-first construction of failure links and merged outputs"""
+        queue = deque()
+        self._out[0] = set(self._own[0])
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._out[child] = set(self._own[child])
+            queue.append(child)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._out[child] = self._own[child] | self._out[self._fail[child]]
+                queue.append(child)
+
+        self._links_dirty = False
+
+    def search(self, text: str) -> Set[str]:
+        """Return the labels of every pattern occurring in text"""
+        if self._links_dirty:
+            self._build_links()
+
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[str] = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                found |= out[node]
+        return found
+
+
+class ThreatList(list):
+    """Threat category list that bumps its database version on every mutation"""
+
+    def __init__(self, database: "ThreatDatabase", values=()):
+        super().__init__(values)
+        self._database = database
+
+    def _mutated(self):
+        self._database.version += 1
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._mutated()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._mutated()
+
+    def __iadd__(self, values):
+        result = super().__iadd__(values)
+        self._mutated()
+        return result
+
+    def __imul__(self, count):
+        result = super().__imul__(count)
+        self._mutated()
+        return result
+
+    def append(self, value):
+        super().append(value)
+        self._mutated()
+
+    def extend(self, values):
+        super().extend(values)
+        self._mutated()
+
+    def insert(self, index, value):
+        super().insert(index, value)
+        self._mutated()
+
+    def remove(self, value):
+        super().remove(value)
+        self._mutated()
+
+    def pop(self, index=-1):
+        value = super().pop(index)
+        self._mutated()
+        return value
+
+    def clear(self):
+        super().clear()
+        self._mutated()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._mutated()
+
+    def reverse(self):
+        super().reverse()
+        self._mutated()
+
+
+class ThreatDatabase(dict):
+    """Known-threat mapping with a version counter bumped on every mutation.
+
+    Category lists are wrapped in ThreatList, so in-place edits through a list reference
+    (including the module-level aliases below) invalidate the lookup index as well.
+    """
+
+    def __init__(self, threats: Dict = None):
+        super().__init__()
+        self.version = 0
+        for category, threats_list in (threats or {}).items():
+            self[category] = threats_list
+
+    def _mutated(self):
+        self.version += 1
+
+    def _wrap(self, value):
+        if isinstance(value, list) and not (isinstance(value, ThreatList) and value._database is self):
+            return ThreatList(self, value)
+        return value
+
+    def __setitem__(self, category, value):
+        super().__setitem__(category, self._wrap(value))
+        self._mutated()
+
+    def __delitem__(self, category):
+        super().__delitem__(category)
+        self._mutated()
+
+    def setdefault(self, category, default=None):
+        if category not in self:
+            self[category] = default
+        return self[category]
+
+    def update(self, *args, **kwargs):
+        for category, value in dict(*args, **kwargs).items():
+            self[category] = value
+
+    def pop(self, category, *default):
+        value = super().pop(category, *default)
+        self._mutated()
+        return value
+
+    def popitem(self):
+        item = super().popitem()
+        self._mutated()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._mutated()
+
+
+class ThreatMatcherIndex:
+    """Precompiled lookup index over the known threat database.
+
+    Addresses and IPs live in hash sets and are matched against the whole value and
+    each of its tokens; domains, actors and any other category go through a single
+    Aho-Corasick automaton, so lookup cost is independent of the number of threats.
+    """
+
+    def __init__(self):
+        self.exact: Dict[str, Set[str]] = {}
+        self.automaton = AhoCorasickAutomaton()
+        self.category_order: Dict[str, int] = {}
+        # Database object and version this index reflects; see is_current()
+        self.source: Optional[Dict] = None
+        self.version = -1
+
+    @classmethod
+    def build(cls, known_threats: Dict) -> "ThreatMatcherIndex":
+        index = cls()
+        for category, threats in known_threats.items():
+            if isinstance(threats, list):
+                for threat in threats:
+                    index.add(category, threat)
+        index.source = known_threats
+        index.version = getattr(known_threats, "version", -1)
+        return index
+
+    def is_current(self, known_threats: Dict) -> bool:
+        """True if the index was built from, or kept in step with, this exact database version"""
+        return (
+            self.source is known_threats
+            and isinstance(known_threats, ThreatDatabase)
+            and self.version == known_threats.version
+        )
+
+    def add(self, category: str, threat: Any):
+        """Index a single threat value under its category"""
+        if not isinstance(threat, str):
+            return
+        pattern = threat.lower()
+        if not pattern:
+            return
+        self.category_order.setdefault(category, len(self.category_order))
+        pattern_token = pattern.strip()
+        # Entries that are not a single token could never equal one; keep substring matching for them
+        if category in EXACT_MATCH_CATEGORIES and pattern_token and not _TOKEN_SPLIT_RE.search(pattern_token):
+            self.exact.setdefault(pattern_token, set()).add(category)
+        else:
+            self.automaton.add(pattern, category)
+
+    def match(self, value_lower: str) -> Optional[str]:
+        """Return the matching category, preferring the last one in database order"""
+        matches = self.automaton.search(value_lower)
+
+        if self.exact:
+            hit = self.exact.get(value_lower)
+            if hit:
+                matches |= hit
+            for token in _TOKEN_SPLIT_RE.split(value_lower):
+                hit = self.exact.get(token)
+                if hit:
+                    matches |= hit
+
+        if not matches:
+            return None
+        return max(matches, key=lambda category: self.category_order.get(category, -1))
+
+
 class EvolvingThreatDefinitions:
     """Self-evolving threat definitions that adapt and improve autonomously"""
     
@@ -74,6 +330,14 @@ class EvolvingThreatDefinitions:
             "accuracy": 0.0
         }
 
+    @property
+    def known_threats(self) -> ThreatDatabase:
+        return self._known_threats
+
+    @known_threats.setter
+    def known_threats(self, threats: Dict):
+        self._known_threats = threats if isinstance(threats, ThreatDatabase) else ThreatDatabase(threats)
+
     def load_threat_database(self):
         """Load existing threat database or create new one"""
         try:
@@ -88,6 +352,8 @@ class EvolvingThreatDefinitions:
             logger.error(f"Error loading threat database: {e}")
             self.initialize_base_threats()
 
+        self.rebuild_threat_index()
+
     def initialize_base_threats(self):
         """Initialize with base threat knowledge"""
         self.known_threats = {
@@ -130,19 +396,16 @@ class EvolvingThreatDefinitions:
             "recommended_action": "none"
         }
         
-        # Check against known threats
-        for category, threats in self.known_threats.items():
-            if isinstance(threats, list):
-                for threat in threats:
-                    if threat.lower() in value_lower:
-                        threat_result.update({
-                            "is_threat": True,
-                            "confidence": 0.9,
-                            "threat_type": category,
-                            "severity": 8,
-                            "recommended_action": "block"
-                        })
-                        break
+        # Check against known threats through the precompiled index
+        matched_category = self._get_threat_index().match(value_lower)
+        if matched_category:
+            threat_result.update({
+                "is_threat": True,
+                "confidence": 0.9,
+                "threat_type": matched_category,
+                "severity": 8,
+                "recommended_action": "block"
+            })
         
         # Analyze patterns dynamically
         pattern_confidence = self._analyze_patterns(value, context)
@@ -160,6 +423,25 @@ class EvolvingThreatDefinitions:
         
         return threat_result
 
+    def rebuild_threat_index(self):
+        """Recompile the lookup index from the full threat database"""
+        self._threat_index = ThreatMatcherIndex.build(self.known_threats)
+
+    def _get_threat_index(self) -> ThreatMatcherIndex:
+        """Return the lookup index, rebuilding it if the database changed behind its back"""
+        index = getattr(self, "_threat_index", None)
+        if index is None or not index.is_current(self.known_threats):
+            self.rebuild_threat_index()
+        return self._threat_index
+
+    def _add_known_threat(self, category: str, threat_value: str):
+        """Append a threat to the database and index it incrementally"""
+        # Bring the index up to date first, so advancing its version below skips no other change
+        index = self._get_threat_index()
+        self.known_threats.setdefault(category, []).append(threat_value)
+        index.add(category, threat_value)
+        index.version = self.known_threats.version
+
     def _analyze_patterns(self, value: str, context: Dict = None) -> float:
         """Analyze value against learned patterns"""
         confidence = 0.0
@@ -264,11 +546,8 @@ class EvolvingThreatDefinitions:
                 # Autonomous learning - agent decides to integrate this threat
                 category = self._categorize_threat(threat_data)
                 
-                if category not in self.known_threats:
-                    self.known_threats[category] = []
-                
-                if threat_value not in self.known_threats[category]:
-                    self.known_threats[category].append(threat_value)
+                if threat_value not in self.known_threats.get(category, []):
+                    self._add_known_threat(category, threat_value)
                     
                     # Log the autonomous learning decision
                     self._log_evolution_decision("learn_new_threat", {
@@ -446,6 +725,7 @@ class EvolvingThreatDefinitions:
                         threat_value = threat_data.get("value", "")
                         
                         if category in self.known_threats and threat_value in self.known_threats[category]:
+                            # The version bump makes the next lookup rebuild the index
                             self.known_threats[category].remove(threat_value)
                             logger.info(f"Reverted learning of threat: {threat_value}")
                             return True
@@ -0,0 +1,224 @@
+"""
+Sliding-Window Rate Limiting for the GuardianShield API
+Per-IP request limits with O(1) work per request, shareable across workers
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+RATE_LIMIT_BACKEND_ENV = "GUARDIAN_RATE_LIMIT_BACKEND"  # memory, shm[:path] or a redis:// URL
+LOCAL_MAX_KEYS = 100000  # Tracked IPs per worker before the least recently seen are dropped
+SHARED_TABLE_SLOTS = 65536
+SLOT_PROBES = 4  # Slots per bucket in the shared table
+_SLOT = struct.Struct("<QqII")  # key fingerprint, window index, current count, previous count
+
+def _window_position(now: float, period: float) -> tuple:
+    """(window index, fraction of the current window elapsed)"""
+    window, offset = divmod(now, period)
+    return int(window), offset / period
+
+def _roll(window: int, entry_window: int, current: int, previous: int) -> tuple:
+    """Counts as seen from window; anything older than the previous window has expired"""
+    if entry_window == window:
+        return current, previous
+    if entry_window == window - 1:
+        return 0, current
+    return 0, 0
+
+class LocalWindowStore:
+    """
+    Sliding-window counters in this process.
+    
+    Each key keeps only the counts of the current and previous fixed
+    windows; the previous count is weighted by how much of it still lies
+    inside the sliding window. Keys idle for two windows are dropped.
+    """
+    
+    def __init__(self, period: float, max_keys: int = LOCAL_MAX_KEYS):
+        self.period = period
+        self.max_keys = max_keys
+        self.windows = OrderedDict()  # key -> [window index, current count, previous count], least recent first
+    
+    async def acquire(self, key: str, limit: int, now: Optional[float] = None) -> bool:
+        return self.hit(key, limit, now)
+    
+    def hit(self, key: str, limit: int, now: Optional[float] = None) -> bool:
+        """Count a request for key if it is under limit; returns whether it was allowed"""
+        window, elapsed = _window_position(time.time() if now is None else now, self.period)
+        entry = self.windows.get(key)
+        if entry is None:
+            entry = self.windows[key] = [window, 0, 0]
+        else:
+            self.windows.move_to_end(key)
+            entry[1], entry[2] = _roll(window, *entry)
+            entry[0] = window
+        
+        allowed = entry[2] * (1 - elapsed) + entry[1] < limit
+        if allowed:
+            entry[1] += 1
+        self._expire(window)
+        return allowed
+    
+    def _expire(self, window: int):
+        # Least recently seen keys come first, so stop at the first live one
+        while self.windows:
+            key, entry = next(iter(self.windows.items()))
+            if entry[0] >= window - 1 and len(self.windows) <= self.max_keys:
+                break
+            self.windows.popitem(last=False)
+    
+    def __len__(self) -> int:
+        return len(self.windows)
+
+class SharedMemoryWindowStore:
+    """
+    Sliding-window counters in a memory-mapped table shared by every worker on this host.
+    
+    A key hashes to a bucket of SLOT_PROBES slots, and only that bucket is
+    locked (POSIX byte-range lock) while it is updated. Slots unused for two
+    windows are reclaimed. When every slot in a bucket is live, the key
+    shares the least used one, which can only make its limit stricter.
+    """
+    
+    def __init__(self, period: float, path: Optional[str] = None, slots: int = SHARED_TABLE_SLOTS):
+        if not FCNTL_AVAILABLE:
+            raise RuntimeError("Shared-memory rate limiting needs POSIX file locks")
+        shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        self.period = period
+        self.path = path or os.path.join(shm_dir, "guardianshield_rate_limit.tbl")
+        
+        size = (slots // SLOT_PROBES) * SLOT_PROBES * _SLOT.size
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        size = os.fstat(self.fd).st_size  # An existing table may be larger; use all of it
+        self.buckets = size // (SLOT_PROBES * _SLOT.size)
+        self.table = mmap.mmap(self.fd, self.buckets * SLOT_PROBES * _SLOT.size)
+    
+    async def acquire(self, key: str, limit: int, now: Optional[float] = None) -> bool:
+        return self.hit(key, limit, now)
+    
+    def hit(self, key: str, limit: int, now: Optional[float] = None) -> bool:
+        window, elapsed = _window_position(time.time() if now is None else now, self.period)
+        # Zero marks an empty slot, so fingerprints start at 1
+        fingerprint = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        first = (fingerprint % self.buckets) * SLOT_PROBES
+        
+        fcntl.lockf(self.fd, fcntl.LOCK_EX, SLOT_PROBES * _SLOT.size, first * _SLOT.size)
+        try:
+            slot, current, previous = self._find_slot(first, fingerprint, window)
+            allowed = previous * (1 - elapsed) + current < limit
+            if allowed:
+                current += 1
+            _SLOT.pack_into(self.table, slot * _SLOT.size, fingerprint, window, current, previous)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN, SLOT_PROBES * _SLOT.size, first * _SLOT.size)
+        return allowed
+    
+    def _find_slot(self, first: int, fingerprint: int, window: int) -> tuple:
+        """(slot, current count, previous count) for fingerprint within its bucket"""
+        free = None
+        least_used = None
+        for slot in range(first, first + SLOT_PROBES):
+            slot_fingerprint, slot_window, current, previous = _SLOT.unpack_from(self.table, slot * _SLOT.size)
+            current, previous = _roll(window, slot_window, current, previous)
+            if slot_fingerprint == fingerprint:
+                return slot, current, previous
+            if current == 0 and previous == 0:
+                if free is None:
+                    free = slot
+            elif least_used is None or current + previous < least_used[1] + least_used[2]:
+                least_used = (slot, current, previous)
+        if free is not None:
+            return free, 0, 0
+        return least_used
+    
+    def close(self):
+        self.table.close()
+        os.close(self.fd)
+
+class RedisWindowStore:
+    """
+    Sliding-window counters in Redis, shared by every worker and host.
+    
+    The check and increment run in one Lua script so concurrent workers
+    cannot both take the last slot. Window keys expire after two periods.
+    If Redis is unreachable, limits fall back to this worker's own counters.
+    """
+    
+    SCRIPT = """
+    local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+    local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+    if previous * tonumber(ARGV[1]) + current >= tonumber(ARGV[2]) then
+        return 0
+    end
+    redis.call('INCR', KEYS[1])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return 1
+    """
+    
+    def __init__(self, client, period: float, prefix: str = "guardian:ratelimit:"):
+        self.client = client
+        self.period = period
+        self.prefix = prefix
+        self.script = client.register_script(self.SCRIPT)
+        self.fallback = LocalWindowStore(period)
+    
+    async def acquire(self, key: str, limit: int, now: Optional[float] = None) -> bool:
+        window, elapsed = _window_position(time.time() if now is None else now, self.period)
+        keys = [f"{self.prefix}{key}:{window}", f"{self.prefix}{key}:{window - 1}"]
+        try:
+            allowed = await self.script(keys=keys, args=[1 - elapsed, limit, int(self.period * 2) + 1])
+        except Exception:
+            return self.fallback.hit(key, limit, now)
+        return bool(allowed)
+
+def create_window_store(period: float, backend: Optional[str] = None):
+    """Store named by backend or GUARDIAN_RATE_LIMIT_BACKEND: memory (default), shm[:path] or redis://..."""
+    backend = backend if backend is not None else os.getenv(RATE_LIMIT_BACKEND_ENV, "memory")
+    if backend.startswith(("redis://", "rediss://", "unix://")):
+        import redis.asyncio as aioredis
+        return RedisWindowStore(aioredis.from_url(backend), period)
+    if backend == "shm" or backend.startswith("shm:"):
+        return SharedMemoryWindowStore(period, path=backend[4:] or None)
+    return LocalWindowStore(period)
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """
+    Rate limiting middleware to prevent abuse of API endpoints.
+    Implements sliding window rate limiting per IP address.
+    """
+    def __init__(self, app, calls: int = 100, period: int = 60, store=None):
+        super().__init__(app)
+        self.calls = calls  # Max calls allowed
+        self.period = period  # Time period in seconds
+        self.store = store or create_window_store(period)
+    
+    async def dispatch(self, request: Request, call_next):
+        if not await self.store.acquire(request.client.host, self.calls):
+            return JSONResponse(
+                status_code=429,
+                content={
+                    "detail": "Rate limit exceeded. Please try again later.",
+                    "error": "too_many_requests"
+                }
+            )
+        
+        response = await call_next(request)
+        return response
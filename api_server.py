@@ -27,6 +27,9 @@ from advanced_api_security import (
     advanced_security,
     api_key_auth
 )
+# Sliding-window per-IP limiter, optionally shared across workers
+from api_rate_limiter import RateLimitMiddleware
+from agent_registry import AgentRegistry
 # Import IP protection system
 from ip_protection_manager import ip_protection, get_client_ip, require_admin_ip
 import json
@@ -37,7 +40,6 @@ from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, validator
 import uvicorn
 import os
-from collections import defaultdict
 import re
 
 
@@ -66,44 +68,6 @@ class InputValidator:
             raise ValueError("Input data too large")
         return data
 
-# Rate Limiting Middleware
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """
-    Rate limiting middleware to prevent abuse of API endpoints.
-    Implements sliding window rate limiting per IP address.
-    """
-    def __init__(self, app, calls: int = 100, period: int = 60):
-        super().__init__(app)
-        self.calls = calls  # Max calls allowed
-        self.period = period  # Time period in seconds
-        self.clients = defaultdict(list)  # IP -> list of timestamps
-    
-    async def dispatch(self, request: Request, call_next):
-        client_ip = request.client.host
-        now = time.time()
-        
-        # Clean old requests outside the time window
-        self.clients[client_ip] = [
-            req_time for req_time in self.clients[client_ip]
-            if now - req_time < self.period
-        ]
-        
-        # Check rate limit
-        if len(self.clients[client_ip]) >= self.calls:
-            return JSONResponse(
-                status_code=429,
-                content={
-                    "detail": "Rate limit exceeded. Please try again later.",
-                    "error": "too_many_requests"
-                }
-            )
-        
-        # Add current request timestamp
-        self.clients[client_ip].append(now)
-        
-        response = await call_next(request)
-        return response
-
 # Security Headers Middleware
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
     """
@@ -245,6 +209,23 @@ app.mount("/static", StaticFiles(directory="frontend"), name="static")
 # Initialize admin console
 admin_console = AdminConsole()
 
+# Agents are created once at startup; endpoints serve their latest cycle
+BEHAVIORAL_ANALYTICS_TTL = 30  # Seconds a behavioral analytics result is served before refreshing
+DMER_MONITOR_TTL = 300  # The DMER agent only reports that it is up; its cycles run outside the API
+agent_registry = AgentRegistry()
+agent_registry.register(
+    "behavioral_analytics",
+    BehavioralAnalyticsAgent,
+    lambda agent: agent.run() if hasattr(agent, 'run') else {"status": "agent_active"},
+    ttl=BEHAVIORAL_ANALYTICS_TTL
+)
+agent_registry.register(
+    "dmer_monitor",
+    DmerMonitorAgent,
+    lambda agent: agent.run() if hasattr(agent, 'run') else {"status": "agent_active"},
+    ttl=DMER_MONITOR_TTL
+)
+
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
@@ -775,7 +756,8 @@ async def get_agents(user = Depends(get_current_user)):
                 "accuracy": 96.2,
                 "autonomyLevel": 9
             }
-        ]
+        ],
+        "registry": agent_registry.get_status()
     }
 
 @app.post("/api/agents/{agent_id}/start")
@@ -936,24 +918,20 @@ async def emergency_stop(master_admin = Depends(require_master_admin)):
         raise HTTPException(status_code=500, detail=str(e))
 
 # Example: Endpoint to run Behavioral Analytics Agent
-def get_behavioral_analytics_result():
-    agent = BehavioralAnalyticsAgent()
-    result = agent.run() if hasattr(agent, 'run') else {"status": "agent_active"}
-    return result
+async def get_behavioral_analytics_result():
+    return await agent_registry.get_result("behavioral_analytics")
 
 @app.get("/api/behavioral-analytics")
-def behavioral_analytics():
-    return {"result": get_behavioral_analytics_result()}
+async def behavioral_analytics():
+    return {"result": await get_behavioral_analytics_result()}
 
 # Example: Endpoint to run DMER Monitor Agent
-def get_dmer_monitor_result():
-    agent = DmerMonitorAgent()
-    result = agent.run() if hasattr(agent, 'run') else {"status": "agent_active"}
-    return result
+async def get_dmer_monitor_result():
+    return await agent_registry.get_result("dmer_monitor")
 
 @app.get("/api/dmer-monitor")
-def dmer_monitor():
-    return {"result": get_dmer_monitor_result()}
+async def dmer_monitor():
+    return {"result": await get_dmer_monitor_result()}
 
 # WebSocket endpoint for real-time updates
 @app.websocket("/ws/dashboard")
@@ -999,6 +977,11 @@ async def simulate_real_time_data():
 @app.on_event("startup")
 async def startup_event():
     asyncio.create_task(simulate_real_time_data())
+    await agent_registry.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    agent_registry.shutdown()
 
 # Add more endpoints for other agents as needed
 
@@ -0,0 +1,100 @@
+"""
+Benchmark: RateLimitMiddleware overhead per request
+
+Compares the previous per-IP timestamp lists with the sliding-window
+counter stores (in-process, shared-memory table, and Redis when reachable).
+dispatch() is called directly with a no-op downstream handler, so the
+numbers are the limiter's own cost.
+
+Usage:
+    python benchmarks/bench_api_rate_limiter.py [--requests 200000] [--ips 1000] [--calls 100 1000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from starlette.responses import Response
+
+from api_rate_limiter import (
+    LocalWindowStore, RateLimitMiddleware, RedisWindowStore, SharedMemoryWindowStore
+)
+
+
+class LegacyStore:
+    """The previous limiter: a list of timestamps per IP, filtered on every request"""
+
+    def __init__(self, period):
+        self.period = period
+        self.clients = defaultdict(list)
+
+    async def acquire(self, key, limit, now=None):
+        now = time.time()
+        self.clients[key] = [t for t in self.clients[key] if now - t < self.period]
+        if len(self.clients[key]) >= limit:
+            return False
+        self.clients[key].append(now)
+        return True
+
+
+async def downstream(request):
+    return Response()
+
+
+async def run(store, calls, requests, ips):
+    middleware = RateLimitMiddleware(None, calls=calls, period=60, store=store)
+    clients = [
+        SimpleNamespace(client=SimpleNamespace(host=f"10.0.{i // 256}.{i % 256}"))
+        for i in range(ips)
+    ]
+    limited = 0
+    start = time.perf_counter()
+    for i in range(requests):
+        response = await middleware.dispatch(clients[i % ips], downstream)
+        limited += response.status_code == 429
+    return (time.perf_counter() - start) / requests * 1e6, limited
+
+
+async def redis_store(period):
+    try:
+        import redis.asyncio as aioredis
+        client = aioredis.from_url("redis://localhost:6379")
+        await client.ping()
+    except Exception:
+        return None
+    return RedisWindowStore(client, period, prefix=f"bench:{os.getpid()}:")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=200000)
+    parser.add_argument('--ips', type=int, default=1000)
+    parser.add_argument('--calls', type=int, nargs='+', default=[100, 1000])
+    args = parser.parse_args()
+
+    print(f"{args.requests:,} requests from {args.ips:,} IPs")
+    print(f"{'store':<14}{'limit':>8}{'us/request':>12}{'429s':>10}")
+    with tempfile.TemporaryDirectory() as table_dir:
+        for calls in args.calls:
+            stores = {
+                "legacy": LegacyStore(60),
+                "local": LocalWindowStore(60),
+                "shared-memory": SharedMemoryWindowStore(60, path=os.path.join(table_dir, f"table-{calls}")),
+                "redis": asyncio.run(redis_store(60)),
+            }
+            for name, store in stores.items():
+                if store is None:
+                    print(f"{name:<14}{calls:>8}{'skipped (no Redis on localhost:6379)':>40}")
+                    continue
+                per_request, limited = asyncio.run(run(store, calls, args.requests, args.ips))
+                print(f"{name:<14}{calls:>8}{per_request:>12.2f}{limited:>10,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark: block propagation latency across a local RealBlockchainNode network
+
+Compares the legacy broadcast (blocking requests.post to every peer in turn,
+no relaying) with the async gossip layer (shared keep-alive pool, concurrent
+fan-out, relay with per-peer deduplication).
+
+Usage:
+    python benchmarks/bench_block_gossip.py [--sizes 3 10 50] [--blocks 5] [--slow-ms 0]
+
+Every node runs in this process with its real HTTP server on localhost.
+Latency is measured from the moment the miner hands the block to
+broadcast_block until each peer has appended it. --slow-ms makes one peer
+take that long to answer /receive_block, to show head-of-line blocking.
+"""
+import argparse
+import contextlib
+import copy
+import io
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import requests
+
+from real_guardianshield_blockchain import RealBlockchainNode
+
+BASE_PORT = 47000
+
+
+class BenchNode(RealBlockchainNode):
+    """Node that timestamps the arrival of every block"""
+
+    def __init__(self, *args, arrivals, slow_seconds=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.arrivals = arrivals
+        self.slow_seconds = slow_seconds
+
+    def receive_block(self, block, origin_port=None):
+        if self.slow_seconds:
+            time.sleep(self.slow_seconds)
+        return super().receive_block(block, origin_port)
+
+    def append_block(self, block):
+        super().append_block(block)
+        self.arrivals[block["hash"]][self.port] = time.perf_counter()
+
+
+class LegacyBenchNode(BenchNode):
+    """Node using the previous sequential broadcast"""
+
+    def broadcast_block(self, block, origin_port=None):
+        if origin_port is not None:
+            return  # The legacy network did not relay
+        for peer_port in self.peers:
+            try:
+                requests.post(f"http://localhost:{peer_port + 1000}/receive_block", json=block, timeout=5)
+            except requests.exceptions.RequestException:
+                pass
+
+
+def build_network(node_class, size, degree, slow_ms, arrivals):
+    nodes = [
+        node_class(f"bench_{i}", BASE_PORT + i, arrivals=arrivals,
+                   slow_seconds=slow_ms / 1000 if i == size - 1 else 0.0)
+        for i in range(size)
+    ]
+    genesis = nodes[0].create_genesis_block()
+    for node in nodes[1:]:
+        node.blockchain.append(copy.deepcopy(genesis))
+        node._index_transactions(genesis)
+
+    # Ring for connectivity plus random chords up to the target degree
+    rng = random.Random(size)
+    for i, node in enumerate(nodes):
+        node.connect_to_peer(nodes[(i + 1) % size].port)
+        nodes[(i + 1) % size].connect_to_peer(node.port)
+        while len(node.peers) < min(degree, size - 1):
+            other = nodes[rng.randrange(size)]
+            node.connect_to_peer(other.port)
+            other.connect_to_peer(node.port)
+
+    for node in nodes:
+        node.start_http_server()
+        node.gossip.start()
+        for peer_port in node.peers:
+            node.gossip.add_peer(peer_port)
+    return nodes
+
+
+def propagate(nodes, arrivals, blocks, timeout):
+    latencies = []
+    missed = 0
+    for round_number in range(blocks):
+        origin = nodes[round_number % len(nodes)]
+        origin.add_transaction("genesis", f"bench_{round_number}", 1)
+
+        # Mine without broadcasting so the timer covers propagation only
+        broadcast = origin.broadcast_block
+        origin.broadcast_block = lambda block, origin_port=None: None
+        block = origin.mine_block()
+        origin.broadcast_block = broadcast
+        for node in nodes:
+            node.mempool.clear()
+
+        start = time.perf_counter()
+        origin.broadcast_block(block)
+        deadline = start + timeout
+        while len(arrivals[block["hash"]]) < len(nodes) and time.perf_counter() < deadline:
+            time.sleep(0.001)
+
+        received = arrivals[block["hash"]]
+        latencies.extend(
+            (received[node.port] - start) * 1000 for node in nodes
+            if node is not origin and node.port in received
+        )
+        missed += len(nodes) - len(received)
+        if missed:
+            break  # Chains diverged; later rounds cannot link
+    return latencies, missed
+
+
+def run(mode, size, args):
+    arrivals = defaultdict(dict)  # block hash -> {node port: arrival time}
+    node_class = LegacyBenchNode if mode == "legacy" else BenchNode
+    degree = size - 1 if mode == "legacy" else args.degree
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        nodes = build_network(node_class, size, degree, args.slow_ms, arrivals)
+        try:
+            latencies, missed = propagate(nodes, arrivals, args.blocks, args.timeout)
+        finally:
+            # Quiesce gossip before servers go away so in-flight relays are not cut off
+            for node in nodes:
+                node.gossip.stop()
+            for node in nodes:
+                node.close()
+    return latencies, missed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[3, 10, 50])
+    parser.add_argument('--blocks', type=int, default=5)
+    parser.add_argument('--degree', type=int, default=8, help="gossip peers per node")
+    parser.add_argument('--slow-ms', type=float, default=0.0)
+    parser.add_argument('--timeout', type=float, default=30.0)
+    args = parser.parse_args()
+
+    print(f"{'nodes':>6}{'mode':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'missed':>8}")
+    for size in args.sizes:
+        for mode in ("legacy", "gossip"):
+            latencies, missed = run(mode, size, args)
+            ordered = sorted(latencies) or [float('nan')]
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            print(f"{size:>6}{mode:>8}{statistics.median(ordered):>10.1f}{p95:>10.1f}"
+                  f"{ordered[-1]:>10.1f}{missed:>8}")
+
+
+if __name__ == "__main__":
+    main()
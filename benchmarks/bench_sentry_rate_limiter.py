@@ -0,0 +1,126 @@
+"""
+Benchmark: SentryRateLimiter.check_rate_limit throughput per core
+
+Compares the legacy hot path (psutil sampled and Redis written on every
+request) with background load sampling plus batched Redis pipelines.
+
+Usage:
+    python benchmarks/bench_sentry_rate_limiter.py [--requests 50000] [--ips 1000]
+
+A local Redis on localhost:6379 is used when reachable. Otherwise requests go
+to an in-process stand-in that charges --redis-rtt-us per round trip, so the
+numbers still reflect how many round trips each mode makes.
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import redis
+
+from sentry_rate_limiter import DEFAULT_CONFIG, SentryRateLimiter
+
+
+class LatencyRedis:
+    """Redis stand-in that spins for a fixed round-trip time per command or pipeline"""
+
+    def __init__(self, rtt_seconds):
+        self.rtt = rtt_seconds
+        self.round_trips = 0
+
+    def _round_trip(self):
+        self.round_trips += 1
+        deadline = time.perf_counter() + self.rtt
+        while time.perf_counter() < deadline:
+            pass
+
+    def incr(self, *args):
+        self._round_trip()
+
+    def expire(self, *args):
+        self._round_trip()
+
+    def lpush(self, *args):
+        self._round_trip()
+
+    def setex(self, *args):
+        self._round_trip()
+
+    def pipeline(self, transaction=True):
+        return _LatencyPipeline(self)
+
+
+class _LatencyPipeline:
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        self.client._round_trip()
+        return []
+
+
+def make_limiter(hot_path_enabled, redis_client, config_dir):
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config['hot_path'].update(
+        background_load_sampling=hot_path_enabled,
+        batched_redis_writes=hot_path_enabled
+    )
+    # Generous limits so every request runs the full accept path
+    config['global_limits'].update(requests_per_second=10 ** 9, burst_allowance=10 ** 9)
+    config['ip_limits'].update(default_requests_per_second=10 ** 9, burst_allowance=10 ** 9)
+    config['adaptive_limits']['load_threshold'] = 1.01
+    config_path = os.path.join(config_dir, f"rate-limiter-{int(hot_path_enabled)}.json")
+    with open(config_path, 'w') as f:
+        json.dump(config, f)
+    limiter = SentryRateLimiter(config_path=config_path, redis_client=redis_client)
+    limiter.start()
+    return limiter
+
+
+async def run(limiter, requests, ips):
+    addresses = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(ips)]
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for i in range(requests):
+        await limiter.check_rate_limit(addresses[i % ips], "/api/v1/balance")
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+    limiter.stop()
+    return requests / elapsed, requests / max(cpu, 1e-9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=50000)
+    parser.add_argument('--ips', type=int, default=1000)
+    parser.add_argument('--redis-rtt-us', type=float, default=50.0)
+    args = parser.parse_args()
+
+    try:
+        client = redis.Redis(host='localhost', port=6379, decode_responses=True)
+        client.ping()
+        backend = "redis://localhost:6379"
+    except Exception:
+        client = LatencyRedis(args.redis_rtt_us / 1e6)
+        backend = f"in-process stand-in ({args.redis_rtt_us:.0f}us RTT)"
+
+    print(f"Backend: {backend}")
+    print(f"{'mode':<10}{'req/s (wall)':>16}{'req/s per core (CPU)':>24}")
+    with tempfile.TemporaryDirectory() as config_dir:
+        for label, enabled in (("legacy", False), ("hot-path", True)):
+            limiter = make_limiter(enabled, client, config_dir)
+            wall_rps, cpu_rps = asyncio.run(run(limiter, args.requests, args.ips))
+            print(f"{label:<10}{wall_rps:>16,.0f}{cpu_rps:>24,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: StableSwap quotes, exact invariant vs the previous approximation
+
+Accuracy: for a grid of amplification, pool imbalance and trade size, the
+previous hard-coded approximation is compared with the exact invariant
+solver, whose output is checked to leave D unchanged. Throughput: quotes
+per second for the approximation, the exact solver re-solving D on every
+quote, and the exact solver with D cached between reserve changes.
+
+Usage:
+    python benchmarks/bench_stableswap.py [--quotes 20000] [--amplifications 10 100 1000]
+"""
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from liquidity_stableswap import StableSwapInvariant, compute_d, compute_y, to_fixed
+
+FEE = Decimal('0.003')
+IMBALANCES = [Decimal('1'), Decimal('2'), Decimal('5')]
+TRADE_SHARES = [Decimal('0.0001'), Decimal('0.01'), Decimal('0.1'), Decimal('0.3')]
+BASE_RESERVE = Decimal('1000000')
+
+
+def legacy_output(reserve_in, reserve_out, amount_in, amplification=Decimal('100')):
+    """The previous _calculate_stable_swap_output"""
+    amount_in_with_fee = amount_in * (Decimal('1') - FEE)
+    ratio = amount_in_with_fee / (reserve_in + amount_in_with_fee)
+    return reserve_out * ratio * (Decimal('1') - ratio / amplification)
+
+
+def accuracy(amplifications):
+    print(f"{'A':>6} {'in:out':>7} {'trade':>7} {'exact out':>16} {'legacy out':>16} {'legacy err':>11} {'D drift':>8}")
+    worst = Decimal('0')
+    for amplification in amplifications:
+        for imbalance in IMBALANCES:
+            reserves = {'in': BASE_RESERVE * imbalance, 'out': BASE_RESERVE}
+            invariant = StableSwapInvariant(['in', 'out'], amplification)
+            for share in TRADE_SHARES:
+                amount_in = reserves['in'] * share
+                exact = invariant.output(reserves, 'in', 'out', amount_in * (1 - FEE))
+                # The exact swap must leave D where it was (to rounding)
+                before = invariant.balances(reserves)
+                after = (before[0] + to_fixed(amount_in * (1 - FEE)), before[1] - to_fixed(exact))
+                drift = compute_d(after, amplification) - invariant.invariant(before)
+                legacy = legacy_output(reserves['in'], reserves['out'], amount_in)
+                error = abs(legacy - exact) / exact
+                worst = max(worst, error)
+                print(f"{amplification:>6} {str(imbalance) + ':1':>7} {float(share):>7.2%} "
+                      f"{float(exact):>16,.4f} {float(legacy):>16,.4f} {float(error):>11.4%} {drift:>8}")
+    print(f"Worst legacy error: {float(worst):.2%}\n")
+
+
+def throughput(quotes, amplification):
+    reserves = {'in': BASE_RESERVE * 2, 'out': BASE_RESERVE, 'third': BASE_RESERVE}
+    amounts = [Decimal(100 + i % 1000) for i in range(quotes)]
+
+    start = time.perf_counter()
+    for amount in amounts:
+        legacy_output(reserves['in'], reserves['out'], amount)
+    legacy = quotes / (time.perf_counter() - start)
+
+    results = {'legacy approximation': legacy}
+    for tokens in (['in', 'out'], ['in', 'out', 'third']):
+        invariant = StableSwapInvariant(tokens, amplification)
+        balances = invariant.balances(reserves)
+
+        start = time.perf_counter()
+        for amount in amounts:
+            d = compute_d(balances, amplification)
+            compute_y(0, 1, balances[0] + to_fixed(amount), balances, amplification, d)
+        results[f'exact, D every quote ({len(tokens)} tokens)'] = quotes / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for amount in amounts:
+            invariant.output(reserves, 'in', 'out', amount)
+        results[f'exact, cached D ({len(tokens)} tokens)'] = quotes / (time.perf_counter() - start)
+
+    print(f"Throughput, A={amplification}, {quotes} quotes")
+    for name, rate in results.items():
+        print(f"  {name:<34} {rate:>10,.0f} quotes/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--quotes', type=int, default=20000)
+    parser.add_argument('--amplifications', type=int, nargs='+', default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    accuracy(args.amplifications)
+    throughput(args.quotes, 100)
+
+
+if __name__ == "__main__":
+    main()
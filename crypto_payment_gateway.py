@@ -19,6 +19,8 @@ from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
 
+from price_oracle_service import PriceSnapshot, get_price_service
+
 # Supported Cryptocurrencies
 class SupportedCrypto(str, Enum):
     BTC = "bitcoin"
@@ -77,42 +79,17 @@ class CryptoPayment:
     network_fee: float
 
 class CryptoPrice:
-    """Real-time cryptocurrency price fetcher"""
+    """Cryptocurrency prices from the shared, background-refreshed price service"""
     
     @staticmethod
     def get_prices() -> Dict[str, float]:
         """Get current crypto prices in USD"""
-        try:
-            # Fallback prices (in production, use real API like CoinGecko)
-            prices = {
-                'bitcoin': 45000.0,
-                'ethereum': 3200.0,
-                'solana': 85.0,
-                'binancecoin': 320.0,
-                'cardano': 0.65,
-                'tether': 1.0,
-                'usd-coin': 1.0,
-                'guardianshield': 0.85
-            }
-            
-            # In production, replace with real API call:
-            # response = requests.get('https://api.coingecko.com/api/v3/simple/price?ids=bitcoin,ethereum,solana,binancecoin,cardano,tether,usd-coin&vs_currencies=usd')
-            # if response.status_code == 200:
-            #     prices.update(response.json())
-            
-            return prices
-        except Exception:
-            # Fallback prices
-            return {
-                'bitcoin': 45000.0,
-                'ethereum': 3200.0,
-                'solana': 85.0,
-                'binancecoin': 320.0,
-                'cardano': 0.65,
-                'tether': 1.0,
-                'usd-coin': 1.0,
-                'guardianshield': 0.85
-            }
+        return get_price_service().get_prices()
+    
+    @staticmethod
+    def get_snapshot() -> PriceSnapshot:
+        """Current price snapshot; read-only, and never waits on a price feed"""
+        return get_price_service().snapshot
 
 class PaymentGateway:
     """Manages cryptocurrency payments and conversions"""
@@ -227,7 +204,7 @@ class PaymentGateway:
     
     def calculate_guard_equivalent(self, amount: float, currency: SupportedCrypto) -> tuple[float, float]:
         """Calculate GUARD token equivalent and conversion rate"""
-        prices = self.crypto_prices.get_prices()
+        prices = self.crypto_prices.get_snapshot().prices
         
         crypto_price_usd = prices.get(currency.value, 1.0)
         guard_price_usd = prices.get('guardianshield', 0.85)
@@ -12,6 +12,7 @@ import sqlite3
 import hashlib
 import json
 import random
+import weakref
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 from dataclasses import dataclass
@@ -22,6 +23,8 @@ from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
 
+from price_oracle_service import CallablePriceSource, PriceOracleService, get_price_service
+
 import os
 from fastapi import HTTPException
 
@@ -127,6 +130,20 @@ class GuardPurchase:
     fees: float
     net_amount: float
 
+GUARD_PRICE_REFRESH_SECONDS = 30  # Market data and the dynamic GUARD price are recomputed this often
+GUARD_PRICE_KEY = 'guard-sale'
+
+# Payment currency symbol -> key in the shared price service
+CRYPTO_PRICE_IDS = {
+    'BTC': 'bitcoin',
+    'ETH': 'ethereum',
+    'SOL': 'solana',
+    'BNB': 'binancecoin',
+    'ADA': 'cardano',
+    'USDT': 'tether',
+    'USDC': 'usd-coin'
+}
+
 class TokenPurchaseManager:
     """Manages GUARD token purchases and delivery"""
     
@@ -139,7 +156,19 @@ class TokenPurchaseManager:
         self.total_supply = 5_000_000_000  # 5 billion tokens
         self.circulating_supply = 300_000_000  # Initial 300M in circulation
         self.liquidity_pool_usd = 50_000  # Starting liquidity pool
-        self.guard_price_usd = self.calculate_dynamic_price()
+        
+        # The dynamic price lives in this manager's own price service, separate from the shared
+        # crypto prices. It starts with the app (or on the first quote), and even its first
+        # database-backed refresh runs in the background, so quotes use base_price_usd until it
+        # lands. The refresh holds the manager weakly, and collecting the manager stops the
+        # refresh thread. Once closed, quotes keep the last price and never restart it.
+        self.closed = False
+        manager = weakref.ref(self)
+        self.guard_prices = PriceOracleService([CallablePriceSource(
+            GUARD_PRICE_KEY, lambda: manager()._refresh_market_price(), interval=GUARD_PRICE_REFRESH_SECONDS,
+            local=False
+        )])
+        weakref.finalize(self, self.guard_prices.stop)
         
         # Supported fiat currencies with exchange rates
         self.fiat_rates = {
@@ -151,7 +180,7 @@ class TokenPurchaseManager:
             'AUD': 1.35
         }
         
-        # Crypto exchange rates (simplified)
+        # Crypto exchange rates, used while the price service has no quote
         self.crypto_rates = {
             'BTC': 45000.0,
             'ETH': 3200.0,
@@ -170,10 +199,37 @@ class TokenPurchaseManager:
             'FIRST5': 0.05     # 5% discount
         }
     
-    def calculate_dynamic_price(self) -> float:
+    @property
+    def guard_price_usd(self) -> float:
+        """Latest dynamic GUARD price from the price snapshot"""
+        return self._guard_price_snapshot().prices.get(GUARD_PRICE_KEY, self.base_price_usd)
+    
+    def _guard_price_snapshot(self):
+        if not self.guard_prices.started and not self.closed:
+            self.start()
+        return self.guard_prices.snapshot
+    
+    def _refresh_market_price(self) -> Dict[str, float]:
+        return {GUARD_PRICE_KEY: self.calculate_dynamic_price(self.get_market_data())}
+    
+    def start(self):
+        """Start refreshing the dynamic GUARD price in the background, unless closed"""
+        if not self.closed:
+            self.guard_prices.start()
+    
+    def close(self):
+        """Stop refreshing the dynamic GUARD price for good"""
+        self.closed = True
+        self.guard_prices.stop()
+    
+    def _crypto_rate(self, symbol: str, prices: Dict[str, float]) -> float:
+        return prices.get(CRYPTO_PRICE_IDS.get(symbol), self.crypto_rates[symbol])
+    
+    def calculate_dynamic_price(self, market_data: Optional[Dict] = None) -> float:
         """Calculate dynamic GUARD token price based on market conditions"""
         # Get current market data
-        market_data = self.get_market_data()
+        if market_data is None:
+            market_data = self.get_market_data()
         
         # Base price factors
         base_price = self.base_price_usd
@@ -341,8 +397,12 @@ class TokenPurchaseManager:
                                  promo_code: Optional[str] = None) -> Dict:
         """Calculate total purchase amount with fees and discounts"""
         
+        # One snapshot of each service for the whole quote, so every rate comes from the same refresh
+        guard_price_usd = self._guard_price_snapshot().prices.get(GUARD_PRICE_KEY, self.base_price_usd)
+        prices = get_price_service().snapshot.prices
+        
         # Base cost in USD
-        base_cost_usd = guard_amount * self.guard_price_usd
+        base_cost_usd = guard_amount * guard_price_usd
         
         # Apply promo discount
         discount = 0.0
@@ -366,7 +426,7 @@ class TokenPurchaseManager:
             exchange_rate = self.fiat_rates[payment_currency]
             payment_amount = total_cost_usd * exchange_rate
         elif payment_currency in self.crypto_rates:
-            exchange_rate = self.crypto_rates[payment_currency]
+            exchange_rate = self._crypto_rate(payment_currency, prices)
             payment_amount = total_cost_usd / exchange_rate
         else:
             exchange_rate = 1.0
@@ -382,7 +442,8 @@ class TokenPurchaseManager:
             'payment_amount': payment_amount,
             'payment_currency': payment_currency,
             'exchange_rate': exchange_rate,
-            'promo_discount': discount
+            'promo_discount': discount,
+            'guard_price_usd': guard_price_usd
         }
     
     def create_purchase(self, request: GuardPurchaseRequest) -> GuardPurchase:
@@ -404,7 +465,7 @@ class TokenPurchaseManager:
             payment_method=request.payment_method,
             customer_email=request.customer_email,
             customer_wallet=request.customer_wallet,
-            guard_price_usd=self.guard_price_usd,
+            guard_price_usd=calc['guard_price_usd'],
             exchange_rate=calc['exchange_rate'],
             status=PurchaseStatus.PENDING,
             created_timestamp=datetime.now(),
@@ -618,6 +679,14 @@ class TokenPurchaseManager:
 app = FastAPI(title="GuardianShield Token Purchase Platform", version="1.0.0")
 purchase_manager = TokenPurchaseManager()
 
+@app.on_event("startup")
+async def startup_event():
+    purchase_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    purchase_manager.close()
+
 @app.get("/", response_class=HTMLResponse)
 async def token_purchase_platform():
     emergency_check()
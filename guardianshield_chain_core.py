@@ -5,15 +5,29 @@ The foundation of the GuardianShield blockchain network
 """
 
 import asyncio
+import bisect
 import hashlib
+import heapq
+import itertools
 import json
+import multiprocessing
+import os
 import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any, Tuple
+from dataclasses import dataclass, asdict, field
 import threading
 import socket
 import struct
+from guardianshield_chain_store import BlockStore
+
+MEMPOOL_MAX_SIZE = 50000  # Pending transactions kept before fee-rate eviction
+_TX_HASH_FIELDS = frozenset(("from_address", "to_address", "amount", "fee", "timestamp"))
+MINING_CHUNK_SIZE = 20000  # Nonces per worker task
+MINING_CANCEL_CHECK = 1024  # Nonces between cancellation checks inside a task
+MINING_WORKERS = 2  # Default worker processes per node; several nodes may share one machine
+VALIDATOR_WEIGHT_SCALE = 10 ** 9  # Fixed-point units per GSHIELD of selection weight
 
 @dataclass
 class Transaction:
@@ -26,14 +40,32 @@ class Transaction:
     signature: str
     security_score: Optional[float] = None  # AI security assessment
     threat_flags: Optional[List[str]] = None
+    nonce: Optional[int] = None  # Per-sender sequence; arrival order when unset
+    
+    def __setattr__(self, name, value):
+        # Changing a hashed field invalidates the cached hash
+        if name in _TX_HASH_FIELDS:
+            self.__dict__.pop("_cached_hash", None)
+        object.__setattr__(self, name, value)
     
     def to_dict(self) -> Dict:
         return asdict(self)
     
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Transaction":
+        return cls(**data)
+    
     def hash(self) -> str:
-        """Generate transaction hash"""
-        tx_string = f"{self.from_address}{self.to_address}{self.amount}{self.fee}{self.timestamp}"
-        return hashlib.sha256(tx_string.encode()).hexdigest()
+        """Generate transaction hash (computed once and cached)"""
+        cached = self.__dict__.get("_cached_hash")
+        if cached is None:
+            tx_string = f"{self.from_address}{self.to_address}{self.amount}{self.fee}{self.timestamp}"
+            cached = self.__dict__["_cached_hash"] = hashlib.sha256(tx_string.encode()).hexdigest()
+        return cached
+    
+    def size(self) -> int:
+        """Approximate serialized size in bytes, used for fee rate"""
+        return len(self.from_address) + len(self.to_address) + len(self.signature) + 64
     
     def validate_security(self) -> bool:
         """Validate transaction using AI security checks"""
@@ -42,6 +74,270 @@ class Transaction:
             return len(self.threat_flags) == 0
         return True
 
+class MempoolEntry:
+    """Pending transaction with its cached hash, fee rate and ordering keys"""
+    
+    __slots__ = ("tx", "tx_hash", "sender", "fee_rate", "sequence", "arrival", "removed")
+    
+    def __init__(self, tx: Transaction, arrival: int):
+        self.tx = tx
+        self.tx_hash = tx.hash()
+        self.sender = tx.from_address
+        self.fee_rate = tx.fee / max(tx.size(), 1)
+        # Nonces and arrival counters are separate tiers: a sender's nonce'd
+        # transactions come first, then un-nonced ones in arrival order
+        self.sequence = (0, tx.nonce) if tx.nonce is not None else (1, arrival)
+        self.arrival = arrival
+        self.removed = False
+
+class Mempool:
+    """Hash-indexed pending transactions with fee-rate priority and per-sender nonce queues
+    
+    Removal only flags entries; queues and heaps drop flagged entries lazily
+    and the heaps are compacted once stale entries outnumber live ones.
+    """
+    
+    def __init__(self, max_size: int = MEMPOOL_MAX_SIZE):
+        self.max_size = max_size
+        self.entries: Dict[str, MempoolEntry] = {}
+        self.sender_queues: Dict[str, List] = {}  # sender -> sorted [(sequence, arrival, entry)]
+        self.ready_heap: List = []  # (-fee_rate, arrival, entry) for each sender's head
+        self.eviction_heap: List = []  # (fee_rate, -arrival, entry) over all entries
+        self.stats = {"added": 0, "rejected": 0, "evicted": 0, "included": 0}
+        self._arrivals = itertools.count()
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def __contains__(self, tx_hash: str) -> bool:
+        return tx_hash in self.entries
+    
+    def __iter__(self):
+        return (entry.tx for entry in self.entries.values())
+    
+    def get(self, tx_hash: str) -> Optional[Transaction]:
+        entry = self.entries.get(tx_hash)
+        return entry.tx if entry else None
+    
+    def add(self, tx: Transaction) -> bool:
+        """Admit a transaction, evicting the lowest fee rate when the pool is full"""
+        entry = MempoolEntry(tx, next(self._arrivals))
+        if entry.tx_hash in self.entries:
+            self.stats["rejected"] += 1
+            return False
+        
+        if len(self.entries) >= self.max_size:
+            lowest = self._peek_lowest()
+            if lowest is None or entry.fee_rate <= lowest.fee_rate:
+                self.stats["rejected"] += 1
+                return False
+            self._evict(lowest)
+        
+        self.entries[entry.tx_hash] = entry
+        queue = self.sender_queues.setdefault(entry.sender, [])
+        bisect.insort(queue, (entry.sequence, entry.arrival, entry))
+        if self._queue_head(queue) is entry:
+            heapq.heappush(self.ready_heap, (-entry.fee_rate, entry.arrival, entry))
+        heapq.heappush(self.eviction_heap, (entry.fee_rate, -entry.arrival, entry))
+        self.stats["added"] += 1
+        return True
+    
+    def remove(self, tx_hash: str) -> bool:
+        """Drop a transaction in O(1); its queue and heap slots are discarded lazily"""
+        entry = self.entries.pop(tx_hash, None)
+        if entry is None:
+            return False
+        entry.removed = True
+        queue = self.sender_queues[entry.sender]
+        head = self._queue_head(queue)
+        if head is None:
+            del self.sender_queues[entry.sender]
+        elif (head.sequence, head.arrival) > (entry.sequence, entry.arrival):
+            # The sender has a new head; make it eligible for selection
+            heapq.heappush(self.ready_heap, (-head.fee_rate, head.arrival, head))
+        self._maybe_compact()
+        return True
+    
+    def remove_transactions(self, transactions: List[Transaction]) -> int:
+        """Remove transactions included in a block"""
+        removed = sum(1 for tx in transactions if self.remove(tx.hash()))
+        self.stats["included"] += removed
+        return removed
+    
+    def select(self, limit: int) -> List[Transaction]:
+        """Highest fee-rate transactions, in nonce order per sender, in O(k log n)"""
+        selected = []
+        popped_heads = []
+        followers = []  # Next transaction of each sender already selected from
+        seen_heads = set()
+        
+        while len(selected) < limit:
+            head_item = self._peek_ready(seen_heads)
+            if head_item is not None and (not followers or head_item < followers[0]):
+                heapq.heappop(self.ready_heap)
+                popped_heads.append(head_item)
+                seen_heads.add(head_item[2].tx_hash)
+                entry = head_item[2]
+            elif followers:
+                entry = heapq.heappop(followers)[2]
+            else:
+                break
+            
+            selected.append(entry.tx)
+            following = self._next_in_queue(entry)
+            if following is not None:
+                heapq.heappush(followers, (-following.fee_rate, following.arrival, following))
+        
+        # Selection does not consume: heads stay queued until the block is accepted
+        for item in popped_heads:
+            heapq.heappush(self.ready_heap, item)
+        return selected
+    
+    def get_status(self) -> Dict:
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "senders": len(self.sender_queues),
+            **self.stats
+        }
+    
+    def _queue_head(self, queue: List) -> Optional[MempoolEntry]:
+        stale = 0
+        while stale < len(queue) and queue[stale][2].removed:
+            stale += 1
+        if stale:
+            del queue[:stale]
+        return queue[0][2] if queue else None
+    
+    def _next_in_queue(self, entry: MempoolEntry) -> Optional[MempoolEntry]:
+        """Sender's next live transaction after entry"""
+        queue = self.sender_queues.get(entry.sender, [])
+        index = bisect.bisect_right(queue, (entry.sequence, entry.arrival))
+        # bisect_right lands on entry itself, since a 2-tuple sorts before its 3-tuple extension
+        for sequence, arrival, candidate in itertools.islice(queue, index + 1, None):
+            if not candidate.removed:
+                return candidate
+        return None
+    
+    def _peek_ready(self, seen_heads) -> Optional[tuple]:
+        """Best ready item that is still live, still its sender's head and not yet selected"""
+        ready = self.ready_heap
+        while ready:
+            entry = ready[0][2]
+            if (not entry.removed and entry.tx_hash not in seen_heads
+                    and self._queue_head(self.sender_queues[entry.sender]) is entry):
+                return ready[0]
+            heapq.heappop(ready)
+        return None
+    
+    def _peek_lowest(self) -> Optional[MempoolEntry]:
+        heap = self.eviction_heap
+        while heap and heap[0][2].removed:
+            heapq.heappop(heap)
+        return heap[0][2] if heap else None
+    
+    def _evict(self, entry: MempoolEntry):
+        """Evict entry and the sender's later transactions, which can no longer apply"""
+        queue = self.sender_queues[entry.sender]
+        index = bisect.bisect_right(queue, (entry.sequence, entry.arrival))
+        doomed = [candidate.tx_hash for _, _, candidate in queue[index:] if not candidate.removed]
+        for tx_hash in doomed:
+            if self.remove(tx_hash):
+                self.stats["evicted"] += 1
+    
+    def _maybe_compact(self):
+        live = len(self.entries)
+        if len(self.eviction_heap) > 2 * live + 1024:
+            self.eviction_heap = [item for item in self.eviction_heap if not item[2].removed]
+            heapq.heapify(self.eviction_heap)
+        if len(self.ready_heap) > 2 * live + 1024:
+            self.ready_heap = [item for item in self.ready_heap if not item[2].removed]
+            heapq.heapify(self.ready_heap)
+
+EMPTY_MERKLE_ROOT = hashlib.sha256(b"").hexdigest()
+
+class MerkleAccumulator:
+    """Append-only Merkle tree over raw 32-byte digests
+    
+    levels[0] holds the leaves and levels[i + 1] the parents of complete
+    pairs in levels[i], so an append touches at most one node per level.
+    An unpaired node at the end of a level is paired with itself.
+    """
+    
+    def __init__(self, leaves=()):
+        self.levels: List[List[bytes]] = [[]]
+        for leaf in leaves:
+            self.append(leaf)
+    
+    def __len__(self) -> int:
+        return len(self.levels[0])
+    
+    def append(self, leaf: bytes):
+        """Add a leaf digest in O(log n)"""
+        node = leaf
+        level = 0
+        while True:
+            nodes = self.levels[level]
+            nodes.append(node)
+            if len(nodes) % 2:
+                return
+            node = hashlib.sha256(nodes[-2] + nodes[-1]).digest()
+            level += 1
+            if level == len(self.levels):
+                self.levels.append([])
+    
+    def _tails(self) -> List[Optional[bytes]]:
+        """Hash of the incomplete right edge carried into each level"""
+        tails = [None]
+        for nodes in self.levels:
+            tail = tails[-1]
+            if tail is None:
+                carry = hashlib.sha256(nodes[-1] * 2).digest() if len(nodes) % 2 else None
+            elif len(nodes) % 2:
+                carry = hashlib.sha256(nodes[-1] + tail).digest()
+            else:
+                carry = hashlib.sha256(tail * 2).digest()
+            tails.append(carry)
+        return tails
+    
+    def root(self) -> bytes:
+        if not self.levels[0]:
+            return bytes.fromhex(EMPTY_MERKLE_ROOT)
+        tails = self._tails()
+        for level, nodes in enumerate(self.levels):
+            width = len(nodes) + (tails[level] is not None)
+            if width == 1:
+                return nodes[0] if nodes else tails[level]
+        return tails[-1]
+    
+    def root_hex(self) -> str:
+        return self.root().hex()
+    
+    def proof(self, index: int) -> List[bytes]:
+        """Sibling digests from leaf to root; the leaf index gives the left/right order"""
+        if not 0 <= index < len(self):
+            raise IndexError("leaf index out of range")
+        tails = self._tails()
+        siblings = []
+        position = index
+        for level, nodes in enumerate(self.levels):
+            level_nodes = nodes + [tails[level]] if tails[level] is not None else nodes
+            if len(level_nodes) == 1:
+                break
+            sibling = position ^ 1
+            # An unpaired last node is hashed with itself
+            siblings.append(level_nodes[sibling] if sibling < len(level_nodes) else level_nodes[position])
+            position >>= 1
+        return siblings
+
+def verify_merkle_proof(leaf: bytes, index: int, siblings: List[bytes], root: bytes) -> bool:
+    """Check that leaf sits at index under root, without the rest of the tree"""
+    node = leaf
+    for sibling in siblings:
+        node = hashlib.sha256(sibling + node if index & 1 else node + sibling).digest()
+        index >>= 1
+    return node == root
+
 @dataclass
 class Block:
     """GuardianShield Chain block structure"""
@@ -54,32 +350,56 @@ class Block:
     security_attestation: Dict[str, Any]  # AI security validation
     merkle_root: str
     stake_proof: Dict[str, Any]  # Proof of Guardian Stake data
+    merkle_tree: Optional[MerkleAccumulator] = field(default=None, repr=False, compare=False)
+    merkle_leaves: Tuple[str, ...] = field(default=(), repr=False, compare=False)  # Tx hashes merkle_tree was built from
     
     def calculate_merkle_root(self) -> str:
         """Calculate Merkle root of transactions"""
-        if not self.transactions:
-            return hashlib.sha256("".encode()).hexdigest()
-        
-        tx_hashes = [tx.hash() for tx in self.transactions]
-        
-        while len(tx_hashes) > 1:
-            if len(tx_hashes) % 2 == 1:
-                tx_hashes.append(tx_hashes[-1])
-            
-            next_level = []
-            for i in range(0, len(tx_hashes), 2):
-                combined = tx_hashes[i] + tx_hashes[i + 1]
-                next_level.append(hashlib.sha256(combined.encode()).hexdigest())
-            
-            tx_hashes = next_level
-        
-        return tx_hashes[0]
+        leaves = tuple(tx.hash() for tx in self.transactions)
+        # Keyed on the hashes themselves, so replacing a transaction invalidates the tree
+        if self.merkle_tree is None or leaves != self.merkle_leaves:
+            self.merkle_tree = MerkleAccumulator(bytes.fromhex(leaf) for leaf in leaves)
+            self.merkle_leaves = leaves
+        return self.merkle_tree.root_hex()
+    
+    def merkle_proof(self, tx_hash: str) -> Optional[Dict]:
+        """Inclusion proof for a transaction, verifiable against merkle_root alone"""
+        for index, tx in enumerate(self.transactions):
+            if tx.hash() == tx_hash:
+                break
+        else:
+            return None
+        self.calculate_merkle_root()
+        return {
+            "tx_hash": tx_hash,
+            "index": index,
+            "siblings": [sibling.hex() for sibling in self.merkle_tree.proof(index)],
+            "merkle_root": self.merkle_root
+        }
+    
+    @staticmethod
+    def verify_merkle_proof(proof: Dict, merkle_root: str) -> bool:
+        """Verify an inclusion proof produced by merkle_proof"""
+        try:
+            return verify_merkle_proof(
+                bytes.fromhex(proof["tx_hash"]),
+                proof["index"],
+                [bytes.fromhex(sibling) for sibling in proof["siblings"]],
+                bytes.fromhex(merkle_root)
+            )
+        except (KeyError, TypeError, ValueError):
+            return False
     
     def hash(self) -> str:
         """Generate block hash"""
         block_string = f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}{self.nonce}{self.validator_address}"
         return hashlib.sha256(block_string.encode()).hexdigest()
     
+    def header_template(self) -> Tuple[bytes, bytes]:
+        """Header serialized around the nonce, so miners only vary the nonce bytes"""
+        prefix = f"{self.index}{self.timestamp}{self.previous_hash}{self.merkle_root}"
+        return prefix.encode(), self.validator_address.encode()
+    
     def to_dict(self) -> Dict:
         return {
             "index": self.index,
@@ -93,6 +413,234 @@ class Block:
             "stake_proof": self.stake_proof,
             "hash": self.hash()
         }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Block":
+        return cls(
+            index=data["index"],
+            timestamp=data["timestamp"],
+            transactions=[Transaction.from_dict(tx) for tx in data["transactions"]],
+            previous_hash=data["previous_hash"],
+            nonce=data["nonce"],
+            validator_address=data["validator_address"],
+            security_attestation=data["security_attestation"],
+            merkle_root=data["merkle_root"],
+            stake_proof=data["stake_proof"]
+        )
+
+_mining_stop_event = None
+
+def _init_mining_worker(stop_event):
+    global _mining_stop_event
+    _mining_stop_event = stop_event
+
+def _mine_nonce_range(prefix: bytes, suffix: bytes, difficulty: int,
+                      start: int, end: int, stop_event=None) -> Tuple[Optional[int], Optional[str], int]:
+    """Search [start, end) for a nonce whose hash has `difficulty` leading hex zeros"""
+    stop_event = stop_event or _mining_stop_event
+    zero_bytes, odd_nibble = divmod(difficulty, 2)
+    zero_prefix = bytes(zero_bytes)
+    # SHA-256 state after the fixed prefix is computed once per range
+    midstate = hashlib.sha256(prefix)
+    
+    nonce = start
+    while nonce < end:
+        batch_end = min(nonce + MINING_CANCEL_CHECK, end)
+        for candidate in range(nonce, batch_end):
+            h = midstate.copy()
+            h.update(b"%d" % candidate + suffix)
+            digest = h.digest()
+            if digest[:zero_bytes] == zero_prefix and (not odd_nibble or digest[zero_bytes] < 16):
+                return candidate, h.hexdigest(), candidate - start + 1
+        nonce = batch_end
+        if stop_event is not None and stop_event.is_set():
+            break
+    return None, None, nonce - start
+
+class MiningEngine:
+    """Proof-of-work nonce search split across a multiprocessing worker pool
+    
+    Callers hand over the header serialized once around the nonce; workers
+    mutate only the nonce bytes. cancel() stops the search early, e.g. when
+    a peer block arrives. A caller that snapshots the chain tip under its own
+    lock should call begin() there and pass the generation to mine(), so a
+    cancel() issued before the search starts is not lost.
+    """
+    
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = MINING_CHUNK_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.stats = {
+            "hashes": 0,
+            "mining_seconds": 0.0,
+            "hashes_per_second": 0.0,
+            "blocks_found": 0,
+            "cancelled": 0
+        }
+        # Workers must not inherit the node's threads and locks, as fork would copy them
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = self._context.Event() if self.workers > 1 else threading.Event()
+        self._cancelled = False
+        self._generation = 0
+        self._state_lock = threading.Lock()
+        self._mine_lock = threading.Lock()
+        self._executor = None
+    
+    def begin(self) -> int:
+        """Start a new search generation; cancel() from here on applies to it"""
+        with self._state_lock:
+            self._generation += 1
+            self._cancelled = False
+            self._stop_event.clear()
+            return self._generation
+    
+    def mine(self, prefix: bytes, suffix: bytes, difficulty: int,
+             start_nonce: int = 0, max_nonce: Optional[int] = None,
+             generation: Optional[int] = None) -> Optional[Tuple[int, str]]:
+        """Return (nonce, hash) for the first winning nonce found, or None if exhausted or cancelled"""
+        with self._mine_lock:
+            if generation is None:
+                generation = self.begin()
+            with self._state_lock:
+                # Cancelled before we got here, or superseded by a newer begin()
+                stale = self._cancelled or generation != self._generation
+            if stale:
+                self.stats["cancelled"] += 1
+                return None
+            
+            started = time.perf_counter()
+            if self.workers > 1:
+                result, attempts = self._mine_parallel(prefix, suffix, difficulty, start_nonce, max_nonce)
+            else:
+                result, attempts = self._mine_serial(prefix, suffix, difficulty, start_nonce, max_nonce)
+            
+            elapsed = time.perf_counter() - started
+            self.stats["hashes"] += attempts
+            self.stats["mining_seconds"] += elapsed
+            self.stats["hashes_per_second"] = attempts / elapsed if elapsed > 0 else 0.0
+            if result:
+                self.stats["blocks_found"] += 1
+            elif self._cancelled:
+                self.stats["cancelled"] += 1
+            return result
+    
+    def cancel(self):
+        """Abandon the current search, or the one begun but not yet running"""
+        with self._state_lock:
+            self._cancelled = True
+            self._stop_event.set()
+    
+    def shutdown(self):
+        self.cancel()
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    def get_status(self) -> Dict:
+        return {"workers": self.workers, **self.stats}
+    
+    def _mine_serial(self, prefix, suffix, difficulty, start_nonce, max_nonce):
+        attempts = 0
+        nonce = start_nonce
+        while max_nonce is None or nonce < max_nonce:
+            end = nonce + self.chunk_size if max_nonce is None else min(nonce + self.chunk_size, max_nonce)
+            found, block_hash, tried = _mine_nonce_range(prefix, suffix, difficulty, nonce, end, self._stop_event)
+            attempts += tried
+            if found is not None:
+                return (found, block_hash), attempts
+            if self._stop_event.is_set():
+                break
+            nonce = end
+        return None, attempts
+    
+    def _mine_parallel(self, prefix, suffix, difficulty, start_nonce, max_nonce):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=self._context,
+                initializer=_init_mining_worker,
+                initargs=(self._stop_event,)
+            )
+        
+        attempts = 0
+        result = None
+        next_nonce = start_nonce
+        pending = set()
+        
+        def submit():
+            nonlocal next_nonce
+            if self._stop_event.is_set() or (max_nonce is not None and next_nonce >= max_nonce):
+                return
+            end = next_nonce + self.chunk_size
+            if max_nonce is not None:
+                end = min(end, max_nonce)
+            pending.add(self._executor.submit(_mine_nonce_range, prefix, suffix, difficulty, next_nonce, end))
+            next_nonce = end
+        
+        # Keep two ranges queued per worker so none idles between tasks
+        for _ in range(self.workers * 2):
+            submit()
+        
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                found, block_hash, tried = future.result()
+                attempts += tried
+                if found is not None and (result is None or found < result[0]):
+                    result = (found, block_hash)
+                    self._stop_event.set()
+                submit()
+        
+        return result, attempts
+
+class FenwickTree:
+    """Binary indexed tree of integer weights
+    
+    Point updates, prefix sums and weighted search are O(log n). Integer
+    weights keep sums exact, so every node arrives at the same selection.
+    """
+    
+    def __init__(self):
+        self.tree = [0]  # 1-based; tree[i] covers (i - lowbit(i), i]
+        self.total = 0
+    
+    def __len__(self) -> int:
+        return len(self.tree) - 1
+    
+    def append(self, weight: int) -> int:
+        """Add a slot at the end; returns its index"""
+        i = len(self.tree)
+        # tree[i] spans the lowbit(i) - 1 slots before it as well
+        self.tree.append(weight + self.prefix_sum(i - 1) - self.prefix_sum(i - (i & -i)))
+        self.total += weight
+        return i - 1
+    
+    def add(self, index: int, delta: int):
+        self.total += delta
+        i = index + 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+    
+    def prefix_sum(self, count: int) -> int:
+        """Sum of the first count slots"""
+        total = 0
+        while count > 0:
+            total += self.tree[count]
+            count -= count & -count
+        return total
+    
+    def find(self, point: int) -> int:
+        """Slot whose cumulative weight range contains point, for 0 <= point < total"""
+        position = 0
+        step = 1 << (len(self).bit_length() - 1) if len(self) else 0
+        while step:
+            nxt = position + step
+            if nxt < len(self.tree) and self.tree[nxt] <= point:
+                position = nxt
+                point -= self.tree[nxt]
+            step >>= 1
+        return position
 
 class ProofOfGuardianStake:
     """Proof of Guardian Stake consensus mechanism"""
@@ -106,11 +654,32 @@ class ProofOfGuardianStake:
             "malicious_behavior",
             "failed_security_validation"
         ]
+        # Selection weights by slot, kept current as stakes and scores change
+        self._weight_tree = FenwickTree()
+        self._slots = {}  # address -> slot
+        self._slot_addresses = []
+        self._slot_weights = []
     
     def add_validator(self, address: str, stake: float, security_score: float = 0.0):
         """Add a validator to the network"""
         self.validators[address] = stake
         self.security_scores[address] = security_score
+        self._refresh_weight(address)
+    
+    def update_stake(self, address: str, stake: float):
+        self.validators[address] = stake
+        self._refresh_weight(address)
+    
+    def update_security_score(self, address: str, security_score: float):
+        self.security_scores[address] = security_score
+        self._refresh_weight(address)
+    
+    def remove_validator(self, address: str):
+        """Drop a validator; its slot keeps zero weight and is never selected"""
+        self.validators.pop(address, None)
+        self.security_scores.pop(address, None)
+        if address in self._slots:
+            self._refresh_weight(address)
     
     def calculate_validator_weight(self, address: str) -> float:
         """Calculate validator selection weight based on stake + security score"""
@@ -118,27 +687,26 @@ class ProofOfGuardianStake:
         security_bonus = self.security_scores.get(address, 0) * 0.5  # 50% bonus for security
         return base_stake + security_bonus
     
+    def _refresh_weight(self, address: str):
+        weight = max(0, round(self.calculate_validator_weight(address) * VALIDATOR_WEIGHT_SCALE))
+        slot = self._slots.get(address)
+        if slot is None:
+            self._slots[address] = self._weight_tree.append(weight)
+            self._slot_addresses.append(address)
+            self._slot_weights.append(weight)
+        else:
+            self._weight_tree.add(slot, weight - self._slot_weights[slot])
+            self._slot_weights[slot] = weight
+    
     def select_validator(self, previous_hash: str) -> Optional[str]:
         """Select next block validator using weighted random selection"""
-        if not self.validators:
-            return None
-        
-        # Use previous block hash as randomness source
-        random_seed = int(previous_hash[:8], 16)
-        
-        total_weight = sum(self.calculate_validator_weight(addr) for addr in self.validators)
+        total_weight = self._weight_tree.total
         if total_weight == 0:
             return None
         
-        selection_point = (random_seed % int(total_weight * 1000)) / 1000
-        current_weight = 0
-        
-        for address in self.validators:
-            current_weight += self.calculate_validator_weight(address)
-            if current_weight >= selection_point:
-                return address
-        
-        return list(self.validators.keys())[0]  # Fallback
+        # The whole previous block hash is the randomness source
+        selection_point = int(previous_hash, 16) % total_weight
+        return self._slot_addresses[self._weight_tree.find(selection_point)]
     
     def validate_block(self, block: Block) -> bool:
         """Validate block according to PoGS rules"""
@@ -161,8 +729,8 @@ class ProofOfGuardianStake:
         
         # Check required fields
         required_fields = ["threat_scan_complete", "malicious_tx_count", "security_score"]
-        for field in required_fields:
-            if field not in attestation:
+        for field_name in required_fields:
+            if field_name not in attestation:
                 return False
         
         # Security score must be above threshold
@@ -174,15 +742,17 @@ class ProofOfGuardianStake:
 class GuardianShieldNode:
     """Core GuardianShield Chain node implementation"""
     
-    def __init__(self, node_id: str, node_type: str = "validator"):
+    def __init__(self, node_id: str, node_type: str = "validator", data_dir: Optional[str] = None,
+                 mining_workers: int = MINING_WORKERS):
         self.node_id = node_id
         self.node_type = node_type  # genesis, validator, bridge, governance
-        self.blockchain = []
-        self.mempool = []  # Pending transactions
+        self.blockchain = self._open_block_store(data_dir) if data_dir else []
+        self.mempool = Mempool()  # Pending transactions
         self.consensus = ProofOfGuardianStake()
         self.peers = []
         self.is_running = False
         self.mining_active = False
+        self.miner = MiningEngine(workers=mining_workers)
         
         # Node-specific configurations
         self.stake_amount = self._get_stake_requirement()
@@ -196,6 +766,21 @@ class GuardianShieldNode:
         print(f"   Stake Requirement: {self.stake_amount:,} GSHIELD")
         print(f"   Network Port: {self.port}")
     
+    def _open_block_store(self, data_dir: str) -> BlockStore:
+        """Persistent chain: blocks survive restarts and are read from disk on demand"""
+        return BlockStore(
+            os.path.join(data_dir, "blocks"),
+            encode=lambda block: json.dumps(block.to_dict(), separators=(",", ":")).encode(),
+            decode=lambda payload: Block.from_dict(json.loads(payload)),
+            block_hash=lambda block: block.hash(),
+            tx_hashes=lambda block: [tx.hash() for tx in block.transactions]
+        )
+    
+    def total_transactions(self) -> int:
+        if isinstance(self.blockchain, BlockStore):
+            return self.blockchain.total_transactions()
+        return sum(len(block.transactions) for block in self.blockchain)
+    
     def _get_stake_requirement(self) -> int:
         """Get stake requirement based on node type"""
         stakes = {
@@ -256,7 +841,9 @@ class GuardianShieldNode:
         transaction.threat_flags = security_assessment["threats"]
         
         if security_assessment["score"] > 0.7:  # Security threshold
-            self.mempool.append(transaction)
+            if not self.mempool.add(transaction):
+                print(f"⚠️  Transaction not admitted (duplicate or fee below mempool minimum)")
+                return False
             print(f"✅ Transaction added to mempool: {transaction.hash()[:8]}...")
             return True
         else:
@@ -289,8 +876,8 @@ class GuardianShieldNode:
         if not self.mempool:
             return None
         
-        # Select transactions from mempool (up to 1000 per block)
-        selected_txs = self.mempool[:1000]
+        # Select highest fee-rate transactions from mempool (up to 1000 per block)
+        selected_txs = self.mempool.select(1000)
         
         # Get previous block
         previous_block = self.blockchain[-1] if self.blockchain else None
@@ -333,18 +920,20 @@ class GuardianShieldNode:
     
     def mine_block(self, block: Block, target_difficulty: int = 4) -> bool:
         """Simple proof-of-work mining for block finalization"""
-        target = "0" * target_difficulty
+        prefix, suffix = block.header_template()
+        result = self.miner.mine(prefix, suffix, target_difficulty, max_nonce=1000000)  # Limit mining attempts
         
-        for nonce in range(1000000):  # Limit mining attempts
-            block.nonce = nonce
-            block_hash = block.hash()
-            
-            if block_hash.startswith(target):
-                print(f"⛏️  Block mined! Hash: {block_hash}")
-                return True
+        if result:
+            block.nonce, block_hash = result
+            print(f"⛏️  Block mined! Hash: {block_hash} ({self.miner.stats['hashes_per_second']:,.0f} H/s)")
+            return True
         
         return False
     
+    def cancel_mining(self):
+        """Stop the in-progress nonce search, e.g. when a peer block arrives"""
+        self.miner.cancel()
+    
     def add_block(self, block: Block) -> bool:
         """Add block to blockchain after validation"""
         # Validate block using consensus mechanism
@@ -356,8 +945,7 @@ class GuardianShieldNode:
         self.blockchain.append(block)
         
         # Remove mined transactions from mempool
-        mined_tx_hashes = {tx.hash() for tx in block.transactions}
-        self.mempool = [tx for tx in self.mempool if tx.hash() not in mined_tx_hashes]
+        self.mempool.remove_transactions(block.transactions)
         
         print(f"✅ Block #{block.index} added to blockchain")
         print(f"   Transactions: {len(block.transactions)}")
@@ -406,10 +994,12 @@ class GuardianShieldNode:
             "node_type": self.node_type,
             "chain_length": len(self.blockchain),
             "mempool_size": len(self.mempool),
+            "mempool": self.mempool.get_status(),
             "stake_amount": self.stake_amount,
             "is_mining": self.mining_active,
+            "hash_rate": self.miner.stats["hashes_per_second"],
             "latest_block_hash": self.blockchain[-1].hash()[:8] if self.blockchain else None,
-            "total_transactions": sum(len(block.transactions) for block in self.blockchain),
+            "total_transactions": self.total_transactions(),
             "security_integration": self.security_integration
         }
 
@@ -466,8 +1056,7 @@ class GuardianShieldNetwork:
         # Update stats from active nodes
         total_blocks = max(len(node.blockchain) for node in self.nodes.values())
         total_transactions = sum(
-            sum(len(block.transactions) for block in node.blockchain)
-            for node in self.nodes.values()
+            node.total_transactions() for node in self.nodes.values()
         ) // len(self.nodes)  # Average to avoid double counting
         
         avg_security_score = sum(
@@ -479,6 +1068,7 @@ class GuardianShieldNetwork:
             "total_blocks": total_blocks,
             "total_transactions": total_transactions,
             "security_score": avg_security_score,
+            "network_hash_rate": f"{sum(node.miner.stats['hashes_per_second'] for node in self.nodes.values()):,.0f} H/s",
             "active_nodes": len([n for n in self.nodes.values() if n.is_running]),
             "mining_nodes": len([n for n in self.nodes.values() if n.mining_active])
         })
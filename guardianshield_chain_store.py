@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+GuardianShield Chain - Persistent Block and State Storage
+Append-only segment files for blocks and an on-disk account-state table
+"""
+
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+SEGMENT_BYTES = 64 * 1024 * 1024  # Roll to a new segment file past this size
+BLOCK_CACHE_SIZE = 256  # Decoded blocks kept resident
+STATE_SNAPSHOT_INTERVAL = 100  # Blocks between account-state snapshots
+STATE_UNDO_DEPTH = 1000  # Blocks of balance deltas kept for reorganisations
+_RECORD_HEADER = struct.Struct("<II")  # payload length, crc32
+
+def _encode_json(block: Dict) -> bytes:
+    return json.dumps(block, separators=(",", ":")).encode()
+
+def _decode_json(payload: bytes) -> Dict:
+    return json.loads(payload)
+
+class BlockStore:
+    """Append-only block log in segment files with a SQLite height/hash index
+    
+    Behaves like a read-only list of blocks plus append(). Only the most
+    recently read blocks stay in memory; everything else is decoded from
+    memory-mapped segments on demand.
+    """
+    
+    def __init__(self, directory: str,
+                 encode: Callable[[Any], bytes] = _encode_json,
+                 decode: Callable[[bytes], Any] = _decode_json,
+                 block_hash: Callable[[Any], str] = lambda block: block["hash"],
+                 tx_hashes: Callable[[Any], List[str]] = lambda block: [tx["hash"] for tx in block["transactions"]],
+                 segment_bytes: int = SEGMENT_BYTES,
+                 cache_size: int = BLOCK_CACHE_SIZE):
+        self.directory = directory
+        self.encode = encode
+        self.decode = decode
+        self.block_hash = block_hash
+        self.tx_hashes = tx_hashes
+        self.segment_bytes = segment_bytes
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._maps = {}  # segment -> (mmap, mapped length)
+        self._lock = threading.RLock()
+        
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(directory, "index.db"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS blocks (
+                height INTEGER PRIMARY KEY,
+                hash TEXT UNIQUE NOT NULL,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                tx_count INTEGER NOT NULL
+            )
+        """)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS transactions (
+                hash TEXT PRIMARY KEY,
+                height INTEGER NOT NULL,
+                position INTEGER NOT NULL
+            )
+        """)
+        self.db.commit()
+        
+        row = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(tx_count), 0) FROM blocks"
+        ).fetchone()
+        self._height_count, self._tx_total = row
+        self._open_active_segment()
+    
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"blocks_{segment:06d}.seg")
+    
+    def _open_active_segment(self):
+        """Open the last segment for appends, dropping any unindexed tail from a crash"""
+        last = self.db.execute(
+            "SELECT segment, offset, length FROM blocks ORDER BY height DESC LIMIT 1"
+        ).fetchone()
+        if last:
+            self._segment, offset, length = last
+            indexed_end = offset + _RECORD_HEADER.size + length
+        else:
+            self._segment, indexed_end = 0, 0
+        
+        path = self._segment_path(self._segment)
+        self._active = open(path, "ab")
+        if self._active.tell() > indexed_end:
+            self._active.truncate(indexed_end)
+            self._active.seek(indexed_end)
+    
+    def __len__(self) -> int:
+        return self._height_count
+    
+    def __iter__(self):
+        for height in range(len(self)):
+            yield self.get_by_height(height)
+    
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self.get_by_height(height) for height in range(*item.indices(len(self)))]
+        height = item + len(self) if item < 0 else item
+        if not 0 <= height < len(self):
+            raise IndexError("block height out of range")
+        return self.get_by_height(height)
+    
+    def append(self, block) -> int:
+        """Write a block to the active segment and index it; returns its height"""
+        payload = self.encode(block)
+        with self._lock:
+            if self._active.tell() + len(payload) > self.segment_bytes and self._active.tell():
+                self._active.close()
+                self._segment += 1
+                self._active = open(self._segment_path(self._segment), "ab")
+            
+            offset = self._active.tell()
+            self._active.write(_RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._active.flush()
+            
+            height = self._height_count
+            tx_hashes = self.tx_hashes(block)
+            count = len(tx_hashes)
+            self.db.execute(
+                "INSERT INTO blocks (height, hash, segment, offset, length, tx_count) VALUES (?, ?, ?, ?, ?, ?)",
+                (height, self.block_hash(block), self._segment, offset, len(payload), count)
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO transactions (hash, height, position) VALUES (?, ?, ?)",
+                ((tx_hash, height, position) for position, tx_hash in enumerate(tx_hashes))
+            )
+            self.db.commit()
+            self._height_count += 1
+            self._tx_total += count
+            self._remember(height, block)
+        return height
+    
+    def truncate(self, height: int):
+        """Drop the block at height and everything above it, for chain reorganisations"""
+        with self._lock:
+            if height >= self._height_count:
+                return
+            segment, offset = self.db.execute(
+                "SELECT segment, offset FROM blocks WHERE height = ?", (height,)
+            ).fetchone()
+            removed_txs = self.db.execute(
+                "SELECT COALESCE(SUM(tx_count), 0) FROM blocks WHERE height >= ?", (height,)
+            ).fetchone()[0]
+            with self.db:
+                self.db.execute("DELETE FROM blocks WHERE height >= ?", (height,))
+                self.db.execute("DELETE FROM transactions WHERE height >= ?", (height,))
+            
+            # Unmap before shrinking files; touching a mapping past EOF faults
+            for mapped_segment in [s for s in self._maps if s >= segment]:
+                self._maps.pop(mapped_segment)[0].close()
+            self._active.close()
+            for later in range(segment + 1, self._segment + 1):
+                path = self._segment_path(later)
+                if os.path.exists(path):
+                    os.remove(path)
+            self._segment = segment
+            self._active = open(self._segment_path(segment), "ab")
+            self._active.truncate(offset)
+            self._active.seek(offset)
+            
+            self._height_count = height
+            self._tx_total -= removed_txs
+            for cached in [h for h in self._cache if h >= height]:
+                del self._cache[cached]
+    
+    def get_by_height(self, height: int):
+        with self._lock:
+            block = self._cache.get(height)
+            if block is not None:
+                self._cache.move_to_end(height)
+                return block
+            row = self.db.execute(
+                "SELECT segment, offset, length FROM blocks WHERE height = ?", (height,)
+            ).fetchone()
+            if row is None:
+                return None
+            block = self.decode(self._read_record(*row))
+            self._remember(height, block)
+            return block
+    
+    def get_by_hash(self, block_hash: str):
+        row = self.db.execute("SELECT height FROM blocks WHERE hash = ?", (block_hash,)).fetchone()
+        return self.get_by_height(row[0]) if row else None
+    
+    def height_of(self, block_hash: str) -> Optional[int]:
+        row = self.db.execute("SELECT height FROM blocks WHERE hash = ?", (block_hash,)).fetchone()
+        return row[0] if row else None
+    
+    def locate_transaction(self, tx_hash: str) -> Optional[tuple]:
+        """(height, position) of a stored transaction"""
+        return self.db.execute(
+            "SELECT height, position FROM transactions WHERE hash = ?", (tx_hash,)
+        ).fetchone()
+    
+    def total_transactions(self) -> int:
+        return self._tx_total
+    
+    def close(self):
+        with self._lock:
+            for mapped, _ in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+            self._active.close()
+            self.db.close()
+    
+    def _remember(self, height: int, block):
+        self._cache[height] = block
+        self._cache.move_to_end(height)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+    
+    def _read_record(self, segment: int, offset: int, length: int) -> bytes:
+        end = offset + _RECORD_HEADER.size + length
+        mapped = self._maps.get(segment)
+        if mapped is None or mapped[1] < end:
+            # The active segment grows, so remap it when a read runs past the old mapping
+            if mapped is not None:
+                mapped[0].close()
+            with open(self._segment_path(segment), "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                mapped = (mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ), size)
+            self._maps[segment] = mapped
+        
+        view = mapped[0]
+        stored_length, checksum = _RECORD_HEADER.unpack_from(view, offset)
+        payload = view[offset + _RECORD_HEADER.size:end]
+        if stored_length != length or zlib.crc32(payload) != checksum:
+            raise IOError(f"Corrupt block record in segment {segment} at offset {offset}")
+        return payload
+
+class AccountStateStore:
+    """Account balances in SQLite with per-block history and periodic snapshots
+    
+    Changes since the last snapshot are held in memory and written in one
+    transaction every snapshot_interval blocks. snapshot_height tells a
+    restarting node which blocks it still has to replay. The deltas of the
+    last undo_depth blocks are kept so a reorganisation can revert them.
+    """
+    
+    def __init__(self, path: Optional[str] = None,
+                 initial_balances: Optional[Dict[str, float]] = None,
+                 snapshot_interval: int = STATE_SNAPSHOT_INTERVAL,
+                 undo_depth: int = STATE_UNDO_DEPTH):
+        self.snapshot_interval = snapshot_interval
+        self.undo_depth = undo_depth
+        self.pending: Dict[str, float] = {}
+        self.pending_history: List[tuple] = []  # (address, height, balance)
+        self.pending_undo: List[tuple] = []  # (height, address, delta)
+        self._lock = threading.RLock()
+        
+        self.db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS accounts (
+                address TEXT PRIMARY KEY,
+                balance REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS balance_history (
+                address TEXT NOT NULL,
+                height INTEGER NOT NULL,
+                balance REAL NOT NULL,
+                PRIMARY KEY (address, height)
+            );
+            CREATE TABLE IF NOT EXISTS undo_log (
+                height INTEGER NOT NULL,
+                address TEXT NOT NULL,
+                delta REAL NOT NULL,
+                PRIMARY KEY (height, address)
+            );
+            CREATE TABLE IF NOT EXISTS state_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        
+        row = self.db.execute("SELECT value FROM state_meta WHERE key = 'snapshot_height'").fetchone()
+        if row is None:
+            # Fresh store: initial balances form the state before block 0
+            self.db.executemany(
+                "INSERT INTO accounts (address, balance) VALUES (?, ?)",
+                (initial_balances or {}).items()
+            )
+            self.db.executemany(
+                "INSERT INTO balance_history (address, height, balance) VALUES (?, -1, ?)",
+                (initial_balances or {}).items()
+            )
+            self.db.execute("INSERT INTO state_meta (key, value) VALUES ('snapshot_height', '-1')")
+            self.db.commit()
+            self.snapshot_height = -1
+        else:
+            self.snapshot_height = int(row[0])
+        self.height = self.snapshot_height
+    
+    def get(self, address: str, default: float = 0) -> float:
+        with self._lock:
+            if address in self.pending:
+                return self.pending[address]
+            row = self.db.execute("SELECT balance FROM accounts WHERE address = ?", (address,)).fetchone()
+            return row[0] if row else default
+    
+    def __getitem__(self, address: str) -> float:
+        return self.get(address)
+    
+    def __contains__(self, address: str) -> bool:
+        with self._lock:
+            return address in self.pending or self.db.execute(
+                "SELECT 1 FROM accounts WHERE address = ?", (address,)
+            ).fetchone() is not None
+    
+    def balance_at(self, address: str, height: int, default: float = 0) -> float:
+        """Balance after the block at height was applied"""
+        with self._lock:
+            for entry_address, entry_height, balance in reversed(self.pending_history):
+                if entry_address == address and entry_height <= height:
+                    return balance
+            row = self.db.execute(
+                "SELECT balance FROM balance_history WHERE address = ? AND height <= ? "
+                "ORDER BY height DESC LIMIT 1",
+                (address, height)
+            ).fetchone()
+            return row[0] if row else default
+    
+    def apply(self, height: int, deltas: Dict[str, float]):
+        """Apply one block's balance changes"""
+        with self._lock:
+            for address, delta in deltas.items():
+                balance = self.get(address) + delta
+                self.pending[address] = balance
+                self.pending_history.append((address, height, balance))
+                self.pending_undo.append((height, address, delta))
+            self.height = height
+            if self.height - self.snapshot_height >= self.snapshot_interval:
+                self.snapshot()
+    
+    def snapshot(self):
+        """Persist pending changes and advance snapshot_height atomically"""
+        with self._lock:
+            if self.height == self.snapshot_height:
+                return
+            with self.db:
+                self.db.executemany(
+                    "INSERT INTO accounts (address, balance) VALUES (?, ?) "
+                    "ON CONFLICT(address) DO UPDATE SET balance = excluded.balance",
+                    self.pending.items()
+                )
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO balance_history (address, height, balance) VALUES (?, ?, ?)",
+                    self.pending_history
+                )
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO undo_log (height, address, delta) VALUES (?, ?, ?)",
+                    self.pending_undo
+                )
+                self.db.execute("DELETE FROM undo_log WHERE height <= ?", (self.height - self.undo_depth,))
+                self.db.execute(
+                    "UPDATE state_meta SET value = ? WHERE key = 'snapshot_height'", (str(self.height),)
+                )
+            self.pending.clear()
+            self.pending_history.clear()
+            self.pending_undo.clear()
+            self.snapshot_height = self.height
+    
+    def revert_to(self, height: int):
+        """Undo every block above height using the undo log"""
+        with self._lock:
+            if height >= self.height:
+                return
+            if self.height - height > self.undo_depth:
+                raise ValueError(f"Cannot revert {self.height - height} blocks; undo log keeps {self.undo_depth}")
+            self.snapshot()
+            with self.db:
+                undone = self.db.execute(
+                    "SELECT address, SUM(delta) FROM undo_log WHERE height > ? GROUP BY address", (height,)
+                ).fetchall()
+                self.db.executemany(
+                    "UPDATE accounts SET balance = balance - ? WHERE address = ?",
+                    ((delta, address) for address, delta in undone)
+                )
+                self.db.execute("DELETE FROM undo_log WHERE height > ?", (height,))
+                self.db.execute("DELETE FROM balance_history WHERE height > ?", (height,))
+                self.db.execute(
+                    "UPDATE state_meta SET value = ? WHERE key = 'snapshot_height'", (str(height),)
+                )
+            self.height = self.snapshot_height = height
+    
+    def close(self):
+        self.snapshot()
+        self.db.close()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+GuardianShield Chain - Peer Wire Formats
+JSON for debugging and compact length-prefixed msgpack for block and transaction relay
+"""
+
+import json
+import re
+import struct
+from typing import Any, Dict, Iterable, List
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+WIRE_JSON = "application/json"
+WIRE_MSGPACK = "application/x-msgpack"
+_RECORD_LENGTH = struct.Struct(">I")
+# Hex digests under these keys travel as 32 raw bytes in msgpack
+_DIGEST_KEYS = frozenset(("hash", "previous_hash", "merkle_root", "tx_hash", "block_hash"))
+_CONTAINERS = (dict, list)
+_LOWER_HEX_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+def supported_formats() -> List[str]:
+    """Wire formats this node can read and write, most compact first"""
+    return [WIRE_MSGPACK, WIRE_JSON] if MSGPACK_AVAILABLE else [WIRE_JSON]
+
+def accept_header() -> str:
+    return ", ".join(supported_formats())
+
+def negotiate(accept: str) -> str:
+    """Pick the response format for an Accept header; JSON unless msgpack is asked for by name"""
+    if MSGPACK_AVAILABLE and WIRE_MSGPACK in (accept or ""):
+        return WIRE_MSGPACK
+    return WIRE_JSON
+
+def content_type_of(header: str) -> str:
+    return (header or WIRE_JSON).split(";")[0].strip().lower()
+
+def _pack_digest(item: Any) -> Any:
+    # Only lowercase hex round-trips exactly; anything else stays a string
+    if type(item) is str and _LOWER_HEX_DIGEST.fullmatch(item):
+        return bytes.fromhex(item)
+    return item
+
+def _pack_digests(value: Any) -> Any:
+    # Leaves are returned inline; only containers and digests cost a call
+    if type(value) is dict:
+        return {
+            key: _pack_digest(item) if key in _DIGEST_KEYS
+            else _pack_digests(item) if type(item) in _CONTAINERS else item
+            for key, item in value.items()
+        }
+    return [_pack_digests(item) if type(item) in _CONTAINERS else item for item in value]
+
+def _unpack_digests(obj: Dict) -> Dict:
+    for key in _DIGEST_KEYS.intersection(obj):
+        if type(obj[key]) is bytes:
+            obj[key] = obj[key].hex()
+    return obj
+
+def encode(payload: Any, content_type: str = WIRE_JSON) -> bytes:
+    if content_type == WIRE_MSGPACK:
+        if type(payload) in _CONTAINERS:
+            payload = _pack_digests(payload)
+        return msgpack.packb(payload, use_bin_type=True)
+    return json.dumps(payload).encode()
+
+def decode(body: bytes, content_type: str = WIRE_JSON) -> Any:
+    if content_type == WIRE_MSGPACK:
+        if not MSGPACK_AVAILABLE:
+            raise ValueError("msgpack payload received but msgpack is not installed")
+        return msgpack.unpackb(body, raw=False, strict_map_key=False, object_hook=_unpack_digests)
+    return json.loads(body)
+
+def encode_batch(records: Iterable[Any], content_type: str = WIRE_JSON) -> bytes:
+    """Blocks or transactions as a JSON array, or as msgpack records each prefixed with its length"""
+    if content_type == WIRE_MSGPACK:
+        frames = []
+        for record in records:
+            packed = encode(record, WIRE_MSGPACK)
+            frames.append(_RECORD_LENGTH.pack(len(packed)))
+            frames.append(packed)
+        return b"".join(frames)
+    return json.dumps(list(records)).encode()
+
+def decode_batch(body: bytes, content_type: str = WIRE_JSON) -> List[Any]:
+    if content_type != WIRE_MSGPACK:
+        return json.loads(body)
+    records = []
+    view = memoryview(body)
+    offset = 0
+    while offset < len(view):
+        if offset + _RECORD_LENGTH.size > len(view):
+            raise ValueError("Truncated batch record header")
+        (length,) = _RECORD_LENGTH.unpack_from(view, offset)
+        offset += _RECORD_LENGTH.size
+        if offset + length > len(view):
+            raise ValueError("Truncated batch record")
+        records.append(decode(bytes(view[offset:offset + length]), WIRE_MSGPACK))
+        offset += length
+    return records
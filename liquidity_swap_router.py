@@ -0,0 +1,309 @@
+"""
+Multi-Hop Swap Router for GuardianShield Liquidity Pools
+Best-path and split-route quotes over a token graph built from the framework's pools
+"""
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from liquidity_stableswap import STABLESWAP_PRECISION
+
+ROUTER_MAX_HOPS = 3
+ROUTER_MAX_SPLITS = 3  # Pool-disjoint routes a quote may divide its input across
+ROUTER_SPLIT_STEPS = 20  # Input is split in 1/20 increments (5%)
+ROUTER_NEWTON_STEPS = 64  # Cap on vectorised StableSwap y iterations
+
+_KIND_UNSUPPORTED = 0
+_KIND_CONSTANT_PRODUCT = 1
+_KIND_STABLE_SWAP = 2
+
+@dataclass
+class RouteLeg:
+    """One path of a route and the share of the input sent down it"""
+    tokens: List[str]  # token_in, intermediate tokens..., token_out
+    pools: List[str]
+    amount_in: Decimal
+    amount_out: Decimal
+
+@dataclass
+class RouteQuote:
+    """Best route found for a swap, priced exactly against current reserves"""
+    token_in: str
+    token_out: str
+    amount_in: Decimal
+    amount_out: Decimal
+    price_impact: Decimal  # Shortfall against the zero-size (marginal) rate of the route
+    legs: List[RouteLeg] = field(default_factory=list)
+    
+    @property
+    def hops(self) -> int:
+        return max(len(leg.pools) for leg in self.legs)
+
+class SwapRouter:
+    """
+    Quote engine over every active pool of an AdvancedLiquidityPoolFramework.
+    
+    Simple paths of up to max_hops pools are enumerated once per token pair
+    and cached until the pool set changes. A quote evaluates every candidate
+    path at every split fraction of the input in one NumPy pass, then divides
+    the input across the best pool-disjoint paths with a small dynamic
+    program. The chosen route is re-priced in Decimal, so reported outputs
+    match what execution would produce.
+    """
+    
+    def __init__(self, framework, max_hops: int = ROUTER_MAX_HOPS,
+                 max_splits: int = ROUTER_MAX_SPLITS, split_steps: int = ROUTER_SPLIT_STEPS):
+        self.framework = framework
+        self.max_hops = max_hops
+        self.max_splits = max_splits
+        self.split_steps = split_steps
+        self.graph: Optional[Dict[str, List[Tuple[str, str]]]] = None  # token -> [(pool_id, token reachable)]
+        self.path_cache: Dict[Tuple[str, str], List[Tuple[Tuple[str, ...], Tuple[str, ...]]]] = {}
+        self.fractions = np.arange(split_steps + 1, dtype=np.float64) / split_steps
+        # For the split allocation: row s, column i reads best[s - i], valid while i <= s
+        offsets = np.arange(split_steps + 1)
+        self.split_rest = np.clip(offsets[:, None] - offsets[None, :], 0, split_steps)
+        self.split_invalid = offsets[None, :] > offsets[:, None]
+    
+    def invalidate(self):
+        """Forget the token graph and cached paths; call when pools are added or removed"""
+        self.graph = None
+        self.path_cache.clear()
+    
+    def _build_graph(self) -> Dict[str, List[Tuple[str, str]]]:
+        graph = {}
+        for pool_id, pool in self.framework.pools.items():
+            for token_a in pool['tokens']:
+                for token_b in pool['tokens']:
+                    if token_a != token_b:
+                        graph.setdefault(token_a, []).append((pool_id, token_b))
+        return graph
+    
+    def candidate_paths(self, token_in: str, token_out: str) -> List[Tuple[Tuple[str, ...], Tuple[str, ...]]]:
+        """Every simple (tokens, pools) path from token_in to token_out within max_hops"""
+        key = (token_in, token_out)
+        if key in self.path_cache:
+            return self.path_cache[key]
+        if self.graph is None:
+            self.graph = self._build_graph()
+        
+        paths = []
+        stack = [((token_in,), ())]
+        while stack:
+            tokens, pools = stack.pop()
+            for pool_id, next_token in self.graph.get(tokens[-1], ()):
+                if next_token in tokens or pool_id in pools:
+                    continue
+                if next_token == token_out:
+                    paths.append((tokens + (next_token,), pools + (pool_id,)))
+                elif len(pools) + 1 < self.max_hops:
+                    stack.append((tokens + (next_token,), pools + (pool_id,)))
+        
+        self.path_cache[key] = paths
+        return paths
+    
+    def _hop_parameters(self, paths: List[Tuple[Tuple[str, ...], Tuple[str, ...]]]) -> Dict[str, np.ndarray]:
+        """
+        Per path and hop depth: reserves, fee multiplier and pool kind as float arrays.
+        
+        Stable hops also carry the StableSwap terms that do not depend on the
+        input: D, A*n^n, and the sum and D^(n+1) / (n^n * A*n^n * product) over
+        the balances other than the two being swapped.
+        """
+        from advanced_liquidity_pool_framework import PoolStatus, PoolType
+        
+        depth = max(len(pools) for _, pools in paths)
+        shape = (len(paths), depth)
+        params = {
+            'reserve_in': np.ones(shape), 'reserve_out': np.ones(shape),
+            'fee_factor': np.ones(shape), 'kind': np.zeros(shape, dtype=np.int8),
+            'd': np.zeros(shape), 'ann': np.ones(shape), 'rest_sum': np.zeros(shape), 'c_base': np.zeros(shape),
+            'length': np.zeros(len(paths), dtype=np.int64)
+        }
+        pools_by_id = self.framework.pools
+        for row, (tokens, pools) in enumerate(paths):
+            params['length'][row] = len(pools)
+            for hop, pool_id in enumerate(pools):
+                pool = pools_by_id[pool_id]
+                if pool['status'] != PoolStatus.ACTIVE:
+                    continue  # Unsupported kind: the path quotes zero
+                reserves = pool['reserves']
+                params['reserve_in'][row, hop] = float(reserves[tokens[hop]])
+                params['reserve_out'][row, hop] = float(reserves[tokens[hop + 1]])
+                params['fee_factor'][row, hop] = float(1 - pool['swap_fee'])
+                if pool['type'] == PoolType.CONSTANT_PRODUCT:
+                    params['kind'][row, hop] = _KIND_CONSTANT_PRODUCT
+                elif pool['type'] == PoolType.STABLE_SWAP:
+                    params['kind'][row, hop] = _KIND_STABLE_SWAP
+                    invariant = pool['stableswap']
+                    n = len(invariant.tokens)
+                    d = invariant.invariant(invariant.balances(reserves)) / STABLESWAP_PRECISION
+                    ann = invariant.amplification * n ** n
+                    c_base = d ** (n + 1) / (n ** n * ann)
+                    rest_sum = 0.0
+                    for token in invariant.tokens:
+                        if token != tokens[hop] and token != tokens[hop + 1]:
+                            rest_sum += float(reserves[token])
+                            c_base /= float(reserves[token])
+                    params['d'][row, hop] = d
+                    params['ann'][row, hop] = ann
+                    params['rest_sum'][row, hop] = rest_sum
+                    params['c_base'][row, hop] = c_base
+        return params
+    
+    def _stable_outputs(self, params: Dict[str, np.ndarray], hop: int, amount_with_fee: np.ndarray) -> np.ndarray:
+        """Vectorised StableSwap y solve, the float counterpart of liquidity_stableswap.compute_y"""
+        d = params['d'][:, hop, None]
+        new_reserve_in = params['reserve_in'][:, hop, None] + amount_with_fee
+        c = params['c_base'][:, hop, None] / new_reserve_in
+        b = params['rest_sum'][:, hop, None] + new_reserve_in + d / params['ann'][:, hop, None]
+        
+        y = np.broadcast_to(d, amount_with_fee.shape)
+        for _ in range(ROUTER_NEWTON_STEPS):
+            previous = y
+            y = (y * y + c) / (2 * y + b - d)
+            if np.all(np.abs(y - previous) <= 1e-12 * np.maximum(y, 1.0)):
+                break
+        return np.maximum(params['reserve_out'][:, hop, None] - y, 0.0)
+    
+    def _evaluate(self, params: Dict[str, np.ndarray], amounts: np.ndarray) -> np.ndarray:
+        """Outputs of every path (rows) for every input amount (columns), mirroring _calculate_swap_output"""
+        for hop in range(params['kind'].shape[1]):
+            reserve_in = params['reserve_in'][:, hop, None]
+            reserve_out = params['reserve_out'][:, hop, None]
+            kind = params['kind'][:, hop, None]
+            
+            amount_with_fee = amounts * params['fee_factor'][:, hop, None]
+            outputs = np.where(kind == _KIND_CONSTANT_PRODUCT,
+                               amount_with_fee * reserve_out / (reserve_in + amount_with_fee), 0.0)
+            stable = kind[:, 0] == _KIND_STABLE_SWAP
+            if stable.any():
+                outputs = np.where(kind == _KIND_STABLE_SWAP, self._stable_outputs(params, hop, amount_with_fee), outputs)
+            amounts = np.where((params['length'] > hop)[:, None], outputs, amounts)
+        return amounts
+    
+    def _allocate(self, outputs: np.ndarray) -> Tuple[float, List[int]]:
+        """Split steps per path maximising the summed output; paths must not share pools"""
+        steps = self.split_steps
+        # best[s]: highest output using s steps over the paths seen so far
+        best = outputs[0].copy()
+        choices = []
+        for row in outputs[1:]:
+            # candidates[s, i] = best[s - i] + row[i] for i <= s
+            candidates = best[self.split_rest] + row[None, :]
+            candidates[self.split_invalid] = -np.inf
+            choice = candidates.argmax(axis=1)
+            choices.append(choice)
+            best = candidates.max(axis=1)
+        
+        allocation = []
+        remaining = steps
+        for choice in reversed(choices):
+            allocation.append(int(choice[remaining]))
+            remaining -= allocation[-1]
+        allocation.append(remaining)
+        return float(best[steps]), list(reversed(allocation))
+    
+    def _disjoint_leaders(self, paths: List, full_outputs: np.ndarray) -> List[int]:
+        """Indices of the best paths, best first, skipping any that reuse a pool already picked"""
+        picked = []
+        used_pools = set()
+        for index in np.argsort(-full_outputs, kind="stable"):
+            pools = paths[index][1]
+            if full_outputs[index] <= 0 or used_pools.intersection(pools):
+                continue
+            picked.append(int(index))
+            used_pools.update(pools)
+            if len(picked) == self.max_splits:
+                break
+        return picked
+    
+    def quote(self, token_in: str, token_out: str, amount_in: Decimal,
+              allow_split: bool = True) -> RouteQuote:
+        """Best single or split route for swapping amount_in of token_in into token_out"""
+        if token_in == token_out:
+            raise ValueError("token_in and token_out must differ")
+        if amount_in <= 0:
+            raise ValueError("amount_in must be positive")
+        
+        paths = self.candidate_paths(token_in, token_out)
+        if not paths:
+            raise ValueError(f"No route from {token_in} to {token_out}")
+        
+        params = self._hop_parameters(paths)
+        outputs = self._evaluate(params, np.broadcast_to(self.fractions * float(amount_in), (len(paths), len(self.fractions))))
+        leaders = self._disjoint_leaders(paths, outputs[:, -1])
+        if not leaders:
+            raise ValueError(f"No route from {token_in} to {token_out} with liquidity")
+        
+        allocation = [self.split_steps]
+        if allow_split and len(leaders) > 1:
+            _, allocation = self._allocate(outputs[leaders])
+        
+        # Re-price the chosen legs exactly; the last leg takes the rounding remainder
+        legs = []
+        assigned = Decimal('0')
+        chosen = [(index, steps) for index, steps in zip(leaders, allocation) if steps > 0]
+        for position, (index, steps) in enumerate(chosen):
+            if position == len(chosen) - 1:
+                leg_in = amount_in - assigned
+            else:
+                leg_in = amount_in * steps / self.split_steps
+            assigned += leg_in
+            tokens, pools = paths[index]
+            legs.append(RouteLeg(list(tokens), list(pools), leg_in, self.price_path(tokens, pools, leg_in)))
+        
+        amount_out = sum((leg.amount_out for leg in legs), Decimal('0'))
+        return RouteQuote(token_in, token_out, amount_in, amount_out,
+                          self._route_price_impact(legs, amount_in, amount_out), legs)
+    
+    def price_path(self, tokens, pools, amount_in: Decimal) -> Decimal:
+        """Exact output of a path at current reserves"""
+        amount = amount_in
+        for hop, pool_id in enumerate(pools):
+            amount = self.framework._calculate_swap_output(
+                self.framework.pools[pool_id], tokens[hop], tokens[hop + 1], amount)
+        return amount
+    
+    def _marginal_rate(self, tokens, pools) -> Decimal:
+        """Output per unit input of a path at zero size, after fees"""
+        rate = Decimal('1')
+        for hop, pool_id in enumerate(pools):
+            pool = self.framework.pools[pool_id]
+            reserves = pool['reserves']
+            reserve_in, reserve_out = reserves[tokens[hop]], reserves[tokens[hop + 1]]
+            if reserve_in <= 0:
+                return Decimal('0')
+            invariant = pool.get('stableswap')
+            if invariant is not None:
+                # Slope of the invariant: (A*n^n + K/x_in) / (A*n^n + K/x_out), K = D^(n+1) / (n^n * prod(x))
+                n = len(invariant.tokens)
+                d = Decimal(invariant.invariant(invariant.balances(reserves))) / STABLESWAP_PRECISION
+                product = Decimal('1')
+                for token in invariant.tokens:
+                    product *= reserves[token]
+                k = d ** (n + 1) / (n ** n * product)
+                ann = invariant.amplification * n ** n
+                rate *= (1 - pool['swap_fee']) * (ann + k / reserve_in) / (ann + k / reserve_out)
+            else:
+                rate *= (1 - pool['swap_fee']) * reserve_out / reserve_in
+        return rate
+    
+    def _route_price_impact(self, legs: List[RouteLeg], amount_in: Decimal, amount_out: Decimal) -> Decimal:
+        ideal_out = sum((leg.amount_in * self._marginal_rate(leg.tokens, leg.pools) for leg in legs), Decimal('0'))
+        if ideal_out <= 0:
+            return Decimal('0')
+        return max(Decimal('0'), 1 - amount_out / ideal_out)
+    
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'graph_built': self.graph is not None,
+            'tokens': len(self.graph) if self.graph is not None else 0,
+            'cached_pairs': len(self.path_cache),
+            'max_hops': self.max_hops,
+            'max_splits': self.max_splits,
+            'split_steps': self.split_steps
+        }
@@ -33,7 +33,7 @@ class ProductionNodeRunner:
         self.peers = self._load_peer_config()
         
         # Initialize node
-        self.node = GuardianShieldNode(self.node_id, self.node_type)
+        self.node = GuardianShieldNode(self.node_id, self.node_type, os.getenv('GUARDIAN_DATA_DIR'))
         self.node.port = self.network_port
         
         self.running = False
@@ -0,0 +1,320 @@
+"""
+Price Oracle Service for GuardianShield Payments and Token Sales
+Background-refreshed, versioned price snapshots that quote paths read without locks or network calls
+"""
+
+import abc
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+PRICE_FILE_ENV = "GUARDIAN_PRICE_FILE"  # JSON {"bitcoin": 45000.0, ...}; used instead of live feeds when set
+PRICE_API_ENV = "GUARDIAN_PRICE_API"  # "coingecko" enables the live CoinGecko feed
+DEFAULT_REFRESH_SECONDS = 30.0
+DEFAULT_MAX_AGE_SECONDS = 300.0  # A source older than this stops contributing to snapshots
+PRICE_FETCH_TIMEOUT = 5.0
+
+# Last-resort prices, always present so quotes never block on a feed
+FALLBACK_PRICES_USD = {
+    'bitcoin': 45000.0,
+    'ethereum': 3200.0,
+    'solana': 85.0,
+    'binancecoin': 320.0,
+    'cardano': 0.65,
+    'tether': 1.0,
+    'usd-coin': 1.0,
+    'guardianshield': 0.85
+}
+
+COINGECKO_URL = "https://api.coingecko.com/api/v3/simple/price"
+
+class PriceSource(abc.ABC):
+    """A named feed of USD prices, refreshed every interval and trusted for max_age seconds"""
+    local = True  # Cheap enough to fetch synchronously at start-up
+    
+    def __init__(self, name: str, interval: float = DEFAULT_REFRESH_SECONDS,
+                 max_age: Optional[float] = DEFAULT_MAX_AGE_SECONDS):
+        self.name = name
+        self.interval = interval
+        self.max_age = max_age  # None: never goes stale
+    
+    @abc.abstractmethod
+    def fetch(self) -> Dict[str, float]:
+        """Current prices keyed by price id; raise on failure"""
+
+class StaticPriceSource(PriceSource):
+    def __init__(self, name: str, prices: Dict[str, float]):
+        super().__init__(name, interval=3600.0, max_age=None)
+        self.prices = dict(prices)
+    
+    def fetch(self) -> Dict[str, float]:
+        return dict(self.prices)
+
+class FilePriceSource(PriceSource):
+    """Prices from a local JSON file, re-read every interval; a stand-in for live feeds in tests"""
+    
+    def __init__(self, path: str, name: str = "file", interval: float = 1.0,
+                 max_age: Optional[float] = None):
+        super().__init__(name, interval, max_age)
+        self.path = path
+    
+    def fetch(self) -> Dict[str, float]:
+        with open(self.path) as f:
+            return {key: float(value) for key, value in json.load(f).items()}
+
+class CoinGeckoPriceSource(PriceSource):
+    def __init__(self, ids: List[str], interval: float = DEFAULT_REFRESH_SECONDS,
+                 max_age: Optional[float] = DEFAULT_MAX_AGE_SECONDS, timeout: float = PRICE_FETCH_TIMEOUT):
+        super().__init__("coingecko", interval, max_age)
+        self.local = False
+        self.ids = list(ids)
+        self.timeout = timeout
+        self.session = requests.Session()
+    
+    def fetch(self) -> Dict[str, float]:
+        response = self.session.get(COINGECKO_URL, params={'ids': ",".join(self.ids), 'vs_currencies': 'usd'},
+                                    timeout=self.timeout)
+        response.raise_for_status()
+        return {coin: float(quote['usd']) for coin, quote in response.json().items() if 'usd' in quote}
+
+class CallablePriceSource(PriceSource):
+    """Prices computed locally, e.g. from the purchase database, off the request path"""
+    
+    def __init__(self, name: str, compute: Callable[[], Dict[str, float]],
+                 interval: float = DEFAULT_REFRESH_SECONDS, max_age: Optional[float] = None,
+                 local: bool = True):
+        super().__init__(name, interval, max_age)
+        self.local = local  # False: even the first fetch runs on the refresh thread
+        self.compute = compute
+    
+    def fetch(self) -> Dict[str, float]:
+        return self.compute()
+
+@dataclass(frozen=True)
+class PriceSnapshot:
+    """An immutable view of every source's latest prices; never modify prices in place"""
+    version: int
+    prices: Dict[str, float]
+    price_sources: Dict[str, str]  # price key -> name of the source it came from
+    fetched_at: Dict[str, float]  # source name -> time of its last successful fetch
+    expires_at: float  # When the first contributing source crosses its max_age
+    created_at: float = field(default_factory=time.time)
+    
+    def age(self, key: str, now: Optional[float] = None) -> Optional[float]:
+        source = self.price_sources.get(key)
+        if source is None:
+            return None
+        return (now or time.time()) - self.fetched_at[source]
+
+class PriceOracleService:
+    """
+    Keeps the latest price of every source in a single versioned snapshot.
+    
+    Each source is fetched on its own daemon thread, so a slow or failing
+    upstream only delays its own prices. Every successful fetch publishes a
+    new snapshot by swapping one reference; readers take that reference
+    without locking. Sources are listed lowest priority first, and a source
+    older than its max_age drops out of the next snapshot, so its keys fall
+    back to the next fresh source below it. Source names are unique; adding
+    a source under an existing name replaces it.
+    """
+    
+    def __init__(self, sources: List[PriceSource]):
+        self.sources: List[PriceSource] = []
+        self.latest: Dict[str, Dict[str, float]] = {}  # source name -> last fetched prices
+        self.fetched_at: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.publish_lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.started = False
+        self.stop_events: Dict[str, threading.Event] = {}  # source name -> stops its refresh thread
+        self.threads: Dict[str, threading.Thread] = {}
+        self._snapshot = PriceSnapshot(0, {}, {}, {}, float('inf'))
+        for source in sources:
+            self._register(source)
+    
+    def _register(self, source: PriceSource) -> Optional[PriceSource]:
+        """Insert source, replacing one with the same name in place; returns the replaced source"""
+        with self.publish_lock:
+            for position, existing in enumerate(self.sources):
+                if existing.name == source.name:
+                    self.sources[position] = source
+                    self._forget(source.name)
+                    return existing
+            self.sources.append(source)
+            return None
+    
+    def _forget(self, name: str):
+        # Caller holds publish_lock
+        event = self.stop_events.pop(name, None)
+        if event:
+            event.set()
+        self.threads.pop(name, None)
+        self.latest.pop(name, None)
+        self.fetched_at.pop(name, None)
+        self.errors.pop(name, None)
+    
+    def add_source(self, source: PriceSource):
+        """
+        Register a source above the existing ones, or in place of the source
+        with the same name. Local sources are fetched before returning.
+        """
+        replaced = self._register(source)
+        if replaced is not None:
+            self._publish()
+        if source.local:
+            self.refresh_source(source)
+        if self.started:
+            self._start_thread(source)
+    
+    def remove_source(self, name: str) -> bool:
+        """Stop refreshing a source and drop its prices from the next snapshot"""
+        with self.publish_lock:
+            remaining = [source for source in self.sources if source.name != name]
+            if len(remaining) == len(self.sources):
+                return False
+            self.sources = remaining
+            self._forget(name)
+        self._publish()
+        return True
+    
+    def start(self):
+        """Fetch local sources once, then keep refreshing every source in the background"""
+        with self.start_lock:
+            if self.started:
+                return
+            self.started = True
+        for source in list(self.sources):
+            if source.local and source.name not in self.fetched_at:
+                self.refresh_source(source)
+        for source in list(self.sources):
+            self._start_thread(source)
+    
+    def _start_thread(self, source: PriceSource):
+        with self.publish_lock:
+            if source.name in self.threads or source not in self.sources:
+                return
+            stop_event = self.stop_events[source.name] = threading.Event()
+            thread = threading.Thread(target=self._run_source, args=(source, stop_event), daemon=True,
+                                      name=f"price-{source.name}")
+            self.threads[source.name] = thread
+        thread.start()
+    
+    def _run_source(self, source: PriceSource, stop_event: threading.Event):
+        # Remote sources get their first fetch here, off the caller's thread
+        if source.name not in self.fetched_at:
+            self.refresh_source(source)
+        while not stop_event.wait(source.interval):
+            self.refresh_source(source)
+    
+    def refresh_source(self, source: PriceSource) -> bool:
+        try:
+            prices = source.fetch()
+        except Exception as e:
+            logger.warning(f"Price source {source.name} failed: {e}")
+            with self.publish_lock:
+                if source in self.sources:
+                    self.errors[source.name] = str(e)
+            self._publish()  # Stale prices may need to drop out
+            return False
+        with self.publish_lock:
+            # A fetch that finishes after its source was removed or replaced is discarded
+            if source not in self.sources:
+                return False
+            self.latest[source.name] = prices
+            self.fetched_at[source.name] = time.time()
+            self.errors.pop(source.name, None)
+        self._publish()
+        return True
+    
+    def _publish(self):
+        with self.publish_lock:
+            now = time.time()
+            prices = {}
+            price_sources = {}
+            expires_at = float('inf')
+            for source in self.sources:
+                fetched = self.fetched_at.get(source.name)
+                if fetched is None:
+                    continue
+                if source.max_age is not None:
+                    if now - fetched > source.max_age:
+                        continue
+                    expires_at = min(expires_at, fetched + source.max_age)
+                for key, value in self.latest[source.name].items():
+                    prices[key] = value
+                    price_sources[key] = source.name
+            self._snapshot = PriceSnapshot(self._snapshot.version + 1, prices, price_sources,
+                                           dict(self.fetched_at), expires_at)
+    
+    @property
+    def snapshot(self) -> PriceSnapshot:
+        snapshot = self._snapshot
+        if time.time() >= snapshot.expires_at:
+            # A source went stale between fetches; rebuild without it
+            self._publish()
+            snapshot = self._snapshot
+        return snapshot
+    
+    def get_prices(self) -> Dict[str, float]:
+        return dict(self.snapshot.prices)
+    
+    def get_price(self, key: str, default: Optional[float] = None) -> Optional[float]:
+        return self.snapshot.prices.get(key, default)
+    
+    def get_status(self) -> Dict:
+        snapshot = self.snapshot
+        now = time.time()
+        return {
+            'version': snapshot.version,
+            'sources': {
+                source.name: {
+                    'age_seconds': now - self.fetched_at[source.name] if source.name in self.fetched_at else None,
+                    'max_age_seconds': source.max_age,
+                    'refresh_seconds': source.interval,
+                    'last_error': self.errors.get(source.name)
+                }
+                for source in self.sources
+            }
+        }
+    
+    def stop(self):
+        """Stop every refresh thread; the last snapshot stays readable"""
+        with self.publish_lock:
+            for event in self.stop_events.values():
+                event.set()
+            self.stop_events.clear()
+            self.threads.clear()
+            self.started = False
+
+_shared_service: Optional[PriceOracleService] = None
+_shared_lock = threading.Lock()
+
+def create_price_service() -> PriceOracleService:
+    """Fallback prices, overlaid by GUARDIAN_PRICE_FILE or, with GUARDIAN_PRICE_API=coingecko, the live feed"""
+    sources: List[PriceSource] = [StaticPriceSource("fallback", FALLBACK_PRICES_USD)]
+    price_file = os.getenv(PRICE_FILE_ENV)
+    if price_file:
+        sources.append(FilePriceSource(price_file))
+    elif os.getenv(PRICE_API_ENV, "").lower() == "coingecko":
+        sources.append(CoinGeckoPriceSource([coin for coin in FALLBACK_PRICES_USD if coin != 'guardianshield']))
+    return PriceOracleService(sources)
+
+def get_price_service() -> PriceOracleService:
+    """The process-wide service, started on first use"""
+    global _shared_service
+    if _shared_service is not None:
+        return _shared_service
+    with _shared_lock:
+        if _shared_service is None:
+            _shared_service = create_price_service()
+            _shared_service.start()
+        return _shared_service
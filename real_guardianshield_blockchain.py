@@ -5,30 +5,269 @@ Actually functional blockchain with real processes and network connections
 """
 
 import asyncio
+import aiohttp
 import json
 import socket
 import threading
 import time
 import hashlib
-import requests
 from datetime import datetime
 from typing import Dict, List, Optional
 import uuid
 import subprocess
 import os
+from collections import OrderedDict
+from guardianshield_chain_core import MINING_WORKERS, MerkleAccumulator, MiningEngine, verify_merkle_proof
+from guardianshield_chain_store import AccountStateStore, BlockStore
+import guardianshield_chain_wire as wire
+
+MINING_REWARD = 50
+MINING_DIFFICULTY = 4  # Leading hex zeros required of a block hash
+INITIAL_BALANCES = {"genesis": 1000000}
+GOSSIP_QUEUE_SIZE = 32  # Pending blocks per peer before the oldest is dropped
+GOSSIP_POOL_SIZE = 100  # Keep-alive connections shared across all peers
+GOSSIP_TIMEOUT = 5
+GOSSIP_SEEN_CACHE = 4096  # Block hashes remembered for deduplication
+GOSSIP_ORIGIN_HEADER = "X-Gossip-Origin"
+SYNC_HEADER_BATCH = 500  # Headers per /headers request
+SYNC_BODY_BATCH = 50  # Blocks per /blocks request; batches are spread across peers
+SYNC_LOOKBACK = 16  # Headers below our tip requested first when looking for the fork point
+
+class BlockGossip:
+    """Async block fan-out to peers over a shared keep-alive connection pool
+    
+    Runs its own event loop on a background thread so the mining and HTTP
+    threads can publish without blocking. Every peer has a bounded send
+    queue drained by its own task, so a slow peer only delays itself.
+    """
+    
+    def __init__(self, port: int, queue_size: int = GOSSIP_QUEUE_SIZE,
+                 pool_size: int = GOSSIP_POOL_SIZE, timeout: float = GOSSIP_TIMEOUT):
+        self.port = port
+        self.queue_size = queue_size
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.queues = {}  # peer port -> asyncio.Queue
+        self.known = {}  # peer port -> OrderedDict of hashes the peer already has
+        self.seen = OrderedDict()  # hashes this node has already gossiped
+        self.wire_formats = {}  # peer port -> content type it answered with, JSON until known
+        self.stats = {"sent": 0, "failed": 0, "dropped": 0, "deduplicated": 0, "bytes_sent": 0}
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._tasks = []
+    
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+    
+    def start(self):
+        if self.running:
+            return
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._loop.call_soon(ready.set)
+        self._thread = threading.Thread(target=self._loop.run_forever, name=f"gossip-{self.port}", daemon=True)
+        self._thread.start()
+        ready.wait()
+        asyncio.run_coroutine_threadsafe(self._open_session(), self._loop).result()
+    
+    def stop(self):
+        if not self.running:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout=self.timeout)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=self.timeout)
+        self._loop.close()
+        self._loop = None
+    
+    def add_peer(self, peer_port: int):
+        self._loop.call_soon_threadsafe(self._add_peer, peer_port)
+    
+    def mark_known(self, peer_port: int, block_hash: str):
+        """Record that a peer announced a block, so it is never sent back to it"""
+        self._loop.call_soon_threadsafe(self._mark_known, peer_port, block_hash)
+    
+    def publish(self, block: Dict, origin_port: Optional[int] = None):
+        """Queue a block for every peer that does not already have it"""
+        self._loop.call_soon_threadsafe(self._enqueue, block, origin_port)
+    
+    def fetch_all(self, fetches: List[tuple]) -> List[Optional[Dict]]:
+        """GET (peer port, path) pairs concurrently over the shared pool; None where a request failed"""
+        return asyncio.run_coroutine_threadsafe(self._fetch_all(fetches), self._loop).result()
+    
+    def get_status(self) -> Dict:
+        return {
+            "peers": len(self.queues),
+            "queued": sum(queue.qsize() for queue in self.queues.values()),
+            "msgpack_peers": sum(1 for fmt in self.wire_formats.values() if fmt == wire.WIRE_MSGPACK),
+            **self.stats
+        }
+    
+    async def _open_session(self):
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+    
+    async def _shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._session.close()
+    
+    async def _fetch_all(self, fetches: List[tuple]) -> List[Optional[Dict]]:
+        return await asyncio.gather(*(self._fetch(peer_port, path) for peer_port, path in fetches))
+    
+    async def _fetch(self, peer_port: int, path: str) -> Optional[Dict]:
+        url = f"http://localhost:{peer_port + 1000}{path}"
+        try:
+            async with self._session.get(url, headers={"Accept": wire.accept_header()}) as response:
+                if response.status != 200:
+                    return None
+                content_type = self._learn_format(peer_port, response)
+                return wire.decode(await response.read(), content_type)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            return None
+    
+    def _learn_format(self, peer_port: int, response) -> str:
+        """Peers answer in the most compact format both sides support; use it from then on"""
+        content_type = wire.content_type_of(response.headers.get("Content-Type"))
+        if content_type in wire.supported_formats():
+            self.wire_formats[peer_port] = content_type
+        return content_type
+    
+    def _remember(self, hashes: Optional[OrderedDict], block_hash: str):
+        if hashes is None:
+            return
+        hashes[block_hash] = True
+        if len(hashes) > GOSSIP_SEEN_CACHE:
+            hashes.popitem(last=False)
+    
+    def _mark_known(self, peer_port: int, block_hash: str):
+        self._remember(self.known.get(peer_port), block_hash)
+    
+    def _add_peer(self, peer_port: int):
+        if peer_port in self.queues:
+            return
+        self.queues[peer_port] = asyncio.Queue(maxsize=self.queue_size)
+        self.known[peer_port] = OrderedDict()
+        self._tasks.append(self._loop.create_task(self._send_loop(peer_port)))
+    
+    def _enqueue(self, block: Dict, origin_port: Optional[int]):
+        block_hash = block["hash"]
+        if origin_port is not None:
+            self._mark_known(origin_port, block_hash)
+        if block_hash in self.seen:
+            self.stats["deduplicated"] += 1
+            return
+        self._remember(self.seen, block_hash)
+        
+        # Serialized at most once per wire format, shared by all peers
+        outgoing = (block, {})
+        for peer_port, queue in self.queues.items():
+            known = self.known[peer_port]
+            if block_hash in known:
+                self.stats["deduplicated"] += 1
+                continue
+            self._remember(known, block_hash)
+            if queue.full():
+                # Newer blocks supersede the oldest unsent one
+                queue.get_nowait()
+                self.stats["dropped"] += 1
+            queue.put_nowait(outgoing)
+    
+    async def _send_loop(self, peer_port: int):
+        queue = self.queues[peer_port]
+        # Use API port (peer_port + 1000) for HTTP communication
+        url = f"http://localhost:{peer_port + 1000}/receive_block"
+        while True:
+            block, encoded = await queue.get()
+            content_type = self.wire_formats.get(peer_port, wire.WIRE_JSON)
+            payload = encoded.get(content_type)
+            if payload is None:
+                payload = encoded[content_type] = wire.encode(block, content_type)
+            headers = {
+                "Content-Type": content_type,
+                "Accept": wire.accept_header(),
+                GOSSIP_ORIGIN_HEADER: str(self.port)
+            }
+            try:
+                async with self._session.post(url, data=payload, headers=headers) as response:
+                    await response.read()
+                    self._learn_format(peer_port, response)
+                    self.stats["bytes_sent"] += len(payload)
+                    if response.status == 200:
+                        self.stats["sent"] += 1
+                    else:
+                        self.stats["failed"] += 1
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                # Peer not ready or too slow; gossip from other peers will cover it
+                self.stats["failed"] += 1
+
+def check_transfer(record) -> Dict:
+    """Raise ValueError unless record is a {"from", "to", "amount"} transfer"""
+    if not isinstance(record, dict):
+        raise ValueError("Transfer must be an object")
+    if not isinstance(record.get("from"), str) or not isinstance(record.get("to"), str):
+        raise ValueError("Transfer needs string 'from' and 'to' addresses")
+    amount = record.get("amount")
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+        raise ValueError("Transfer needs a numeric 'amount'")
+    return record
+
+def check_block(block) -> Dict:
+    """Raise ValueError unless block has the fields validation and state updates read"""
+    if not isinstance(block, dict):
+        raise ValueError("Block must be an object")
+    for key in ("index", "nonce"):
+        if isinstance(block.get(key), bool) or not isinstance(block.get(key), int):
+            raise ValueError(f"Block needs an integer '{key}'")
+    if block["index"] < 0:
+        raise ValueError("Block index must be >= 0")
+    for key in ("hash", "previous_hash", "validator"):
+        if not isinstance(block.get(key), str):
+            raise ValueError(f"Block needs a string '{key}'")
+    if "timestamp" not in block:
+        raise ValueError("Block needs a 'timestamp'")
+    if "merkle_root" in block and not isinstance(block["merkle_root"], str):
+        raise ValueError("Block 'merkle_root' must be a string")
+    if not isinstance(block.get("transactions"), list):
+        raise ValueError("Block needs a 'transactions' list")
+    for tx in block["transactions"]:
+        if not isinstance(check_transfer(tx).get("hash"), str):
+            raise ValueError("Block transactions need a string 'hash'")
+    return block
 
 class RealBlockchainNode:
     """A real, functional blockchain node that runs as a separate process"""
     
-    def __init__(self, node_id: str, port: int, node_type: str = "validator"):
+    def __init__(self, node_id: str, port: int, node_type: str = "validator", data_dir: Optional[str] = None,
+                 mining_workers: int = MINING_WORKERS):
         self.node_id = node_id
         self.port = port
         self.node_type = node_type
-        self.blockchain = []
+        self.data_dir = data_dir
         self.mempool = []
         self.peers = []
-        self.balance_db = {"genesis": 1000000}  # Real balance tracking
         self.running = False
+        self.miner = MiningEngine(workers=mining_workers)
+        self.tx_locations = {}  # tx hash -> (block index, position in block), in-memory chains only
+        self.chain_lock = threading.RLock()
+        self.sync_lock = threading.Lock()
+        self.mining_lock = threading.Lock()  # /mine requests and the mining loop take turns
+        self.gossip = BlockGossip(port)
+        self.http_server = None
+        
+        if data_dir:
+            # Blocks live in segment files; balances in an on-disk table snapshotted periodically
+            self.blockchain = BlockStore(os.path.join(data_dir, "blocks"))
+            self.balance_db = AccountStateStore(os.path.join(data_dir, "state.db"), INITIAL_BALANCES)
+            self._replay_since_snapshot()
+        else:
+            self.blockchain = []
+            self.balance_db = AccountStateStore(initial_balances=INITIAL_BALANCES)  # Real balance tracking
         
         # Real networking
         self.server_socket = None
@@ -54,29 +293,128 @@ class RealBlockchainNode:
         }
         
         # Actually mine the genesis block
+        genesis_block["merkle_root"] = self.calculate_merkle_root(genesis_block["transactions"])
         genesis_block["hash"] = self.calculate_block_hash(genesis_block)
         self.blockchain.append(genesis_block)
+        self._index_transactions(genesis_block)
         
         print(f"✅ {self.node_id}: Genesis block created - {genesis_block['hash'][:8]}...")
         return genesis_block
     
-    def calculate_block_hash(self, block):
-        """Calculate actual cryptographic hash"""
-        block_string = json.dumps({
+    def _hashed_fields(self, block, nonce):
+        fields = {
             "index": block["index"],
             "timestamp": block["timestamp"],
             "transactions": block["transactions"],
             "previous_hash": block["previous_hash"],
-            "nonce": block["nonce"],
+            "nonce": nonce,
             "validator": block["validator"]
-        }, sort_keys=True)
+        }
+        # Blocks from before Merkle roots were added hash without one
+        if "merkle_root" in block:
+            fields["merkle_root"] = block["merkle_root"]
+        return fields
+    
+    def calculate_block_hash(self, block):
+        """Calculate actual cryptographic hash"""
+        block_string = json.dumps(self._hashed_fields(block, block["nonce"]), sort_keys=True)
         
         return hashlib.sha256(block_string.encode()).hexdigest()
     
+    def calculate_merkle_root(self, transactions):
+        """Merkle root over the transaction hashes"""
+        return MerkleAccumulator(bytes.fromhex(tx["hash"]) for tx in transactions).root_hex()
+    
+    def get_merkle_proof(self, tx_hash):
+        """Inclusion proof a light client can check against the block's merkle_root"""
+        if isinstance(self.blockchain, BlockStore):
+            location = self.blockchain.locate_transaction(tx_hash)
+        else:
+            location = self.tx_locations.get(tx_hash)
+        if location is None:
+            return None
+        block_index, position = location
+        block = self.blockchain[block_index]
+        tree = MerkleAccumulator(bytes.fromhex(tx["hash"]) for tx in block["transactions"])
+        return {
+            "tx_hash": tx_hash,
+            "block_index": block_index,
+            "block_hash": block["hash"],
+            "index": position,
+            "siblings": [sibling.hex() for sibling in tree.proof(position)],
+            "merkle_root": tree.root_hex()
+        }
+    
+    @staticmethod
+    def verify_merkle_proof(proof, merkle_root):
+        """Check a proof from get_merkle_proof without the block's transactions"""
+        try:
+            return verify_merkle_proof(
+                bytes.fromhex(proof["tx_hash"]),
+                proof["index"],
+                [bytes.fromhex(sibling) for sibling in proof["siblings"]],
+                bytes.fromhex(merkle_root)
+            )
+        except (KeyError, TypeError, ValueError):
+            return False
+    
+    def append_block(self, block):
+        """Append a validated block, index its transactions and apply it to balances"""
+        self.blockchain.append(block)
+        self._index_transactions(block)
+        self.apply_block_to_state(block)
+    
+    def _index_transactions(self, block):
+        if not isinstance(self.blockchain, BlockStore):
+            for position, tx in enumerate(block["transactions"]):
+                self.tx_locations[tx["hash"]] = (block["index"], position)
+    
+    def apply_block_to_state(self, block):
+        """Apply a block's transfers, plus the reward for blocks this node mined"""
+        deltas = {}
+        for tx in block["transactions"]:
+            if tx["from"] != "genesis":
+                deltas[tx["from"]] = deltas.get(tx["from"], 0) - tx["amount"]
+            deltas[tx["to"]] = deltas.get(tx["to"], 0) + tx["amount"]
+        
+        if block["validator"] == self.node_id:
+            deltas[self.node_id] = deltas.get(self.node_id, 0) + MINING_REWARD
+        
+        self.balance_db.apply(block["index"], deltas)
+    
+    def _replay_since_snapshot(self):
+        """Bring balances up to the chain tip from the last state snapshot"""
+        # The genesis block seeds INITIAL_BALANCES rather than applying its transactions
+        start = max(self.balance_db.snapshot_height + 1, 1)
+        for height in range(start, len(self.blockchain)):
+            self.apply_block_to_state(self.blockchain[height])
+        if len(self.blockchain) > start:
+            print(f"🔁 {self.node_id}: Replayed {len(self.blockchain) - start} blocks since state snapshot")
+    
+    def close(self):
+        """Stop mining, networking and flush storage"""
+        self.miner.shutdown()
+        self.gossip.stop()
+        if self.http_server:
+            self.http_server.shutdown()
+            self.http_server.server_close()
+        self.balance_db.close()
+        if isinstance(self.blockchain, BlockStore):
+            self.blockchain.close()
+    
+    def block_header_template(self, block):
+        """Serialize the block once, split around the nonce value"""
+        block_string = json.dumps(self._hashed_fields(block, 0), sort_keys=True)
+        
+        # With sorted keys only "index" and "merkle_root" precede "nonce", so the first match is the header field
+        marker = '"nonce": '
+        split_at = block_string.index(marker) + len(marker)
+        return block_string[:split_at].encode(), block_string[split_at + 1:].encode()
+    
     def add_transaction(self, from_addr: str, to_addr: str, amount: float) -> bool:
         """Add a real transaction to mempool"""
         # Check balance
-        if from_addr != "genesis" and self.get_balance(from_addr) < amount:
+        if not self.has_funds(from_addr, amount):
             print(f"❌ Insufficient balance: {from_addr} has {self.get_balance(from_addr)}, needs {amount}")
             return False
         
@@ -88,55 +426,72 @@ class RealBlockchainNode:
             "hash": hashlib.sha256(f"{from_addr}{to_addr}{amount}{time.time()}".encode()).hexdigest()
         }
         
-        self.mempool.append(transaction)
+        with self.chain_lock:
+            self.mempool.append(transaction)
         print(f"✅ {self.node_id}: Transaction added - {from_addr} → {to_addr}: {amount} GSHIELD")
         return True
     
+    def has_funds(self, from_addr: str, amount: float) -> bool:
+        """Whether from_addr's confirmed balance covers amount; genesis mints"""
+        return from_addr == "genesis" or self.get_balance(from_addr) >= amount
+    
+    def add_transactions(self, batch: List[Dict]) -> int:
+        """Add a batch of transfers from /transactions; returns how many were accepted"""
+        return sum(
+            1 for tx in batch
+            if self.add_transaction(tx["from"], tx["to"], tx["amount"])
+        )
+    
     def mine_block(self) -> Optional[Dict]:
         """Actually mine a new block with proof of work"""
-        if not self.mempool:
-            return None
-        
-        previous_block = self.blockchain[-1] if self.blockchain else None
-        previous_hash = previous_block["hash"] if previous_block else "0" * 64
-        
-        new_block = {
-            "index": len(self.blockchain),
-            "timestamp": time.time(),
-            "transactions": self.mempool.copy(),
-            "previous_hash": previous_hash,
-            "nonce": 0,
-            "validator": self.node_id,
-            "hash": None
-        }
+        with self.mining_lock:
+            return self._mine_block()
+    
+    def _mine_block(self) -> Optional[Dict]:
+        with self.chain_lock:
+            if not self.mempool:
+                return None
+            
+            previous_block = self.blockchain[-1] if self.blockchain else None
+            previous_hash = previous_block["hash"] if previous_block else "0" * 64
+            
+            new_block = {
+                "index": len(self.blockchain),
+                "timestamp": time.time(),
+                "transactions": self.mempool.copy(),
+                "previous_hash": previous_hash,
+                "nonce": 0,
+                "validator": self.node_id,
+                "hash": None
+            }
+            # A peer block accepted after this point cancels this search, even before it starts
+            generation = self.miner.begin()
+        new_block["merkle_root"] = self.calculate_merkle_root(new_block["transactions"])
         
         # Real proof of work mining
         print(f"⛏️  {self.node_id}: Mining block {new_block['index']}...")
-        target = "0000"  # Difficulty target
+        difficulty = MINING_DIFFICULTY
         
-        while True:
-            new_block["nonce"] += 1
-            block_hash = self.calculate_block_hash(new_block)
-            
-            if block_hash.startswith(target):
-                new_block["hash"] = block_hash
-                break
-            
-            if new_block["nonce"] % 10000 == 0:
-                print(f"   Mining... nonce: {new_block['nonce']}")
-        
-        # Update balances
-        for tx in new_block["transactions"]:
-            if tx["from"] != "genesis":
-                self.balance_db[tx["from"]] = self.balance_db.get(tx["from"], 0) - tx["amount"]
-            self.balance_db[tx["to"]] = self.balance_db.get(tx["to"], 0) + tx["amount"]
+        prefix, suffix = self.block_header_template(new_block)
+        result = self.miner.mine(prefix, suffix, difficulty, start_nonce=1, generation=generation)
+        if result is None:
+            print(f"   ⏹️  {self.node_id}: Mining cancelled for block {new_block['index']}")
+            return None
         
-        # Add mining reward
-        mining_reward = 50
-        self.balance_db[self.node_id] = self.balance_db.get(self.node_id, 0) + mining_reward
+        new_block["nonce"], block_hash = result
+        new_block["hash"] = block_hash
+        print(f"   Hash rate: {self.miner.stats['hashes_per_second']:,.0f} H/s")
         
-        self.blockchain.append(new_block)
-        self.mempool.clear()
+        # Store the block and update balances, including the mining reward
+        mining_reward = MINING_REWARD
+        with self.chain_lock:
+            if new_block["index"] != len(self.blockchain):
+                print(f"   ⏹️  {self.node_id}: Block {new_block['index']} arrived from a peer first")
+                return None
+            self.append_block(new_block)
+            # Transactions accepted while the nonce search ran were not in this block; keep them
+            included = {tx["hash"] for tx in new_block["transactions"]}
+            self.mempool[:] = [tx for tx in self.mempool if tx["hash"] not in included]
         
         print(f"✅ {self.node_id}: Block #{new_block['index']} mined! Hash: {block_hash[:8]}...")
         print(f"   Transactions: {len(new_block['transactions'])}, Reward: {mining_reward} GSHIELD")
@@ -146,58 +501,82 @@ class RealBlockchainNode:
         
         return new_block
     
-    def get_balance(self, address: str) -> float:
-        """Get real balance for an address"""
+    def get_balance(self, address: str, height: Optional[int] = None) -> float:
+        """Get real balance for an address, optionally as of a past block height"""
+        if height is not None:
+            return self.balance_db.balance_at(address, height)
         return self.balance_db.get(address, 0)
     
-    def broadcast_block(self, block):
-        """Broadcast block to peer nodes"""
-        for peer_port in self.peers:
-            try:
-                # Use API port (peer_port + 1000) for HTTP communication
-                api_port = peer_port + 1000
-                response = requests.post(
-                    f"http://localhost:{api_port}/receive_block",
-                    json=block,
-                    timeout=5  # Increased timeout
-                )
-                if response.status_code == 200:
-                    print(f"   📡 Block broadcast to peer {peer_port} (API port {api_port})")
-                else:
-                    print(f"   ⚠️  Peer {peer_port} returned status {response.status_code}")
-            except requests.exceptions.ConnectionError:
-                print(f"   🔄 Peer {peer_port} not ready, skipping...")
-            except Exception as e:
-                print(f"   ⚠️  Failed to broadcast to peer {peer_port}: {e}")
-    
-    def receive_block(self, block):
-        """Receive and validate block from peer"""
-        if self.validate_block(block):
-            # Check if we don't already have this block
-            if block["index"] == len(self.blockchain):
-                self.blockchain.append(block)
-                
-                # Update balances from received block
-                for tx in block["transactions"]:
-                    if tx["from"] != "genesis":
-                        self.balance_db[tx["from"]] = self.balance_db.get(tx["from"], 0) - tx["amount"]
-                    self.balance_db[tx["to"]] = self.balance_db.get(tx["to"], 0) + tx["amount"]
-                
-                print(f"✅ {self.node_id}: Received and accepted block #{block['index']}")
-                return True
+    def _ensure_gossip(self):
+        if not self.gossip.running:
+            self.gossip.start()
+            for peer_port in self.peers:
+                self.gossip.add_peer(peer_port)
+    
+    def broadcast_block(self, block, origin_port: Optional[int] = None):
+        """Gossip block to peer nodes without blocking the caller"""
+        self._ensure_gossip()
+        self.gossip.publish(block, origin_port)
+    
+    def receive_block(self, block, origin_port: Optional[int] = None):
+        """Receive and validate block from peer, relaying it onward if new"""
+        if origin_port is not None and self.gossip.running:
+            self.gossip.mark_known(origin_port, block["hash"])
+        
+        with self.chain_lock:
+            if self.has_block(block):
+                return False  # Already relayed to us by another peer
+            
+            accepted = False
+            if self.validate_block(block):
+                # Check if we don't already have this block
+                if block["index"] == len(self.blockchain):
+                    # Our in-progress block at this height is now stale
+                    self.miner.cancel()
+                    self.append_block(block)
+                    accepted = True
+        
+        if accepted:
+            print(f"✅ {self.node_id}: Received and accepted block #{block['index']}")
+            self.broadcast_block(block, origin_port)
+            return True
+        
+        if (origin_port is not None and block["index"] >= len(self.blockchain)
+                and self.has_valid_proof_of_work(block)):
+            # The peer is ahead of us or on another branch; fetch what we are missing
+            print(f"🔄 {self.node_id}: Block #{block['index']} does not extend our chain, syncing with peer {origin_port}")
+            self.request_sync(origin_port)
+            return False
         
         print(f"❌ {self.node_id}: Rejected invalid block #{block['index']}")
         return False
     
+    def has_block(self, block) -> bool:
+        index = block["index"]
+        return index < len(self.blockchain) and self.blockchain[index]["hash"] == block["hash"]
+    
+    def has_valid_proof_of_work(self, block) -> bool:
+        """Hash matches the contents and meets the difficulty target"""
+        return (block["hash"].startswith("0" * MINING_DIFFICULTY)
+                and self.calculate_block_hash(block) == block["hash"])
+    
+    def has_valid_merkle_root(self, block) -> bool:
+        """Merkle root commits to exactly these transactions; malformed hashes make the block invalid"""
+        if "merkle_root" not in block:
+            return True
+        try:
+            return block["merkle_root"] == self.calculate_merkle_root(block["transactions"])
+        except (KeyError, TypeError, ValueError):
+            return False
+    
     def validate_block(self, block):
         """Validate a received block"""
-        # Check hash
-        calculated_hash = self.calculate_block_hash(block)
-        if calculated_hash != block["hash"]:
+        # Check hash and proof of work
+        if not self.has_valid_proof_of_work(block):
             return False
         
-        # Check proof of work
-        if not block["hash"].startswith("0000"):
+        # Check the Merkle root commits to exactly these transactions
+        if not self.has_valid_merkle_root(block):
             return False
         
         # Check previous hash
@@ -207,65 +586,316 @@ class RealBlockchainNode:
         
         return True
     
+    def block_header(self, block) -> Dict:
+        """Block without its transactions, as served by /headers"""
+        header = {key: value for key, value in block.items() if key != "transactions"}
+        header["tx_count"] = len(block["transactions"])
+        return header
+    
+    def get_headers(self, start: int, count: int) -> List[Dict]:
+        with self.chain_lock:
+            blocks = self.blockchain[start:start + min(count, SYNC_HEADER_BATCH)]
+        return [self.block_header(block) for block in blocks]
+    
+    def get_blocks(self, start: int, count: int) -> List[Dict]:
+        with self.chain_lock:
+            return list(self.blockchain[start:start + min(count, SYNC_BODY_BATCH)])
+    
+    def request_sync(self, peer_port: int):
+        """Catch up with a peer on a background thread; one sync runs at a time"""
+        if not self.sync_lock.acquire(blocking=False):
+            return
+        
+        def run():
+            try:
+                self.sync_with_peer(peer_port)
+            except Exception as e:
+                print(f"⚠️  {self.node_id}: Sync with peer {peer_port} failed: {e}")
+            finally:
+                self.sync_lock.release()
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def sync_with_peer(self, peer_port: int) -> bool:
+        """Headers-first sync: find the fork point, download bodies in parallel, then reorganize"""
+        self._ensure_gossip()
+        peers = [peer_port] + [p for p in self.peers if p != peer_port]
+        statuses = dict(zip(peers, self.gossip.fetch_all([(p, "/status") for p in peers])))
+        target = (statuses[peer_port] or {}).get("blockchain_length", 0)
+        if target <= len(self.blockchain):
+            return False
+        
+        found = self._download_headers(peer_port, target)
+        if found is None:
+            print(f"❌ {self.node_id}: No common ancestor with peer {peer_port} within {self.balance_db.undo_depth} blocks")
+            return False
+        fork, headers = found
+        
+        # Any peer at least as long can serve bodies; they are checked against the headers
+        sources = [p for p in peers if statuses[p] and statuses[p].get("blockchain_length", 0) >= target]
+        blocks = self._download_blocks(headers, sources)
+        if blocks is None:
+            print(f"❌ {self.node_id}: Peer {peer_port} served blocks that do not match its headers")
+            return False
+        return self.reorganize(fork, blocks)
+    
+    def _download_headers(self, peer_port: int, target: int) -> Optional[tuple]:
+        """(fork height, headers above it) following the peer's chain up to target"""
+        lookback = SYNC_LOOKBACK
+        while True:
+            start = max(0, len(self.blockchain) - lookback)
+            # Ask for no more than target, as the peer may mine more blocks while we download
+            paths = [
+                f"/headers?start={batch}&count={min(SYNC_HEADER_BATCH, target - batch)}"
+                for batch in range(start, target, SYNC_HEADER_BATCH)
+            ]
+            headers = []
+            for response in self.gossip.fetch_all([(peer_port, path) for path in paths]):
+                if response is None:
+                    return None
+                headers.extend(response["headers"])
+            headers = headers[:target - start]
+            if len(headers) != target - start:
+                return None
+            
+            with self.chain_lock:
+                fork = next((
+                    height for height in range(min(len(self.blockchain), target) - 1, start - 1, -1)
+                    if self.blockchain[height]["hash"] == headers[height - start]["hash"]
+                ), None)
+            if fork is not None:
+                break
+            if start == 0 or lookback >= self.balance_db.undo_depth:
+                return None
+            lookback = min(lookback * 8, self.balance_db.undo_depth)
+        
+        new_headers = headers[fork + 1 - start:]
+        previous_hash = headers[fork - start]["hash"]
+        for height, header in enumerate(new_headers, fork + 1):
+            if (header["index"] != height or header["previous_hash"] != previous_hash
+                    or not header["hash"].startswith("0" * MINING_DIFFICULTY)):
+                return None
+            previous_hash = header["hash"]
+        return fork, new_headers
+    
+    def _download_blocks(self, headers: List[Dict], sources: List[int]) -> Optional[List[Dict]]:
+        """Fetch bodies for headers, spreading batches across sources (the first is authoritative)"""
+        batches = [headers[i:i + SYNC_BODY_BATCH] for i in range(0, len(headers), SYNC_BODY_BATCH)]
+        paths = [f"/blocks?start={batch[0]['index']}&count={len(batch)}" for batch in batches]
+        responses = self.gossip.fetch_all([
+            (sources[n % len(sources)], path) for n, path in enumerate(paths)
+        ])
+        
+        blocks = []
+        for batch, path, response in zip(batches, paths, responses):
+            bodies = response and response["blocks"]
+            if not self._bodies_match(bodies, batch):
+                # That peer is on another branch or failed; retry with the peer we are following
+                response = self.gossip.fetch_all([(sources[0], path)])[0]
+                bodies = response and response["blocks"]
+                if not self._bodies_match(bodies, batch):
+                    return None
+            blocks.extend(bodies)
+        return blocks
+    
+    def _bodies_match(self, bodies: Optional[List[Dict]], headers: List[Dict]) -> bool:
+        if not bodies or len(bodies) != len(headers):
+            return False
+        for block, header in zip(bodies, headers):
+            if (block.get("hash") != header["hash"] or block.get("index") != header["index"]
+                    or block.get("previous_hash") != header["previous_hash"]):
+                return False
+            if not self.has_valid_proof_of_work(block) or not self.has_valid_merkle_root(block):
+                return False
+        return True
+    
+    def _is_valid_branch(self, fork: int, blocks: List[Dict]) -> bool:
+        """Blocks link one by one from our block at height fork, each with valid proof of work and Merkle root"""
+        previous_hash = self.blockchain[fork]["hash"]
+        try:
+            for height, block in enumerate(blocks, fork + 1):
+                if block["index"] != height or block["previous_hash"] != previous_hash:
+                    return False
+                if not self.has_valid_proof_of_work(block) or not self.has_valid_merkle_root(block):
+                    return False
+                previous_hash = block["hash"]
+        except (KeyError, TypeError):
+            return False
+        return True
+    
+    def reorganize(self, fork: int, blocks: List[Dict]) -> bool:
+        """Adopt blocks branching off after height fork if they make a longer chain"""
+        with self.chain_lock:
+            # Our chain may have moved on while we were downloading
+            if fork >= len(self.blockchain) or self.blockchain[fork]["hash"] != blocks[0]["previous_hash"]:
+                return False
+            if fork + 1 + len(blocks) <= len(self.blockchain):
+                return False
+            # Check the whole branch before touching our chain, so a bad peer cannot shorten it
+            if not self._is_valid_branch(fork, blocks):
+                print(f"❌ {self.node_id}: Peer branch from height {fork + 1} is invalid, keeping our chain")
+                return False
+            
+            self.miner.cancel()
+            orphaned_blocks = list(self.blockchain[fork + 1:])
+            orphaned = self.rollback(fork)
+            appended = []
+            try:
+                for block in blocks:
+                    if not self.validate_block(block):
+                        raise ValueError(f"block #{block['index']} failed validation")
+                    self.append_block(block)
+                    appended.append(block)
+            except Exception as e:
+                # Put our own branch back exactly as it was
+                print(f"❌ {self.node_id}: Reorganization failed ({e}), restoring our chain")
+                self.rollback(fork)
+                for block in orphaned_blocks:
+                    self.append_block(block)
+                return False
+            
+            # Transactions from abandoned blocks go back to the mempool unless the new chain has them,
+            # and only while the new chain's balances still cover them
+            included = {tx["hash"] for block in appended for tx in block["transactions"]}
+            self.mempool[:] = [
+                tx for tx in orphaned + self.mempool
+                if tx["hash"] not in included and self.has_funds(tx["from"], tx["amount"])
+            ]
+            tip = self.blockchain[-1]
+        
+        print(f"🔀 {self.node_id}: Switched to peer chain from height {fork + 1}, new length {len(self.blockchain)}")
+        self.broadcast_block(tip)
+        return True
+    
+    def rollback(self, height: int) -> List[Dict]:
+        """Drop blocks above height, undoing their balance changes; returns their transactions"""
+        removed = list(self.blockchain[height + 1:])
+        if not removed:
+            return []
+        self.balance_db.revert_to(height)
+        if isinstance(self.blockchain, BlockStore):
+            self.blockchain.truncate(height + 1)
+        else:
+            del self.blockchain[height + 1:]
+            for block in removed:
+                for tx in block["transactions"]:
+                    self.tx_locations.pop(tx["hash"], None)
+        return [tx for block in removed for tx in block["transactions"]]
+    
     def start_http_server(self):
         """Start real HTTP server for API access"""
-        from http.server import HTTPServer, BaseHTTPRequestHandler
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
         import json
         import urllib.parse
         
         class BlockchainHandler(BaseHTTPRequestHandler):
+            # HTTP/1.1 keeps gossip connections from peers open between blocks
+            protocol_version = "HTTP/1.1"
+            
             def __init__(self, node, *args, **kwargs):
                 self.node = node
                 super().__init__(*args, **kwargs)
             
+            def send_json(self, payload, status=200, cors=True, **dump_kwargs):
+                body = json.dumps(payload, **dump_kwargs).encode()
+                self.send_response(status)
+                self.send_header('Content-type', 'application/json')
+                if cors:
+                    self.send_header('Access-Control-Allow-Origin', '*')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def read_json(self):
+                content_length = int(self.headers['Content-Length'])
+                post_data = self.rfile.read(content_length)
+                return json.loads(post_data.decode())
+            
+            def send_payload(self, payload, status=200):
+                """Peer responses: msgpack when the Accept header names it, JSON otherwise"""
+                content_type = wire.negotiate(self.headers.get('Accept'))
+                body = wire.encode(payload, content_type)
+                self.send_response(status)
+                self.send_header('Content-type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def read_payload(self, batch=False):
+                content_type = wire.content_type_of(self.headers.get('Content-Type'))
+                if content_type not in wire.supported_formats():
+                    raise ValueError(f"Unsupported content type {content_type}")
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                return wire.decode_batch(body, content_type) if batch else wire.decode(body, content_type)
+            
             def do_GET(self):
                 if self.path == "/status":
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    
                     status = {
                         "node_id": self.node.node_id,
                         "node_type": self.node.node_type,
                         "port": self.node.port,
                         "blockchain_length": len(self.node.blockchain),
                         "mempool_size": len(self.node.mempool),
+                        "hash_rate": self.node.miner.stats["hashes_per_second"],
+                        "gossip": self.node.gossip.get_status(),
                         "peers": len(self.node.peers),
                         "running": self.node.running,
+                        "wire_formats": wire.supported_formats(),
                         "latest_block_hash": self.node.blockchain[-1]["hash"][:8] if self.node.blockchain else None
                     }
                     
-                    self.wfile.write(json.dumps(status, indent=2).encode())
+                    self.send_json(status, indent=2)
                 
                 elif self.path == "/blockchain":
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    
-                    self.wfile.write(json.dumps(self.node.blockchain, indent=2).encode())
+                    self.send_json(list(self.node.blockchain), indent=2)
                 
                 elif self.path.startswith("/balance/"):
-                    address = self.path.split("/")[-1]
-                    balance = self.node.get_balance(address)
-                    
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
+                    parsed = urllib.parse.urlparse(self.path)
+                    address = parsed.path.split("/")[-1]
+                    height = urllib.parse.parse_qs(parsed.query).get("height", [None])[0]
+                    if height is not None:
+                        try:
+                            height = int(height)
+                            if height < 0:
+                                raise ValueError("height must be >= 0")
+                        except ValueError as e:
+                            self.send_error(400, str(e))
+                            return
+                    balance = self.node.get_balance(address, height)
                     
                     response = {"address": address, "balance": balance}
-                    self.wfile.write(json.dumps(response).encode())
+                    self.send_json(response)
+                
+                elif self.path.startswith(("/headers", "/blocks")):
+                    parsed = urllib.parse.urlparse(self.path)
+                    query = urllib.parse.parse_qs(parsed.query)
+                    try:
+                        start = int(query.get("start", [0])[0])
+                        count = int(query.get("count", [SYNC_HEADER_BATCH])[0])
+                        if start < 0 or count <= 0:
+                            raise ValueError("start must be >= 0 and count > 0")
+                    except ValueError as e:
+                        self.send_error(400, str(e))
+                        return
+                    if parsed.path == "/headers":
+                        self.send_payload({"headers": self.node.get_headers(start, count)})
+                    else:
+                        self.send_payload({"blocks": self.node.get_blocks(start, count)})
+                
+                elif self.path.startswith("/proof/"):
+                    proof = self.node.get_merkle_proof(self.path.split("/")[-1])
+                    if proof is None:
+                        self.send_error(404)
+                        return
+                    
+                    self.send_json(proof)
                 
                 else:
                     self.send_error(404)
             
             def do_POST(self):
                 if self.path == "/transaction":
-                    content_length = int(self.headers['Content-Length'])
-                    post_data = self.rfile.read(content_length)
-                    transaction_data = json.loads(post_data.decode())
+                    transaction_data = self.read_json()
                     
                     success = self.node.add_transaction(
                         transaction_data["from"],
@@ -273,38 +903,38 @@ class RealBlockchainNode:
                         transaction_data["amount"]
                     )
                     
-                    self.send_response(200 if success else 400)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    
                     response = {"success": success}
-                    self.wfile.write(json.dumps(response).encode())
+                    self.send_json(response, 200 if success else 400)
                 
                 elif self.path == "/mine":
                     block = self.node.mine_block()
                     
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.send_header('Access-Control-Allow-Origin', '*')
-                    self.end_headers()
-                    
                     response = {"block_mined": block is not None, "block": block}
-                    self.wfile.write(json.dumps(response, default=str).encode())
+                    self.send_json(response, default=str)
                 
-                elif self.path == "/receive_block":
-                    content_length = int(self.headers['Content-Length'])
-                    post_data = self.rfile.read(content_length)
-                    block_data = json.loads(post_data.decode())
+                elif self.path == "/transactions":
+                    try:
+                        batch = [check_transfer(record) for record in self.read_payload(batch=True)]
+                    except ValueError as e:
+                        self.send_error(400, str(e))
+                        return
                     
-                    success = self.node.receive_block(block_data)
+                    accepted = self.node.add_transactions(batch)
+                    self.send_payload({"accepted": accepted, "received": len(batch)})
+                
+                elif self.path == "/receive_block":
+                    try:
+                        block_data = check_block(self.read_payload())
+                        origin = self.headers.get(GOSSIP_ORIGIN_HEADER)
+                        origin = int(origin) if origin else None
+                    except ValueError as e:
+                        self.send_error(400, str(e))
+                        return
                     
-                    self.send_response(200)
-                    self.send_header('Content-type', 'application/json')
-                    self.end_headers()
+                    success = self.node.receive_block(block_data, origin)
                     
                     response = {"accepted": success}
-                    self.wfile.write(json.dumps(response).encode())
+                    self.send_payload(response)
                 
                 else:
                     self.send_error(404)
@@ -316,12 +946,14 @@ class RealBlockchainNode:
         handler = lambda *args, **kwargs: BlockchainHandler(self, *args, **kwargs)
         
         try:
-            server = HTTPServer(('localhost', self.port + 1000), handler)  # API on port+1000
+            server = ThreadingHTTPServer(('localhost', self.port + 1000), handler)  # API on port+1000
+            server.daemon_threads = True
             print(f"🌐 {self.node_id}: HTTP API server started on http://localhost:{self.port + 1000}")
             
             self.http_server_thread = threading.Thread(target=server.serve_forever, daemon=True)
             self.http_server_thread.start()
             
+            self.http_server = server
             return server
         except Exception as e:
             print(f"❌ Failed to start HTTP server: {e}")
@@ -331,6 +963,8 @@ class RealBlockchainNode:
         """Connect to another node as a peer"""
         if peer_port not in self.peers and peer_port != self.port:
             self.peers.append(peer_port)
+            if self.gossip.running:
+                self.gossip.add_peer(peer_port)
             print(f"🤝 {self.node_id}: Connected to peer on port {peer_port}")
     
     def start_mining_loop(self):
@@ -353,8 +987,11 @@ class RealBlockchainNode:
         if not self.blockchain:
             self.create_genesis_block()
         
-        # Start HTTP API server
+        # Start HTTP API server and gossip layer
         self.start_http_server()
+        self.gossip.start()
+        for peer_port in self.peers:
+            self.gossip.add_peer(peer_port)
         
         # Start mining loop
         self.start_mining_loop()
@@ -366,9 +1003,11 @@ class RealBlockchainNode:
 class RealGuardianShieldNetwork:
     """Manages a real network of blockchain nodes"""
     
-    def __init__(self):
+    def __init__(self, data_dir: Optional[str] = None, mining_workers: int = MINING_WORKERS):
         self.nodes = []
         self.base_port = 9000
+        self.data_dir = data_dir
+        self.mining_workers = mining_workers  # Per node; every node runs its own worker pool
     
     def create_real_network(self, num_nodes: int = 3):
         """Create a real network of blockchain nodes"""
@@ -381,7 +1020,8 @@ class RealGuardianShieldNetwork:
             port = self.base_port + i
             node_type = "genesis" if i == 0 else "validator"
             
-            node = RealBlockchainNode(node_id, port, node_type)
+            node_dir = os.path.join(self.data_dir, node_id) if self.data_dir else None
+            node = RealBlockchainNode(node_id, port, node_type, node_dir, self.mining_workers)
             self.nodes.append(node)
         
         # Start all nodes first to initialize HTTP servers
@@ -413,6 +1053,7 @@ class RealGuardianShieldNetwork:
             print(f"  Status: http://localhost:{api_port}/status")
             print(f"  Blockchain: http://localhost:{api_port}/blockchain") 
             print(f"  Balance: http://localhost:{api_port}/balance/ADDRESS")
+            print(f"  Merkle proof: http://localhost:{api_port}/proof/TX_HASH")
             print(f"  Mine: POST http://localhost:{api_port}/mine")
             print(f"  Transaction: POST http://localhost:{api_port}/transaction")
         
@@ -467,7 +1108,7 @@ def main():
     print("=" * 60)
     
     # Create real network
-    network = RealGuardianShieldNetwork()
+    network = RealGuardianShieldNetwork(data_dir=os.getenv("GUARDIAN_CHAIN_DATA", "chain_data"))
     nodes = network.create_real_network(num_nodes=3)
     
     # Wait for nodes to initialize
@@ -506,6 +1147,7 @@ def main():
         print(f"\n🛑 Shutting down GuardianShield Chain...")
         for node in nodes:
             node.running = False
+            node.close()
         print("✅ Network stopped")
 
 if __name__ == "__main__":
@@ -3,18 +3,21 @@ GuardianShield Sentry Attack Absorber
 Advanced DDoS protection and attack mitigation system
 """
 import asyncio
+import os
+import socket
 import time
 import json
 import logging
 import subprocess
+import ipaddress
 import psutil
 import redis
 from collections import defaultdict, deque
 from datetime import datetime, timedelta
-import netaddr
 
 class SentryAttackAbsorber:
     def __init__(self, config_path="/sentry/config/attack-absorber.json"):
+        self.config_path = config_path
         self.config = self.load_config(config_path)
         self.redis_client = redis.Redis(host='localhost', port=6379, decode_responses=True)
         
@@ -40,6 +43,12 @@ class SentryAttackAbsorber:
         )
         self.logger = logging.getLogger(__name__)
         
+        # Whitelist/blacklist compiled once into longest-prefix-match tables
+        self.ip_list_mtimes = {}
+        self.whitelist = IPPrefixTable()
+        self.blacklist = IPPrefixTable()
+        self.reload_ip_lists()
+        
     def load_config(self, config_path):
         """Load attack absorber configuration"""
         try:
@@ -68,6 +77,7 @@ class SentryAttackAbsorber:
                     "192.168.0.0/16"
                 ],
                 "blacklist_ips": [],
+                "blacklist_feeds": [],
                 "geoblocking": {
                     "enabled": False,
                     "blocked_countries": []
@@ -76,31 +86,68 @@ class SentryAttackAbsorber:
     
     def is_whitelisted(self, ip):
         """Check if IP is whitelisted"""
-        try:
-            ip_obj = netaddr.IPAddress(ip)
-            for whitelist_range in self.config['whitelist_ips']:
-                if ip_obj in netaddr.IPNetwork(whitelist_range):
-                    return True
-            return False
-        except:
-            return False
+        return ip in self.whitelist
     
     def is_blacklisted(self, ip):
         """Check if IP is blacklisted"""
-        try:
-            ip_obj = netaddr.IPAddress(ip)
-            for blacklist_range in self.config['blacklist_ips']:
-                if ip_obj in netaddr.IPNetwork(blacklist_range):
-                    return True
-            return False
-        except:
-            return False
+        return ip in self.blacklist
+    
+    def _ip_list_sources(self):
+        """Config file and threat feed files whose changes trigger a reload"""
+        return [self.config_path] + list(self.config.get('blacklist_feeds', []))
+    
+    def reload_ip_lists(self, reload_config=False):
+        """Rebuild whitelist/blacklist tables from config and threat feeds, then swap them in"""
+        if reload_config:
+            self.config = self.load_config(self.config_path)
+        
+        whitelist = IPPrefixTable()
+        blacklist = IPPrefixTable()
+        rejected = whitelist.bulk_load(self.config.get('whitelist_ips', []))
+        rejected += blacklist.bulk_load(self.config.get('blacklist_ips', []))
+        
+        for feed_path in self.config.get('blacklist_feeds', []):
+            try:
+                with open(feed_path, 'r') as f:
+                    rejected += blacklist.bulk_load(
+                        line.split('#', 1)[0].strip() for line in f
+                    )
+            except OSError as e:
+                self.logger.error(f"Error loading threat feed {feed_path}: {e}")
+        
+        if rejected:
+            self.logger.warning(f"Skipped {rejected} invalid IP ranges")
+        
+        # Readers only ever see a complete table
+        self.whitelist = whitelist
+        self.blacklist = blacklist
+        self.ip_list_mtimes = self._current_ip_list_mtimes()
+        self.logger.info(
+            f"Loaded {len(whitelist)} whitelist and {len(blacklist)} blacklist ranges"
+        )
+    
+    def _current_ip_list_mtimes(self):
+        mtimes = {}
+        for path in self._ip_list_sources():
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = None
+        return mtimes
+    
+    def maybe_reload_ip_lists(self):
+        """Hot-reload the IP tables when the config file or a threat feed changes"""
+        if self._current_ip_list_mtimes() != self.ip_list_mtimes:
+            self.reload_ip_lists(reload_config=True)
+            return True
+        return False
     
     async def detect_ddos_patterns(self):
         """Detect DDoS attack patterns"""
         while True:
             try:
                 current_time = time.time()
+                self.maybe_reload_ip_lists()
                 
                 # Get system metrics
                 cpu_percent = psutil.cpu_percent(interval=1)
@@ -401,6 +448,120 @@ class SentryAttackAbsorber:
         except KeyboardInterrupt:
             self.logger.info("Attack absorber shutting down...")
 
+class _PrefixNode:
+    """Patricia trie node covering the first prefix_len bits of key"""
+    
+    __slots__ = ('key', 'prefix_len', 'value', 'children')
+    
+    def __init__(self, key, prefix_len, value=None):
+        self.key = key
+        self.prefix_len = prefix_len
+        self.value = value
+        self.children = [None, None]
+
+class PatriciaTrie:
+    """Path-compressed binary trie over fixed-width integer keys for longest-prefix match"""
+    
+    def __init__(self, width):
+        self.width = width
+        self.root = _PrefixNode(0, 0)
+        self.size = 0
+    
+    def insert(self, key, prefix_len, value=True):
+        width = self.width
+        node = self.root
+        while True:
+            if node.prefix_len == prefix_len:
+                if node.value is None:
+                    self.size += 1
+                node.value = value
+                return
+            
+            bit = (key >> (width - 1 - node.prefix_len)) & 1
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _PrefixNode(key, prefix_len, value)
+                self.size += 1
+                return
+            
+            common = min(prefix_len, child.prefix_len, width - (key ^ child.key).bit_length())
+            if common == child.prefix_len:
+                node = child
+                continue
+            
+            # Split the edge: child diverges from key before its own prefix ends
+            if common == prefix_len:
+                branch = _PrefixNode(key, prefix_len, value)
+                self.size += 1
+            else:
+                mask = ((1 << common) - 1) << (width - common)
+                branch = _PrefixNode(key & mask, common)
+                leaf = _PrefixNode(key, prefix_len, value)
+                branch.children[(key >> (width - 1 - common)) & 1] = leaf
+                self.size += 1
+            branch.children[(child.key >> (width - 1 - common)) & 1] = child
+            node.children[bit] = branch
+            return
+    
+    def longest_match(self, address):
+        """Value of the most specific prefix containing address, or None"""
+        width = self.width
+        node = self.root
+        best = node.value
+        while True:
+            if node.prefix_len == width:
+                return best
+            node = node.children[(address >> (width - 1 - node.prefix_len)) & 1]
+            if node is None or (address ^ node.key) >> (width - node.prefix_len):
+                return best
+            if node.value is not None:
+                best = node.value
+
+class IPPrefixTable:
+    """IPv4 and IPv6 CIDR ranges compiled into Patricia tries"""
+    
+    def __init__(self, ranges=()):
+        self.ipv4 = PatriciaTrie(32)
+        self.ipv6 = PatriciaTrie(128)
+        self.bulk_load(ranges)
+    
+    def add(self, cidr, value=True):
+        network = ipaddress.ip_network(str(cidr).strip(), strict=False)
+        trie = self.ipv4 if network.version == 4 else self.ipv6
+        trie.insert(int(network.network_address), network.prefixlen, value)
+    
+    def bulk_load(self, ranges, value=True):
+        """Add many CIDR strings, returning how many were invalid"""
+        rejected = 0
+        for cidr in ranges:
+            if not cidr:
+                continue
+            try:
+                self.add(cidr, value)
+            except ValueError:
+                rejected += 1
+        return rejected
+    
+    def lookup(self, ip):
+        """Value of the longest matching range, or None when unmatched or unparsable"""
+        try:
+            if ':' not in ip:
+                return self.ipv4.longest_match(int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big'))
+            address = int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), 'big')
+        except (OSError, TypeError, ValueError):
+            return None
+        
+        # Dual-stack sockets report IPv4 peers as ::ffff:a.b.c.d
+        if address >> 32 == 0xffff:
+            return self.ipv4.longest_match(address & 0xffffffff)
+        return self.ipv6.longest_match(address)
+    
+    def __contains__(self, ip):
+        return self.lookup(ip) is not None
+    
+    def __len__(self):
+        return self.ipv4.size + self.ipv6.size
+
 async def main():
     """Main attack absorber function"""
     absorber = SentryAttackAbsorber()
@@ -0,0 +1,129 @@
+"""
+test_agent_registry.py: Tests for the GuardianShield API agent registry
+"""
+import asyncio
+import threading
+import time
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from agent_registry import AGENT_RETRY_SECONDS, AgentRegistry
+
+
+class CountingAgent:
+    """Agent stand-in that counts constructions and cycles"""
+    instances = 0
+    
+    def __init__(self):
+        CountingAgent.instances += 1
+        self.cycles = 0
+        self.release = threading.Event()
+        self.release.set()
+        self.fail = False
+        self.report_error = False
+    
+    def run(self):
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("feed unavailable")
+        if self.report_error:
+            return {"error": "feed timed out"}
+        self.cycles += 1
+        return {"cycle": self.cycles}
+
+
+class TestAgentRegistry:
+    """Test suite for cached agent results with background refresh"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        CountingAgent.instances = 0
+        self.registry = AgentRegistry()
+    
+    def teardown_method(self):
+        self.registry.shutdown()
+    
+    def register(self, ttl):
+        self.registry.register("counting", CountingAgent, lambda agent: agent.run(), ttl=ttl)
+        return self.registry.entries["counting"]
+    
+    @pytest.mark.asyncio
+    async def test_fresh_result_is_cached(self):
+        """Test that the agent is built once and a fresh result is served without a cycle"""
+        self.register(ttl=60)
+        assert await self.registry.get_result("counting") == {"cycle": 1}
+        for _ in range(5):
+            assert await self.registry.get_result("counting") == {"cycle": 1}
+        assert CountingAgent.instances == 1
+        assert self.registry.get_status()["counting"]["initialized"]
+    
+    @pytest.mark.asyncio
+    async def test_start_runs_first_cycle_in_background(self):
+        """Test that start() schedules the first cycle without waiting for it"""
+        entry = self.register(ttl=60)
+        await self.registry.start()
+        assert entry.result is None
+        await entry.refresh_task
+        assert entry.result == {"cycle": 1}
+    
+    @pytest.mark.asyncio
+    async def test_stale_result_served_during_single_refresh(self):
+        """Test that an expired result is returned at once while one refresh runs"""
+        entry = self.register(ttl=60)
+        await self.registry.get_result("counting")
+        entry.expires_at = time.time() - 1
+        entry.agent.release.clear()
+        
+        results = await asyncio.gather(*(self.registry.get_result("counting") for _ in range(3)))
+        assert results == [{"cycle": 1}] * 3
+        refresh = entry.refresh_task
+        assert not refresh.done()
+        assert self.registry.get_status()["counting"]["refreshing"]
+        
+        entry.agent.release.set()
+        await refresh
+        assert await self.registry.get_result("counting") == {"cycle": 2}
+        assert entry.agent.cycles == 2
+    
+    @pytest.mark.asyncio
+    async def test_failed_cycle_keeps_last_result(self):
+        """Test that a failure serves the previous result and backs off before retrying"""
+        entry = self.register(ttl=60)
+        await self.registry.get_result("counting")
+        entry.expires_at = time.time() - 1
+        entry.agent.fail = True
+        
+        assert await self.registry.get_result("counting") == {"cycle": 1}
+        await entry.refresh_task
+        assert self.registry.get_status()["counting"]["last_error"] == "feed unavailable"
+        assert entry.is_fresh(time.time())
+        assert entry.expires_at <= time.time() + AGENT_RETRY_SECONDS
+        assert await self.registry.get_result("counting") == {"cycle": 1}
+    
+    @pytest.mark.asyncio
+    async def test_error_result_treated_as_failure(self):
+        """Test that a cycle returning an error is retried soon rather than cached for the TTL"""
+        entry = self.register(ttl=300)
+        await self.registry.get_result("counting")
+        entry.expires_at = time.time() - 1
+        entry.agent.report_error = True
+        
+        assert await self.registry.get_result("counting") == {"cycle": 1}
+        await entry.refresh_task
+        assert entry.result == {"cycle": 1}
+        assert self.registry.get_status()["counting"]["last_error"] == "feed timed out"
+        assert entry.expires_at <= time.time() + AGENT_RETRY_SECONDS
+    
+    @pytest.mark.asyncio
+    async def test_failed_first_cycle_returns_error(self):
+        """Test that an agent that cannot be built reports the error instead of raising"""
+        def broken():
+            raise RuntimeError("model missing")
+        
+        self.registry.register("broken", broken, lambda agent: agent.run(), ttl=60)
+        assert await self.registry.get_result("broken") == {"error": "model missing"}
+        assert not self.registry.get_status()["broken"]["initialized"]
@@ -3,7 +3,11 @@ test_agents.py: Comprehensive test suite for GuardianShield agents
 """
 import pytest
 import asyncio
+import gc
 import json
+import random
+import sqlite3
+import tempfile
 import time
 from unittest.mock import Mock, patch, MagicMock
 import sys
@@ -20,6 +24,11 @@ from agents.data_ingestion import DataIngestionAgent
 from agents.web3_utils import SecureWeb3Utils
 from agents.flare_integration import FlareIntegrationAgent
 from agents.dmer_monitor_agent import DMERMonitorAgent
+from agents import internal_security_agent
+from agents.threat_definitions import EvolvingThreatDefinitions, ThreatMatcherIndex
+from agents.advanced_ai_agents import (
+    AdvancedAIAgentManager, AdvancedThreatDetectionEngine, PatternWriteBuffer, _open_pattern_buffers
+)
 from agents.utils import (
     HashUtilities, DataValidator, TimeUtilities, 
     NetworkUtilities, FileUtilities, ConfigurationManager
@@ -140,6 +149,7 @@ class TestBehavioralAnalyticsAgent:
         """Test agent initialization"""
         assert len(self.agent.behavior_log) == 0
         assert self.agent.anomaly_threshold == 2.5
+        assert self.agent.streaming
     
     def test_log_behavior(self):
         """Test behavior logging"""
@@ -173,7 +183,67 @@ class TestBehavioralAnalyticsAgent:
         anomalies = self.agent.analyze_behavior()
         assert anomalies is not None
         assert len(anomalies) > 0
-    
+
+    def test_batch_analyze_behavior(self):
+        """Test the full-log batch mode"""
+        agent = BehavioralAnalyticsAgent(streaming=False)
+        for i in range(10):
+            agent.log_behavior({'type': 'normal', 'value': 5.0 + (i * 0.1), 'timestamp': time.time()})
+        agent.log_behavior({'type': 'anomaly', 'value': 50.0, 'timestamp': time.time()})
+        
+        anomalies = agent.analyze_behavior()
+        assert any(anomaly[0] == 10 for anomaly in anomalies)
+        assert agent.run()['mode'] == 'batch'
+    
+    def test_streaming_analyze_behavior(self):
+        """Test ring-buffer streaming mode"""
+        agent = BehavioralAnalyticsAgent(max_log_size=20, streaming=True, refit_interval=5)
+        for i in range(30):
+            agent.log_behavior({
+                'type': 'normal',
+                'value': 5.0 + (i % 3) * 0.1,
+                'timestamp': time.time()
+            })
+
+        # Log stays bounded and only new events are scored
+        assert len(agent.behavior_log) == 20
+        assert agent.feature_ring.size == 20
+        agent.analyze_behavior()
+
+        agent.log_behavior({'type': 'anomaly', 'value': 50.0, 'timestamp': time.time()})
+        anomalies = agent.analyze_behavior()
+        assert anomalies is not None
+        assert any(anomaly[0] == 30 for anomaly in anomalies)
+
+    def test_anomalies_ranked_by_score(self):
+        """Test that anomalies come back as a list ordered by z-score"""
+        agent = BehavioralAnalyticsAgent(streaming=True)
+        for i in range(40):
+            agent.log_behavior({'type': 'normal', 'value': 5.0 + (i % 3) * 0.1, 'timestamp': time.time()})
+        for value in (60.0, 90.0, 70.0):
+            agent.log_behavior({'type': 'anomaly', 'value': value, 'timestamp': time.time()})
+        
+        anomalies = agent.analyze_behavior()
+        assert isinstance(anomalies, list)
+        scores = [anomaly[2] for anomaly in anomalies]
+        assert scores == sorted(scores, reverse=True)
+        assert [anomaly[0] for anomaly in anomalies[:3]] == [41, 42, 40]
+
+    def test_load_capped_log_continues_ids(self, tmp_path):
+        """Test that events logged after loading a capped log get fresh ids"""
+        path = str(tmp_path / 'behavior_log.json')
+        writer = BehavioralAnalyticsAgent(max_log_size=20)
+        for i in range(50):
+            writer.log_behavior({'type': 'normal', 'value': 5.0, 'timestamp': time.time()})
+        writer.save_log(path)
+        
+        reader = BehavioralAnalyticsAgent(max_log_size=20)
+        reader.load_log(path)
+        reader.log_behavior({'type': 'normal', 'value': 5.0, 'timestamp': time.time()})
+        ids = [event['id'] for event in reader.behavior_log]
+        assert ids[-1] == 50
+        assert len(set(ids)) == len(ids)
+
     def test_recursive_improve(self):
         """Test recursive improvement"""
         # Set up performance metrics
@@ -186,6 +256,237 @@ class TestBehavioralAnalyticsAgent:
         # Threshold should adjust for high false positive rate
         assert self.agent.anomaly_threshold != initial_threshold
 
+class TestThreatMatcherIndex:
+    """Test suite for the precompiled known-threat index"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        self.index = ThreatMatcherIndex.build({
+            'scam_addresses': ['0xdeadbeefdeadbeefdeadbeefdeadbeefdeadbeef'],
+            'malicious_ips': ['192.0.2.1', '2001:db8::1'],
+            'malicious_domains': ['phishing-site.com']
+        })
+    
+    def test_ip_with_port(self):
+        """Test that an IP followed by a port still matches"""
+        assert self.index.match('192.0.2.1:8080') == 'malicious_ips'
+        assert self.index.match('connect 192.0.2.1') == 'malicious_ips'
+        assert self.index.match('192.0.2.10') is None
+    
+    def test_prefixed_address(self):
+        """Test addresses behind scheme-like or mention prefixes"""
+        assert self.index.match('addr:0xdeadbeefdeadbeefdeadbeefdeadbeefdeadbeef') == 'scam_addresses'
+        assert self.index.match('@0xdeadbeefdeadbeefdeadbeefdeadbeefdeadbeef') == 'scam_addresses'
+    
+    def test_multi_token_entries_match_as_substrings(self):
+        """Test entries containing separators keep substring matching"""
+        assert self.index.match('[2001:db8::1]:443') == 'malicious_ips'
+        assert self.index.match('https://login.phishing-site.com/x') == 'malicious_domains'
+
+class TestEvolvingThreatIndex:
+    """Test suite for keeping the threat index in step with the database"""
+    
+    @pytest.fixture(autouse=True)
+    def setup_definitions(self, tmp_path, monkeypatch):
+        """Setup test environment with a throwaway threat database"""
+        monkeypatch.chdir(tmp_path)
+        self.definitions = EvolvingThreatDefinitions()
+    
+    def test_learned_threat_indexed_without_rebuild(self):
+        """Test that learn_new_threat extends the existing index in place"""
+        index = self.definitions._get_threat_index()
+        address = '0x' + 'ab12' * 10
+        assert not self.definitions.is_known_threat(address)['is_threat']
+        
+        learned = self.definitions.learn_new_threat({'type': 'address', 'value': address, 'confidence': 0.95})
+        assert learned
+        assert self.definitions.is_known_threat(f'send to {address}')['threat_type'] == 'scam_addresses'
+        assert self.definitions._threat_index is index
+    
+    def test_in_place_edits_invalidate_index(self):
+        """Test that same-length replacements and remove-then-add are not served stale"""
+        ips = self.definitions.known_threats['malicious_ips']
+        assert self.definitions.is_known_threat('192.0.2.1')['is_threat']
+        
+        ips[0] = '198.18.0.1'
+        assert not self.definitions.is_known_threat('192.0.2.1')['is_threat']
+        assert self.definitions.is_known_threat('198.18.0.1')['threat_type'] == 'malicious_ips'
+        
+        ips.remove('203.0.113.5')
+        ips.append('198.18.0.2')
+        assert not self.definitions.is_known_threat('203.0.113.5')['is_threat']
+        assert self.definitions.is_known_threat('198.18.0.2')['is_threat']
+        
+        self.definitions.known_threats['malicious_ips'] = ['198.18.0.3']
+        assert not self.definitions.is_known_threat('198.18.0.2')['is_threat']
+        assert self.definitions.is_known_threat('198.18.0.3')['is_threat']
+
+class TestPatternWriteBuffer:
+    """Test suite for the write-behind pattern buffer"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        self.conn = sqlite3.connect(':memory:')
+        self.buffer = PatternWriteBuffer(self.conn, max_pending=1000, flush_interval=3600)
+    
+    def create_tables(self):
+        self.conn.execute('''CREATE TABLE threat_patterns (
+            pattern_hash TEXT UNIQUE, threat_type TEXT, features TEXT, confidence REAL,
+            occurrences INTEGER, first_seen TIMESTAMP, last_seen TIMESTAMP, accuracy REAL)''')
+        self.conn.execute('''CREATE TABLE performance_metrics (
+            timestamp TIMESTAMP, metric_name TEXT, metric_value REAL, target_value REAL,
+            model_type TEXT, session_id TEXT)''')
+    
+    def test_flush_aggregates_occurrences(self):
+        """Test that repeated patterns become one row with summed occurrences"""
+        self.create_tables()
+        for _ in range(3):
+            self.buffer.record_pattern('abc', 'phishing', [0.1], 0.9)
+        self.buffer.record_metric('accuracy', 96.0, 95.0)
+        
+        assert self.buffer.flush() == 1
+        assert self.conn.execute("SELECT occurrences FROM threat_patterns").fetchall() == [(3,)]
+        assert self.conn.execute("SELECT COUNT(*) FROM performance_metrics").fetchone()[0] == 1
+        assert self.buffer.pending_writes == 0
+    
+    def test_failed_flush_keeps_pending_rows(self):
+        """Test that a failed transaction requeues rows for the next flush"""
+        self.buffer.record_pattern('abc', 'phishing', [0.1], 0.9)
+        self.buffer.record_metric('accuracy', 96.0, 95.0)
+        
+        # No tables yet, so the transaction fails
+        assert self.buffer.flush() == 0
+        assert self.buffer.stats['failed_flushes'] == 1
+        assert self.buffer.pending_writes == 2
+        
+        self.buffer.record_pattern('abc', 'phishing', [0.1], 0.9)
+        self.create_tables()
+        assert self.buffer.flush() == 1
+        assert self.conn.execute("SELECT occurrences FROM threat_patterns").fetchall() == [(2,)]
+        assert self.conn.execute("SELECT COUNT(*) FROM performance_metrics").fetchone()[0] == 1
+    
+    def test_open_buffers_are_not_kept_alive(self):
+        """Test that the exit hook holds buffers weakly"""
+        assert self.buffer in _open_pattern_buffers
+        self.buffer.close()
+        assert self.buffer not in _open_pattern_buffers
+        
+        buffer = PatternWriteBuffer(self.conn)
+        count = len(_open_pattern_buffers)
+        del buffer
+        gc.collect()
+        assert len(_open_pattern_buffers) == count - 1
+
+class TestBatchThreatDetection:
+    """Test suite comparing batched detection with the single-vector path"""
+    
+    @pytest.fixture(autouse=True)
+    def setup_managers(self, tmp_path, monkeypatch):
+        """Setup test environment with two managers on separate pattern databases"""
+        # Lower per-type thresholds so the "Insufficient confidence" branch is reachable
+        monkeypatch.setattr(AdvancedThreatDetectionEngine, '_get_min_confidence_threshold',
+                            lambda self, threat_type: 0.5)
+        (tmp_path / 'single').mkdir()
+        (tmp_path / 'batch').mkdir()
+        monkeypatch.chdir(tmp_path / 'single')
+        self.single = AdvancedAIAgentManager()
+        monkeypatch.chdir(tmp_path / 'batch')
+        self.batch = AdvancedAIAgentManager()
+        yield
+        self.single.shutdown()
+        self.batch.shutdown()
+    
+    def make_batch(self, count):
+        rng = random.Random(42)
+        feature_types = ['network', 'behavioral', 'content', 'temporal', 'blockchain']
+        return [
+            {
+                'id': f'vector-{index}',
+                'features': [rng.random() for _ in range(rng.randint(0, 8))],
+                'metadata': {name: {} for name in rng.sample(feature_types, rng.randint(0, 3))}
+            }
+            for index in range(count)
+        ]
+    
+    def stored_patterns(self, manager):
+        engine = manager.detection_engine
+        engine.flush_pattern_buffer()
+        return engine.pattern_db.execute(
+            "SELECT pattern_hash, threat_type, confidence, occurrences FROM threat_patterns ORDER BY pattern_hash"
+        ).fetchall()
+    
+    @pytest.mark.asyncio
+    async def test_batch_matches_single_path(self):
+        """Test that both paths give the same results and store the same patterns"""
+        batch = self.make_batch(300)
+        single_results = [await self.single.process_threat_data(data) for data in batch]
+        batch_results = await self.batch.process_threat_batch(batch)
+        
+        def summary(result):
+            return (result.threat_detected, result.threat_type, result.confidence,
+                    result.severity, result.explanation, result.features_used)
+        
+        assert [summary(r) for r in batch_results] == [summary(r) for r in single_results]
+        explanations = {r.explanation for r in single_results}
+        assert "Insufficient confidence for threat classification" in explanations
+        assert "No significant threats detected in analysis" in explanations
+        assert any(r.threat_detected for r in single_results)
+        
+        patterns = self.stored_patterns(self.single)
+        assert patterns == self.stored_patterns(self.batch)
+        low_confidence = sum(r.explanation.startswith("Insufficient") for r in single_results)
+        assert sum(row[3] for row in patterns) == len(batch) - low_confidence
+
+class TestSensitiveDataScan:
+    """Test suite for the in-process and process-pool sensitive data scans"""
+    
+    @pytest.fixture(autouse=True)
+    def setup_agent(self, tmp_path, monkeypatch):
+        """Setup test environment with a workspace of files to scan"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'databases').mkdir()
+        monkeypatch.setattr(internal_security_agent.InternalSecurityAgent, 'start_monitoring', lambda self: None)
+        # Files under a path containing "test" are skipped, so keep the workspace out of tmp_path
+        workspace = tempfile.TemporaryDirectory(prefix='workspace-')
+        self.workspace = workspace.name
+        self.write_workspace(80)
+        self.agent = internal_security_agent.InternalSecurityAgent(self.workspace)
+        yield
+        workspace.cleanup()
+    
+    def write_workspace(self, count):
+        lines = [
+            'password = "hunter2"',
+            '# api_key = "commented-out"',
+            'API-KEY: "live-key" token = "abc"',
+            'secret_key = "example value"',
+            'private_key = "k1" private_key = "k2"',
+            'nothing to see here'
+        ]
+        for index in range(count):
+            body = '\n'.join(lines[(index + offset) % len(lines)] for offset in range(index % 5 + 1))
+            with open(os.path.join(self.workspace, f'config_{index}.py'), 'w') as f:
+                f.write(body + '\n')
+    
+    def scan(self, monkeypatch, pool_threshold, mmap_threshold):
+        monkeypatch.setattr(internal_security_agent, 'SENSITIVE_SCAN_POOL_THRESHOLD', pool_threshold)
+        monkeypatch.setattr(internal_security_agent, 'MMAP_THRESHOLD', mmap_threshold)
+        findings = self.agent.scan_sensitive_data()
+        return sorted(findings, key=lambda finding: (finding['file'], finding['details']['position']))
+    
+    def test_pool_matches_serial_scan(self, monkeypatch):
+        """Test that the process pool reports exactly what the serial (mmap) path reports"""
+        serial = self.scan(monkeypatch, pool_threshold=10 ** 6, mmap_threshold=1)
+        pooled = self.scan(monkeypatch, pool_threshold=64, mmap_threshold=16 * 1024 * 1024)
+        
+        # The agent also writes security_baselines.json into the workspace
+        assert self.agent.scan_stats['sensitive_data']['files_scanned'] == 81
+        assert pooled == serial
+        assert {finding['details']['pattern_type'] for finding in serial} == {
+            'Password', 'API Key', 'Private Key', 'Token'
+        }
+        assert all(finding['type'] == 'sensitive_data_exposure' for finding in serial)
+
 class TestDataIngestionAgent:
     """Test suite for DataIngestionAgent"""
     
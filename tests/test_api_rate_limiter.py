@@ -0,0 +1,93 @@
+"""
+test_api_rate_limiter.py: Tests for the API sliding-window rate limit stores
+"""
+from unittest.mock import AsyncMock, Mock
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from api_rate_limiter import FCNTL_AVAILABLE, SLOT_PROBES, RedisWindowStore, SharedMemoryWindowStore
+
+PERIOD = 60
+
+
+@pytest.mark.skipif(not FCNTL_AVAILABLE, reason="POSIX file locks not available")
+class TestSharedMemoryWindowStore:
+    """Test suite for the memory-mapped table shared between workers"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        self.stores = []
+    
+    def teardown_method(self):
+        for store in self.stores:
+            store.close()
+    
+    def open_store(self, path, slots=64):
+        store = SharedMemoryWindowStore(PERIOD, path=str(path), slots=slots)
+        self.stores.append(store)
+        return store
+    
+    def test_stores_on_one_file_share_counts(self, tmp_path):
+        """Test that two workers mapping the same table draw on one limit"""
+        path = tmp_path / "rate_limit.tbl"
+        first = self.open_store(path)
+        second = self.open_store(path)
+        
+        assert first.hit("10.0.0.1", 3, now=0)
+        assert first.hit("10.0.0.1", 3, now=1)
+        assert second.hit("10.0.0.1", 3, now=2)
+        assert not second.hit("10.0.0.1", 3, now=3)
+        assert not first.hit("10.0.0.1", 3, now=4)
+        assert second.hit("10.0.0.2", 3, now=4)
+    
+    def test_slots_reclaimed_after_two_windows(self, tmp_path):
+        """Test that a full bucket shares its least used slot until its keys go idle"""
+        store = self.open_store(tmp_path / "rate_limit.tbl", slots=SLOT_PROBES)
+        for n in range(SLOT_PROBES):
+            assert store.hit(f"10.0.0.{n}", 1, now=0)
+        
+        # Every slot is live, so a new key inherits a count and is refused at limit 1
+        assert not store.hit("10.0.1.1", 1, now=1)
+        # One window later the old counts still weigh on the sliding window
+        assert not store.hit("10.0.1.2", 1, now=PERIOD)
+        # Two windows later the slots are free again
+        assert store.hit("10.0.1.3", 1, now=2 * PERIOD)
+        assert not store.hit("10.0.1.3", 1, now=2 * PERIOD + 1)
+        assert store.hit("10.0.1.4", 1, now=2 * PERIOD + 1)
+
+
+class TestRedisWindowStore:
+    """Test suite for the Redis-backed store and its local fallback"""
+    
+    def make_store(self, script):
+        client = Mock()
+        client.register_script.return_value = script
+        return RedisWindowStore(client, PERIOD)
+    
+    @pytest.mark.asyncio
+    async def test_script_decides(self):
+        """Test that the Lua script result is used while Redis answers"""
+        script = AsyncMock(side_effect=[1, 0])
+        store = self.make_store(script)
+        
+        assert await store.acquire("10.0.0.1", 5, now=PERIOD * 10 + 15)
+        assert not await store.acquire("10.0.0.1", 5, now=PERIOD * 10 + 15)
+        keys = script.call_args.kwargs["keys"]
+        assert keys == ["guardian:ratelimit:10.0.0.1:10", "guardian:ratelimit:10.0.0.1:9"]
+        assert script.call_args.kwargs["args"] == [0.75, 5, PERIOD * 2 + 1]
+        assert len(store.fallback) == 0
+    
+    @pytest.mark.asyncio
+    async def test_unreachable_redis_falls_back_to_local_counts(self):
+        """Test that a Redis error limits with this worker's own counters"""
+        store = self.make_store(AsyncMock(side_effect=ConnectionError("redis down")))
+        
+        assert await store.acquire("10.0.0.1", 2, now=0)
+        assert await store.acquire("10.0.0.1", 2, now=1)
+        assert not await store.acquire("10.0.0.1", 2, now=2)
+        assert await store.acquire("10.0.0.2", 2, now=2)
+        assert len(store.fallback) == 2
@@ -0,0 +1,734 @@
+"""
+test_guardianshield_chain.py: Tests for the GuardianShield chain core and the real node
+"""
+import asyncio
+import bisect
+import copy
+import hashlib
+import random
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from guardianshield_chain_core import (
+    MINING_WORKERS, VALIDATOR_WEIGHT_SCALE, Block, FenwickTree, MerkleAccumulator, Mempool, MiningEngine,
+    ProofOfGuardianStake, Transaction, verify_merkle_proof
+)
+from real_guardianshield_blockchain import BlockGossip, RealBlockchainNode
+import guardianshield_chain_wire as wire
+
+
+def reference_merkle_root(leaves):
+    """Level-by-level Merkle root, pairing an odd last node with itself"""
+    if not leaves:
+        return hashlib.sha256(b"").digest()
+    level = list(leaves)
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0]
+
+
+def make_transaction(n, amount=1.0):
+    return Transaction(f"0xsender{n}", f"0xreceiver{n}", amount, 0.01, 1700000000.0 + n, "sig")
+
+
+def make_block(transactions):
+    block = Block(1, time.time(), transactions, "0" * 64, 0, "0xvalidator", {}, "", {})
+    block.merkle_root = block.calculate_merkle_root()
+    return block
+
+
+def make_pending(sender, nonce, fee):
+    return Transaction(sender, "0xreceiver", 1.0, fee, 1700000000.0 + nonce, "sig", nonce=nonce)
+
+
+def reference_selection(transactions, limit):
+    """Greedy pick of the best fee-rate sender head, by rescanning every pending transaction"""
+    pending = list(transactions)
+    selected = []
+    while pending and len(selected) < limit:
+        heads = {}
+        for position, tx in enumerate(pending):
+            head = heads.get(tx.from_address)
+            if head is None or tx.nonce < pending[head].nonce:
+                heads[tx.from_address] = position
+        best = min(heads.values(),
+                   key=lambda position: (-pending[position].fee / pending[position].size(), position))
+        selected.append(pending.pop(best))
+    return selected
+
+
+class TestMempool:
+    """Test suite for the fee-prioritised mempool"""
+    
+    def test_select_orders_by_fee_within_nonce_order(self):
+        """Test that a sender's low-fee head holds back its later high-fee transactions"""
+        pool = Mempool()
+        low_head = make_pending("0xalice", 0, 0.01)
+        high_follower = make_pending("0xalice", 1, 0.50)
+        middle = make_pending("0xbob", 0, 0.10)
+        for tx in (high_follower, middle, low_head):
+            assert pool.add(tx)
+        
+        assert pool.select(3) == [middle, low_head, high_follower]
+        assert pool.select(1) == [middle]
+        assert len(pool) == 3  # Selection does not consume
+    
+    def test_select_matches_reference(self):
+        """Test selection against a brute-force greedy scan, before and after removals"""
+        rng = random.Random(7)
+        pool = Mempool()
+        arrivals = []
+        for sender in range(12):
+            nonces = list(range(rng.randint(1, 6)))
+            rng.shuffle(nonces)
+            for nonce in nonces:
+                tx = make_pending(f"0xsender{sender:02d}", nonce, round(rng.uniform(0.001, 1.0), 4))
+                assert pool.add(tx)
+                arrivals.append(tx)
+        
+        for limit in (1, 5, 20, len(arrivals)):
+            assert pool.select(limit) == reference_selection(arrivals, limit)
+        
+        included = pool.select(10)
+        assert pool.remove_transactions(included) == 10
+        remaining = [tx for tx in arrivals if tx not in included]
+        assert pool.select(len(remaining)) == reference_selection(remaining, len(remaining))
+        assert pool.get_status()["included"] == 10
+    
+    def test_unnonced_transactions_follow_in_arrival_order(self):
+        """Test that un-nonced transactions queue by arrival behind the sender's nonces"""
+        pool = Mempool()
+        late_clock = Transaction("0xalice", "0xreceiver", 1.0, 0.10, 1700000900.0, "sig")
+        early_clock = Transaction("0xalice", "0xreceiver", 2.0, 0.10, 1700000100.0, "sig")
+        nonced = make_pending("0xalice", 5, 0.01)
+        for tx in (late_clock, early_clock, nonced):
+            assert pool.add(tx)
+        
+        assert pool.select(3) == [nonced, late_clock, early_clock]
+        pool.remove(nonced.hash())
+        assert pool.select(1) == [late_clock]
+    
+    def test_duplicates_rejected(self):
+        """Test that a transaction already pending is refused"""
+        pool = Mempool()
+        tx = make_pending("0xalice", 0, 0.1)
+        assert pool.add(tx)
+        assert not pool.add(copy.deepcopy(tx))
+        assert tx.hash() in pool
+        assert pool.get_status()["rejected"] == 1
+    
+    def test_full_pool_evicts_lowest_fee_rate(self):
+        """Test that a full pool evicts the cheapest transaction and the sender's later ones"""
+        pool = Mempool(max_size=3)
+        cheap_head = make_pending("0xalice", 0, 0.01)
+        cheap_follower = make_pending("0xalice", 1, 0.90)
+        other = make_pending("0xbob", 0, 0.20)
+        for tx in (cheap_head, cheap_follower, other):
+            assert pool.add(tx)
+        
+        assert not pool.add(make_pending("0xcarol", 0, 0.005))
+        
+        newcomer = make_pending("0xcarol", 0, 0.30)
+        assert pool.add(newcomer)
+        assert cheap_head.hash() not in pool
+        assert cheap_follower.hash() not in pool
+        assert pool.select(3) == [newcomer, other]
+        assert pool.get_status()["evicted"] == 2
+
+
+def first_winning_nonce(prefix, suffix, difficulty, start=0):
+    """Plain hash-per-nonce scan, without the midstate"""
+    nonce = start
+    while True:
+        digest = hashlib.sha256(prefix + str(nonce).encode() + suffix).hexdigest()
+        if digest.startswith("0" * difficulty):
+            return nonce, digest
+        nonce += 1
+
+
+class TestMiningEngine:
+    """Test suite for the proof-of-work nonce search"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        self.block = make_block([make_transaction(n) for n in range(3)])
+        self.prefix, self.suffix = self.block.header_template()
+    
+    def test_serial_finds_first_winning_nonce(self):
+        """Test that the midstate search agrees with a plain scan and with Block.hash"""
+        engine = MiningEngine(workers=1, chunk_size=500)
+        for difficulty in (1, 2, 3):
+            nonce, block_hash = engine.mine(self.prefix, self.suffix, difficulty, start_nonce=7)
+            assert (nonce, block_hash) == first_winning_nonce(self.prefix, self.suffix, difficulty, start=7)
+            self.block.nonce = nonce
+            assert self.block.hash() == block_hash
+        assert engine.get_status()["blocks_found"] == 3
+    
+    def test_exhausted_range_returns_none(self):
+        """Test that a search bounded by max_nonce gives up and counts its attempts"""
+        engine = MiningEngine(workers=1, chunk_size=100)
+        assert engine.mine(self.prefix, self.suffix, 64, start_nonce=0, max_nonce=250) is None
+        assert engine.stats["hashes"] == 250
+        assert engine.stats["blocks_found"] == 0
+    
+    def test_cancel_stops_search(self):
+        """Test that cancel() ends an unbounded search from another thread"""
+        engine = MiningEngine(workers=1)
+        timer = threading.Timer(0.1, engine.cancel)
+        timer.start()
+        assert engine.mine(self.prefix, self.suffix, 64) is None
+        timer.join()
+        assert engine.stats["cancelled"] == 1
+    
+    def test_cancel_before_search_starts(self):
+        """Test that a cancel() between begin() and mine() is not lost"""
+        engine = MiningEngine(workers=1)
+        generation = engine.begin()
+        engine.cancel()
+        assert engine.mine(self.prefix, self.suffix, 1, generation=generation) is None
+        assert engine.stats["hashes"] == 0
+        assert engine.stats["cancelled"] == 1
+        
+        stale = engine.begin()
+        fresh = engine.begin()
+        assert engine.mine(self.prefix, self.suffix, 1, generation=stale) is None
+        assert engine.mine(self.prefix, self.suffix, 1, generation=fresh) is not None
+
+    def test_parallel_finds_valid_nonce(self):
+        """Test that the worker pool returns a nonce meeting the difficulty"""
+        engine = MiningEngine(workers=2, chunk_size=1000)
+        try:
+            nonce, block_hash = engine.mine(self.prefix, self.suffix, 3)
+            self.block.nonce = nonce
+            assert self.block.hash() == block_hash
+            assert block_hash.startswith("000")
+            assert engine.mine(self.prefix, self.suffix, 64, max_nonce=3000) is None
+            assert engine.stats["hashes"] >= 3000
+        finally:
+            engine.shutdown()
+
+
+def bisect_select(weights, point):
+    """Slot whose cumulative weight range contains point, by bisecting running totals"""
+    cumulative = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return bisect.bisect_right(cumulative, point)
+
+
+class TestFenwickTree:
+    """Test suite for the binary indexed tree of selection weights"""
+    
+    def test_prefix_sums_and_find_match_reference(self):
+        """Test sums and weighted search against running totals, across appends and updates"""
+        rng = random.Random(3)
+        tree = FenwickTree()
+        weights = []
+        for _ in range(37):
+            weight = rng.choice([0, 1, rng.randint(1, 10**12)])
+            assert tree.append(weight) == len(weights)
+            weights.append(weight)
+        for _ in range(50):
+            slot = rng.randrange(len(weights))
+            delta = rng.randint(-weights[slot], 10**6)
+            tree.add(slot, delta)
+            weights[slot] += delta
+        
+        assert len(tree) == 37
+        assert tree.total == sum(weights)
+        for count in range(len(weights) + 1):
+            assert tree.prefix_sum(count) == sum(weights[:count])
+        points = [0, tree.total - 1] + [rng.randrange(tree.total) for _ in range(200)]
+        for point in points:
+            assert tree.find(point) == bisect_select(weights, point)
+    
+    def test_zero_weight_slots_never_found(self):
+        """Test that an emptied slot is skipped by every point"""
+        tree = FenwickTree()
+        for weight in (5, 3, 2):
+            tree.append(weight)
+        tree.add(1, -3)
+        assert {tree.find(point) for point in range(tree.total)} == {0, 2}
+
+
+class TestValidatorSelection:
+    """Test suite for stake-weighted validator selection"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        self.consensus = ProofOfGuardianStake()
+        self.consensus.add_validator("0xalice", 50000, security_score=10)
+        self.consensus.add_validator("0xbob", 20000)
+        self.consensus.add_validator("0xcarol", 12500.5, security_score=3)
+    
+    def reference_select(self, previous_hash):
+        """Selection by a linear walk over the current fixed-point weights in slot order"""
+        addresses = self.consensus._slot_addresses
+        weights = [
+            max(0, round(self.consensus.calculate_validator_weight(address) * VALIDATOR_WEIGHT_SCALE))
+            for address in addresses
+        ]
+        if not sum(weights):
+            return None
+        return addresses[bisect_select(weights, int(previous_hash, 16) % sum(weights))]
+    
+    def test_selection_matches_reference(self):
+        """Test selection across hashes and after stake, score and membership changes"""
+        hashes = [hashlib.sha256(str(n).encode()).hexdigest() for n in range(200)]
+        for change in (lambda: None,
+                       lambda: self.consensus.update_stake("0xbob", 90000),
+                       lambda: self.consensus.update_security_score("0xcarol", 40000),
+                       lambda: self.consensus.remove_validator("0xalice"),
+                       lambda: self.consensus.add_validator("0xdave", 1)):
+            change()
+            for previous_hash in hashes:
+                assert self.consensus.select_validator(previous_hash) == self.reference_select(previous_hash)
+    
+    def test_removed_validator_never_selected(self):
+        """Test that removal zeroes the slot and an empty set selects nobody"""
+        self.consensus.remove_validator("0xalice")
+        selected = {self.consensus.select_validator(hashlib.sha256(str(n).encode()).hexdigest())
+                    for n in range(300)}
+        assert selected == {"0xbob", "0xcarol"}
+        
+        self.consensus.remove_validator("0xbob")
+        self.consensus.remove_validator("0xcarol")
+        assert self.consensus.select_validator("ab" * 32) is None
+
+
+class TestMerkleAccumulator:
+    """Test suite for the append-only Merkle tree"""
+    
+    def test_root_matches_reference(self):
+        """Test incremental roots against a level-by-level rebuild for every size"""
+        leaves = [hashlib.sha256(str(i).encode()).digest() for i in range(33)]
+        tree = MerkleAccumulator()
+        assert tree.root() == reference_merkle_root([])
+        for count, leaf in enumerate(leaves, 1):
+            tree.append(leaf)
+            assert tree.root() == reference_merkle_root(leaves[:count])
+    
+    def test_every_proof_verifies(self):
+        """Test that each leaf's proof verifies and a wrong leaf or index does not"""
+        for size in (1, 2, 5, 8, 13):
+            leaves = [hashlib.sha256(f"{size}-{i}".encode()).digest() for i in range(size)]
+            tree = MerkleAccumulator(leaves)
+            root = tree.root()
+            for index, leaf in enumerate(leaves):
+                siblings = tree.proof(index)
+                assert verify_merkle_proof(leaf, index, siblings, root)
+                assert not verify_merkle_proof(hashlib.sha256(b"forged").digest(), index, siblings, root)
+
+
+class TestBlockMerkle:
+    """Test suite for block Merkle roots and inclusion proofs"""
+    
+    def test_block_proof_round_trip(self):
+        """Test proofs from a block verify against its stored root"""
+        block = make_block([make_transaction(n) for n in range(7)])
+        for tx in block.transactions:
+            proof = block.merkle_proof(tx.hash())
+            assert Block.verify_merkle_proof(proof, block.merkle_root)
+        assert block.merkle_proof("00" * 32) is None
+        assert not Block.verify_merkle_proof({"tx_hash": "not-hex", "index": 0, "siblings": []}, block.merkle_root)
+    
+    def test_replaced_transaction_changes_root(self):
+        """Test that swapping a transaction at the same count invalidates the cached tree"""
+        block = make_block([make_transaction(n) for n in range(4)])
+        original_root = block.merkle_root
+        
+        block.transactions[2] = make_transaction(2, amount=1000.0)
+        assert block.calculate_merkle_root() != original_root
+        
+        block.transactions[2].amount = 1.0
+        assert block.calculate_merkle_root() == original_root
+
+
+class TestRealNodeMerkle:
+    """Test suite for Merkle checks on blocks received by the real node"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        self.node = RealBlockchainNode("test-node", 18950)
+        self.node.create_genesis_block()
+    
+    def teardown_method(self):
+        self.node.miner.shutdown()
+    
+    def mine(self, block):
+        """Give a block a valid proof of work for its current contents"""
+        prefix, suffix = self.node.block_header_template(block)
+        block["nonce"], block["hash"] = self.node.miner.mine(prefix, suffix, 4, start_nonce=1)
+        return block
+    
+    def peer_block(self, transactions, merkle_root=None):
+        tip = self.node.blockchain[-1]
+        block = {
+            "index": tip["index"] + 1,
+            "timestamp": time.time(),
+            "transactions": transactions,
+            "previous_hash": tip["hash"],
+            "nonce": 0,
+            "validator": "peer",
+            "hash": None,
+            "merkle_root": merkle_root or self.node.calculate_merkle_root(transactions)
+        }
+        return self.mine(block)
+    
+    def test_valid_block_accepted(self):
+        """Test that a correctly committed block validates"""
+        tx = {"from": "genesis", "to": "alice", "amount": 5, "hash": hashlib.sha256(b"tx").hexdigest()}
+        assert self.node.validate_block(self.peer_block([tx]))
+    
+    def test_non_hex_transaction_hash_is_invalid(self):
+        """Test that a malformed transaction hash rejects the block instead of raising"""
+        tx = {"from": "genesis", "to": "alice", "amount": 5, "hash": "not-a-hex-digest"}
+        block = self.peer_block([tx], merkle_root="00" * 32)
+        assert self.node.has_valid_proof_of_work(block)
+        assert not self.node.validate_block(block)
+        assert not self.node._bodies_match([block], [self.node.block_header(block)])
+
+
+def make_node(node_id, port, genesis=None):
+    """In-memory node that does not gossip"""
+    node = RealBlockchainNode(node_id, port)
+    node.broadcast_block = lambda block, origin_port=None: None
+    node._ensure_gossip = lambda: None
+    if genesis is None:
+        node.create_genesis_block()
+    else:
+        node.blockchain.append(genesis)
+        node._index_transactions(genesis)
+    return node
+
+
+def extend_chain(node, count, recipient):
+    for n in range(count):
+        node.add_transaction("genesis", recipient, n + 1)
+        node.mine_block()
+
+
+def serve_from(peer):
+    """Stand-in for BlockGossip.fetch_all answering from another node's chain"""
+    def fetch_all(requests):
+        responses = []
+        for _, path in requests:
+            parsed = urllib.parse.urlparse(path)
+            query = {key: int(value[0]) for key, value in urllib.parse.parse_qs(parsed.query).items()}
+            if parsed.path == "/status":
+                responses.append({"blockchain_length": len(peer.blockchain)})
+            elif parsed.path == "/headers":
+                responses.append({"headers": peer.get_headers(query["start"], query["count"])})
+            else:
+                responses.append({"blocks": copy.deepcopy(peer.get_blocks(query["start"], query["count"]))})
+        return responses
+    return fetch_all
+
+
+class TestChainReorganization:
+    """Test suite for headers-first sync and reorganization onto a peer branch"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        self.local = make_node("local", 18951)
+        self.peer = make_node("peer", 18952, genesis=self.local.blockchain[0])
+        extend_chain(self.local, 1, "alice")
+        extend_chain(self.peer, 3, "bob")
+    
+    def teardown_method(self):
+        self.local.miner.shutdown()
+        self.peer.miner.shutdown()
+    
+    def chain_hashes(self, node):
+        return [block["hash"] for block in node.blockchain]
+    
+    def test_reorganize_onto_longer_branch(self):
+        """Test switching branches returns orphaned transactions to the mempool"""
+        orphaned_tx = self.local.blockchain[1]["transactions"][0]
+        
+        assert self.local.reorganize(0, copy.deepcopy(self.peer.blockchain[1:]))
+        
+        assert self.chain_hashes(self.local) == self.chain_hashes(self.peer)
+        assert self.local.get_balance("bob") == 6
+        assert self.local.get_balance("alice") == 0
+        assert [tx["hash"] for tx in self.local.mempool] == [orphaned_tx["hash"]]
+    
+    def test_reorganize_drops_unaffordable_orphans(self):
+        """Test that an orphaned transfer the new chain's balances cannot cover is not requeued"""
+        assert self.local.add_transaction("alice", "dave", 1)
+        assert self.local.mine_block()
+        funding_tx = self.local.blockchain[1]["transactions"][0]
+        
+        assert self.local.reorganize(0, copy.deepcopy(self.peer.blockchain[1:]))
+        assert self.local.get_balance("alice") == 0
+        assert [tx["hash"] for tx in self.local.mempool] == [funding_tx["hash"]]
+    
+    def test_invalid_branch_keeps_our_chain(self):
+        """Test that a mislinked block with valid proof of work is rejected before rollback"""
+        before = self.chain_hashes(self.local)
+        blocks = copy.deepcopy(self.peer.blockchain[1:])
+        blocks[1]["previous_hash"] = "0" * 64
+        prefix, suffix = self.peer.block_header_template(blocks[1])
+        blocks[1]["nonce"], blocks[1]["hash"] = self.peer.miner.mine(prefix, suffix, 4, start_nonce=1)
+        assert self.local.has_valid_proof_of_work(blocks[1])
+        
+        assert not self.local.reorganize(0, blocks)
+        assert self.chain_hashes(self.local) == before
+        assert self.local.get_balance("alice") == 1
+        assert self.local.mempool == []
+    
+    def test_failed_append_restores_our_chain(self):
+        """Test that a failure after rollback puts our own blocks and balances back"""
+        before = self.chain_hashes(self.local)
+        validate_block = self.local.validate_block
+        self.local.validate_block = lambda block: block["index"] != 2 and validate_block(block)
+        
+        assert not self.local.reorganize(0, copy.deepcopy(self.peer.blockchain[1:]))
+        assert self.chain_hashes(self.local) == before
+        assert self.local.get_balance("alice") == 1
+        assert self.local.get_balance("bob") == 0
+        assert self.local.mempool == []
+    
+    def test_headers_first_sync(self):
+        """Test syncing from a peer on a competing branch through headers then bodies"""
+        self.local.gossip.fetch_all = serve_from(self.peer)
+        
+        assert self.local.sync_with_peer(self.peer.port)
+        assert self.chain_hashes(self.local) == self.chain_hashes(self.peer)
+    
+    def test_sync_while_peer_keeps_mining(self):
+        """Test that blocks the peer mines after reporting its length do not abort the sync"""
+        fetch_all = serve_from(self.peer)
+        
+        def fetch_then_mine(requests):
+            responses = fetch_all(requests)
+            if requests[0][1] == "/status":
+                extend_chain(self.peer, 1, "carol")
+            return responses
+        
+        self.local.gossip.fetch_all = fetch_then_mine
+        assert self.local.sync_with_peer(self.peer.port)
+        assert self.chain_hashes(self.local) == self.chain_hashes(self.peer)[:4]
+    
+    def test_bodies_must_link_like_their_headers(self):
+        """Test that a body whose linkage differs from its header is refused"""
+        headers = self.peer.get_headers(1, 3)
+        bodies = copy.deepcopy(self.peer.get_blocks(1, 3))
+        assert self.local._bodies_match(bodies, headers)
+        
+        headers[1]["previous_hash"] = "f" * 64
+        assert not self.local._bodies_match(bodies, headers)
+
+
+class TestNodeMining:
+    """Test suite for mining on a RealBlockchainNode"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        self.node = make_node("miner", 18953)
+    
+    def teardown_method(self):
+        self.node.miner.shutdown()
+    
+    def test_transaction_added_during_mining_stays_queued(self):
+        """Test that a transaction accepted mid-search is kept for the next block"""
+        assert self.node.add_transaction("genesis", "alice", 1)
+        mine = self.node.miner.mine
+        
+        def slow_mine(*args, **kwargs):
+            submitter = threading.Thread(target=self.node.add_transaction, args=("genesis", "bob", 2))
+            submitter.start()
+            submitter.join()
+            return mine(*args, **kwargs)
+        
+        self.node.miner.mine = slow_mine
+        block = self.node.mine_block()
+        
+        assert [tx["to"] for tx in block["transactions"]] == ["alice"]
+        assert [tx["to"] for tx in self.node.mempool] == ["bob"]
+        
+        self.node.miner.mine = mine
+        assert [tx["to"] for tx in self.node.mine_block()["transactions"]] == ["bob"]
+        assert self.node.mempool == []
+    
+    def test_worker_pool_size_per_node(self):
+        """Test that nodes default to a small worker pool and accept an explicit size"""
+        assert self.node.miner.workers == MINING_WORKERS
+        node = RealBlockchainNode("single", 18954, mining_workers=1)
+        try:
+            assert node.miner.workers == 1
+        finally:
+            node.miner.shutdown()
+
+
+def free_node_port():
+    """Node port whose API port (node port + 1000) is free on localhost"""
+    with socket.socket() as probe:
+        probe.bind(("localhost", 0))
+        return probe.getsockname()[1] - 1000
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def gossip_block(n):
+    return {"index": n, "hash": hashlib.sha256(f"gossip-{n}".encode()).hexdigest()}
+
+
+class TestBlockGossip:
+    """Test suite for per-peer gossip queues and block relay"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        # Peers are added to an idle loop so their queues are never drained
+        self.gossip = BlockGossip(18960, queue_size=2)
+        self.gossip._loop = asyncio.new_event_loop()
+        for peer_port in (18961, 18962):
+            self.gossip._add_peer(peer_port)
+    
+    def teardown_method(self):
+        for task in self.gossip._tasks:
+            task.cancel()
+        self.gossip._loop.run_until_complete(asyncio.gather(*self.gossip._tasks, return_exceptions=True))
+        self.gossip._loop.close()
+    
+    def queued_indexes(self, peer_port):
+        return [block["index"] for block, _ in list(self.gossip.queues[peer_port]._queue)]
+    
+    def test_block_queued_once_per_peer(self):
+        """Test that a republished block is deduplicated and peers share one serialization slot"""
+        block = gossip_block(1)
+        self.gossip._enqueue(block, None)
+        self.gossip._enqueue(block, None)
+        
+        assert self.queued_indexes(18961) == [1]
+        assert self.queued_indexes(18962) == [1]
+        assert self.gossip.queues[18961]._queue[0] is self.gossip.queues[18962]._queue[0]
+        assert self.gossip.stats["deduplicated"] == 1
+    
+    def test_block_not_sent_back_to_origin(self):
+        """Test that the peer a block came from is skipped"""
+        self.gossip._enqueue(gossip_block(1), 18961)
+        assert self.queued_indexes(18961) == []
+        assert self.queued_indexes(18962) == [1]
+        
+        self.gossip._mark_known(18962, gossip_block(2)["hash"])
+        self.gossip._enqueue(gossip_block(2), None)
+        assert self.queued_indexes(18961) == [2]
+        assert self.queued_indexes(18962) == [1]
+    
+    def test_full_queue_drops_oldest(self):
+        """Test that a slow peer keeps only the newest blocks"""
+        for n in range(1, 5):
+            self.gossip._enqueue(gossip_block(n), None)
+        assert self.queued_indexes(18961) == [3, 4]
+        assert self.gossip.stats["dropped"] == 4
+        assert self.gossip.get_status()["queued"] == 4
+
+
+class TestGossipRelay:
+    """Test suite for gossip between nodes over HTTP"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        self.local = RealBlockchainNode("local", free_node_port())
+        self.local.create_genesis_block()
+        self.peer = make_node("peer", free_node_port(), genesis=self.local.blockchain[0])
+        assert self.peer.start_http_server()
+        self.local.connect_to_peer(self.peer.port)
+    
+    def teardown_method(self):
+        self.peer.http_server.shutdown()
+        self.peer.http_server.server_close()
+        self.local.gossip.stop()
+        self.local.miner.shutdown()
+        self.peer.miner.shutdown()
+    
+    def test_mined_block_reaches_peer(self):
+        """Test that a mined block is delivered to the peer and a repeat is deduplicated"""
+        extend_chain(self.local, 1, "alice")
+        block = self.local.blockchain[1]
+        assert wait_for(lambda: len(self.peer.blockchain) == 2)
+        assert self.peer.blockchain[1]["hash"] == block["hash"]
+        assert wait_for(lambda: self.local.gossip.stats["sent"] == 1)
+        
+        self.local.broadcast_block(block)
+        assert wait_for(lambda: self.local.gossip.stats["deduplicated"] == 1)
+        assert self.local.gossip.stats["failed"] == 0
+    
+    def test_fetch_all_reports_failures_as_none(self):
+        """Test that concurrent fetches return None for an unreachable peer"""
+        self.local._ensure_gossip()
+        status, missing = self.local.gossip.fetch_all([
+            (self.peer.port, "/headers?start=0&count=1"),
+            (free_node_port(), "/status")
+        ])
+        assert status["headers"] == self.peer.get_headers(0, 1)
+        assert missing is None
+    
+    def test_bad_range_queries_rejected(self):
+        """Test that malformed or out-of-range /headers and /blocks queries get a 400"""
+        for query in ("start=abc", "count=x", "start=-1&count=1", "start=0&count=0", "start=0&count=-2"):
+            for path in ("/headers", "/blocks"):
+                with pytest.raises(urllib.error.HTTPError) as excinfo:
+                    urllib.request.urlopen(f"http://localhost:{self.peer.port + 1000}{path}?{query}", timeout=5)
+                assert excinfo.value.code == 400
+    
+    def test_malformed_records_rejected(self):
+        """Test that payloads which decode but have the wrong shape get a 400"""
+        url = f"http://localhost:{self.peer.port + 1000}"
+        block = copy.deepcopy(self.peer.blockchain[0])
+        posts = [
+            ("/transactions", wire.encode_batch([{"from": "genesis", "to": "alice"}]), {}),
+            ("/transactions", wire.encode_batch([["genesis", "alice", 1]]), {}),
+            ("/receive_block", wire.encode([block]), {}),
+            ("/receive_block", wire.encode({**block, "index": "1"}), {}),
+            ("/receive_block", wire.encode({**block, "transactions": [{"hash": "ab"}]}), {}),
+            ("/receive_block", wire.encode(block), {"X-Gossip-Origin": "peer"}),
+        ]
+        for path, body, headers in posts:
+            request = urllib.request.Request(url + path, data=body, method="POST",
+                                             headers={"Content-Type": wire.WIRE_JSON, **headers})
+            with pytest.raises(urllib.error.HTTPError) as excinfo:
+                urllib.request.urlopen(request, timeout=5)
+            assert excinfo.value.code == 400, path
+        assert len(self.peer.blockchain) == 1 and self.peer.mempool == []
+    
+    def test_bad_balance_height_rejected(self):
+        """Test that a non-integer or negative /balance height gets a 400"""
+        for height in ("abc", "-1"):
+            with pytest.raises(urllib.error.HTTPError) as excinfo:
+                urllib.request.urlopen(f"http://localhost:{self.peer.port + 1000}/balance/alice?height={height}",
+                                       timeout=5)
+            assert excinfo.value.code == 400
+    
+    @pytest.mark.skipif(not wire.MSGPACK_AVAILABLE, reason="msgpack not installed")
+    def test_peers_negotiate_msgpack(self):
+        """Test that gossip switches to msgpack once the peer answers in it"""
+        extend_chain(self.local, 2, "alice")
+        assert wait_for(lambda: len(self.peer.blockchain) == 3)
+        assert self.local.gossip.wire_formats[self.peer.port] == wire.WIRE_MSGPACK
+        assert self.local.gossip.get_status()["msgpack_peers"] == 1
+        
+        blocks = self.local.gossip.fetch_all([(self.peer.port, "/blocks?start=0&count=3")])[0]["blocks"]
+        assert blocks == list(self.peer.blockchain)
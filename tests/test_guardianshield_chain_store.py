@@ -0,0 +1,158 @@
+"""
+test_guardianshield_chain_store.py: Tests for the GuardianShield segment-file block store and account state
+"""
+import hashlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from guardianshield_chain_store import AccountStateStore, BlockStore
+
+
+def make_stored_block(height, tx_count=2):
+    transactions = [
+        {"hash": hashlib.sha256(f"{height}-{n}".encode()).hexdigest(), "amount": n}
+        for n in range(tx_count)
+    ]
+    return {
+        "index": height,
+        "hash": hashlib.sha256(f"block-{height}".encode()).hexdigest(),
+        "transactions": transactions,
+        "padding": "x" * 200
+    }
+
+
+class TestBlockStore:
+    """Test suite for the append-only block log"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        self.blocks = [make_stored_block(height) for height in range(20)]
+    
+    def open_store(self, directory):
+        # Small segments and cache so reads go through several memory-mapped files
+        return BlockStore(str(directory), segment_bytes=1024, cache_size=2)
+    
+    def test_round_trip_across_segments_and_reopen(self, tmp_path):
+        """Test that blocks read back by height, hash and slice, also after reopening"""
+        store = self.open_store(tmp_path)
+        for height, block in enumerate(self.blocks):
+            assert store.append(block) == height
+        assert len([name for name in os.listdir(tmp_path) if name.endswith(".seg")]) > 1
+        store.close()
+        
+        store = self.open_store(tmp_path)
+        try:
+            assert len(store) == 20
+            assert list(store) == self.blocks
+            assert store[-1] == self.blocks[-1]
+            assert store[3:6] == self.blocks[3:6]
+            assert store.get_by_hash(self.blocks[7]["hash"]) == self.blocks[7]
+            assert store.height_of(self.blocks[7]["hash"]) == 7
+            assert store.locate_transaction(self.blocks[9]["transactions"][1]["hash"]) == (9, 1)
+            assert store.total_transactions() == 40
+            with pytest.raises(IndexError):
+                store[20]
+        finally:
+            store.close()
+    
+    def test_truncate_then_append(self, tmp_path):
+        """Test that truncation drops later blocks, segments and index rows"""
+        store = self.open_store(tmp_path)
+        for block in self.blocks:
+            store.append(block)
+        
+        store.truncate(5)
+        assert len(store) == 5
+        assert store.get_by_hash(self.blocks[12]["hash"]) is None
+        assert store.locate_transaction(self.blocks[5]["transactions"][0]["hash"]) is None
+        assert store.total_transactions() == 10
+        
+        replacement = make_stored_block(105)
+        assert store.append(replacement) == 5
+        store.close()
+        
+        store = self.open_store(tmp_path)
+        try:
+            assert list(store) == self.blocks[:5] + [replacement]
+        finally:
+            store.close()
+    
+    def test_unindexed_tail_dropped_on_open(self, tmp_path):
+        """Test that bytes written after the last indexed record are discarded"""
+        store = self.open_store(tmp_path)
+        for block in self.blocks[:3]:
+            store.append(block)
+        segment_path = store._segment_path(store._segment)
+        store.close()
+        size = os.path.getsize(segment_path)
+        with open(segment_path, "ab") as f:
+            f.write(b"torn write")
+        
+        store = self.open_store(tmp_path)
+        try:
+            assert os.path.getsize(segment_path) == size
+            assert store.append(self.blocks[3]) == 3
+            assert store[3] == self.blocks[3]
+        finally:
+            store.close()
+
+
+class TestAccountStateStore:
+    """Test suite for snapshotted account balances"""
+    
+    def test_snapshot_and_reopen(self, tmp_path):
+        """Test that only snapshotted blocks survive a restart"""
+        path = str(tmp_path / "state.db")
+        state = AccountStateStore(path, initial_balances={"genesis": 100.0}, snapshot_interval=3)
+        for height in range(5):
+            state.apply(height, {"genesis": -1.0, "alice": 1.0})
+        assert state.snapshot_height == 2
+        assert state.get("alice") == 5.0
+        state.db.close()  # Crash: pending blocks 3 and 4 are lost
+        
+        state = AccountStateStore(path, snapshot_interval=3)
+        assert state.height == state.snapshot_height == 2
+        assert state["alice"] == 3.0
+        assert state["genesis"] == 97.0
+        assert "bob" not in state
+        state.close()
+    
+    def test_balance_at(self):
+        """Test historical balances from pending and snapshotted blocks"""
+        state = AccountStateStore(initial_balances={"genesis": 10.0}, snapshot_interval=2)
+        for height in range(4):
+            state.apply(height, {"alice": 2.0})
+        assert state.balance_at("alice", -1) == 0
+        assert state.balance_at("alice", 0) == 2.0
+        assert state.balance_at("alice", 2) == 6.0
+        assert state.balance_at("genesis", 3) == 10.0
+    
+    def test_revert_to(self):
+        """Test that reverting undoes both snapshotted and pending blocks"""
+        state = AccountStateStore(initial_balances={"genesis": 10.0}, snapshot_interval=2)
+        for height in range(5):
+            state.apply(height, {"genesis": -1.0, f"account{height}": 1.0})
+        
+        state.revert_to(1)
+        assert state.height == 1
+        assert state.get("genesis") == 8.0
+        assert state.get("account1") == 1.0
+        assert state.get("account3") == 0
+        assert state.balance_at("genesis", 4) == 8.0
+        
+        state.apply(2, {"genesis": -5.0})
+        assert state.get("genesis") == 3.0
+    
+    def test_revert_beyond_undo_depth(self):
+        """Test that a revert deeper than the undo log is refused"""
+        state = AccountStateStore(snapshot_interval=1, undo_depth=2)
+        for height in range(5):
+            state.apply(height, {"alice": 1.0})
+        with pytest.raises(ValueError):
+            state.revert_to(1)
+        state.revert_to(2)
+        assert state.get("alice") == 3.0
@@ -0,0 +1,77 @@
+"""
+test_guardianshield_chain_wire.py: Tests for the GuardianShield peer wire formats
+"""
+import hashlib
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import guardianshield_chain_wire as wire
+
+pytestmark = pytest.mark.skipif(not wire.MSGPACK_AVAILABLE, reason="msgpack not installed")
+
+
+def make_wire_block(index):
+    digest = hashlib.sha256(str(index).encode()).hexdigest()
+    return {
+        "index": index,
+        "timestamp": 1700000000.5 + index,
+        "hash": digest,
+        "previous_hash": "0" * 64,
+        "merkle_root": digest.upper(),  # Not lowercase hex, so it must stay a string
+        "transactions": [{"from": "genesis", "to": "alice", "amount": 5, "hash": digest}],
+        "validator": "node-1",
+        "nonce": 12345
+    }
+
+
+class TestWireNegotiation:
+    """Test suite for content negotiation"""
+    
+    def test_negotiate(self):
+        """Test that msgpack is used only when the Accept header names it"""
+        assert wire.negotiate(wire.accept_header()) == wire.WIRE_MSGPACK
+        assert wire.negotiate("application/x-msgpack;q=0.9") == wire.WIRE_MSGPACK
+        assert wire.negotiate("*/*") == wire.WIRE_JSON
+        assert wire.negotiate(None) == wire.WIRE_JSON
+    
+    def test_content_type_of(self):
+        assert wire.content_type_of("Application/X-Msgpack; charset=binary") == wire.WIRE_MSGPACK
+        assert wire.content_type_of(None) == wire.WIRE_JSON
+
+
+class TestWireEncoding:
+    """Test suite for JSON and msgpack payloads"""
+    
+    def test_round_trip(self):
+        """Test that both formats decode to the original block"""
+        block = make_wire_block(1)
+        for content_type in (wire.WIRE_JSON, wire.WIRE_MSGPACK):
+            assert wire.decode(wire.encode(block, content_type), content_type) == block
+    
+    def test_msgpack_packs_digests_as_bytes(self):
+        """Test that lowercase hex digests travel as 32 raw bytes"""
+        block = make_wire_block(2)
+        packed = wire.encode(block, wire.WIRE_MSGPACK)
+        assert len(packed) < len(wire.encode(block, wire.WIRE_JSON)) - 100
+        assert block["hash"].encode() not in packed
+        assert block["merkle_root"].encode() in packed
+    
+    def test_batch_round_trip(self):
+        """Test length-prefixed msgpack batches and JSON arrays"""
+        blocks = [make_wire_block(index) for index in range(5)]
+        for content_type in (wire.WIRE_JSON, wire.WIRE_MSGPACK):
+            assert wire.decode_batch(wire.encode_batch(blocks, content_type), content_type) == blocks
+        assert wire.decode_batch(b"", wire.WIRE_MSGPACK) == []
+        assert json.loads(wire.encode_batch(iter(blocks))) == blocks
+    
+    def test_truncated_batch_rejected(self):
+        """Test that a cut-off batch raises ValueError instead of returning partial records"""
+        body = wire.encode_batch([make_wire_block(index) for index in range(2)], wire.WIRE_MSGPACK)
+        for cut in (2, len(body) - 1):
+            with pytest.raises(ValueError):
+                wire.decode_batch(body[:cut], wire.WIRE_MSGPACK)
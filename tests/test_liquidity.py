@@ -0,0 +1,261 @@
+"""
+test_liquidity.py: Tests for the GuardianShield liquidity pools, StableSwap pricing and swap routing
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal, localcontext
+import random
+import statistics
+import sys
+import os
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from advanced_liquidity_pool_framework import AdvancedLiquidityPoolFramework, PoolSwapWindow, PoolType
+from liquidity_stableswap import StableSwapInvariant, compute_d, compute_y, from_fixed, to_fixed
+
+
+def make_framework(tmp_path, monkeypatch, tokens=("USDC", "USDT", "ETH", "GUARD")):
+    """Framework writing to a throwaway database, with tokens registered under their symbols"""
+    monkeypatch.chdir(tmp_path)
+    framework = AdvancedLiquidityPoolFramework()
+    for symbol in tokens:
+        framework.register_token(symbol, symbol, symbol, 18, Decimal('1000000000'), Decimal('1'))
+    return framework
+
+
+class TestStableSwapInvariant:
+    """Test suite for the integer StableSwap solver"""
+    
+    def test_balanced_pool_invariant_is_sum(self):
+        """Test that D equals the sum of balances when they are all equal"""
+        for n in (2, 3, 4):
+            balances = [to_fixed(Decimal('1000000'))] * n
+            assert abs(compute_d(balances, 100) - sum(balances)) <= 1
+    
+    def test_swap_preserves_invariant(self):
+        """Test that the y solve keeps D unchanged to rounding across A, imbalance and size"""
+        for amplification in (1, 10, 100, 1000):
+            for reserves in ((Decimal('1000000'), Decimal('1000000')),
+                             (Decimal('5000000'), Decimal('1000000')),
+                             (Decimal('1000'), Decimal('250000'), Decimal('40000'))):
+                balances = [to_fixed(reserve) for reserve in reserves]
+                d = compute_d(balances, amplification)
+                for share in (Decimal('0.0001'), Decimal('0.1'), Decimal('0.5')):
+                    new_in = balances[0] + to_fixed(reserves[0] * share)
+                    y = compute_y(0, 1, new_in, balances, amplification, d)
+                    after = [new_in, y] + balances[2:]
+                    # Integer rounding only; well under one part in 10^18
+                    assert abs(compute_d(after, amplification) - d) * 10**18 <= d
+    
+    def test_output_bounds(self):
+        """Test that a balanced pool pays less than 1:1 and approaches it as A grows"""
+        reserves = {'USDC': Decimal('1000000'), 'USDT': Decimal('1000000')}
+        amount = Decimal('10000')
+        outputs = [
+            StableSwapInvariant(['USDC', 'USDT'], amplification).output(reserves, 'USDC', 'USDT', amount)
+            for amplification in (1, 10, 100, 1000)
+        ]
+        assert all(output < amount for output in outputs)
+        assert outputs == sorted(outputs)
+        assert outputs[-1] > amount * Decimal('0.9999')
+    
+    def test_d_cached_until_reserves_change(self):
+        """Test that repeated quotes on unchanged reserves solve D once"""
+        invariant = StableSwapInvariant(['USDC', 'USDT'], 100)
+        reserves = {'USDC': Decimal('1000000'), 'USDT': Decimal('1000000')}
+        for _ in range(5):
+            invariant.output(reserves, 'USDC', 'USDT', Decimal('100'))
+        assert invariant.d_solves == 1
+        
+        reserves['USDC'] += Decimal('100')
+        invariant.output(reserves, 'USDC', 'USDT', Decimal('100'))
+        assert invariant.d_solves == 2
+    
+    def test_invalid_parameters(self):
+        """Test that unusable pools and indexes are refused"""
+        with pytest.raises(ValueError):
+            StableSwapInvariant(['USDC', 'USDT'], 0)
+        with pytest.raises(ValueError):
+            compute_d([to_fixed(Decimal('1')), 0], 100)
+        with pytest.raises(ValueError):
+            compute_y(0, 0, 1, [1, 1], 100, 2)
+    
+    def test_fixed_point_conversion_is_exact(self):
+        """Test that large reserves convert without rounding under a 28-digit context"""
+        amount = Decimal('123456789012.123456789012345678')
+        with localcontext() as context:
+            context.prec = 28
+            assert to_fixed(amount) == 123456789012123456789012345678
+            assert from_fixed(to_fixed(amount)) == amount
+        assert to_fixed(Decimal('1.0000000000000000009')) == 10**18
+        assert from_fixed(15 * 10**17) == Decimal('1.5')
+
+
+class TestSwapRouter:
+    """Test suite for multi-hop and split-route quotes"""
+    
+    @pytest.fixture(autouse=True)
+    def setup_framework(self, tmp_path, monkeypatch):
+        """Setup test environment"""
+        self.framework = make_framework(tmp_path, monkeypatch)
+        self.router = self.framework.router
+    
+    def add_pool(self, pool_id, pool_type, reserves, **kwargs):
+        self.framework.create_liquidity_pool(pool_id, pool_id, pool_type, list(reserves),
+                                             {token: Decimal(amount) for token, amount in reserves.items()},
+                                             **kwargs)
+    
+    def best_exact_split(self, token_in, token_out, amount_in, paths):
+        """Best 5% split of amount_in over two paths, each priced exactly in Decimal"""
+        best = Decimal('0')
+        for steps in range(self.router.split_steps + 1):
+            first = amount_in * steps / self.router.split_steps
+            total = Decimal('0')
+            for (tokens, pools), leg_in in zip(paths, (first, amount_in - first)):
+                if leg_in > 0:
+                    total += self.router.price_path(tokens, pools, leg_in)
+            best = max(best, total)
+        return best
+    
+    def test_split_beats_single_path(self):
+        """Test that a large swap over two parallel pools is split and matches a brute-force split"""
+        self.add_pool("eth-guard-a", PoolType.CONSTANT_PRODUCT, {"ETH": 1000, "GUARD": 2000000})
+        self.add_pool("eth-guard-b", PoolType.CONSTANT_PRODUCT, {"ETH": 500, "GUARD": 1000000})
+        amount = Decimal('30')
+        
+        single = self.framework.quote_swap("ETH", "GUARD", amount, allow_split=False)
+        split = self.framework.quote_swap("ETH", "GUARD", amount)
+        
+        assert len(single.legs) == 1 and single.legs[0].pools == ["eth-guard-a"]
+        assert len(split.legs) == 2
+        assert split.amount_out > single.amount_out
+        assert sum(leg.amount_in for leg in split.legs) == amount
+        assert split.amount_out == sum(self.router.price_path(leg.tokens, leg.pools, leg.amount_in)
+                                       for leg in split.legs)
+        
+        paths = self.router.candidate_paths("ETH", "GUARD")
+        assert split.amount_out >= self.best_exact_split("ETH", "GUARD", amount, paths) * Decimal('0.999999999')
+    
+    def test_multi_hop_route(self):
+        """Test that a pair without a direct pool is routed through an intermediate token"""
+        self.add_pool("usdc-eth", PoolType.CONSTANT_PRODUCT, {"USDC": 3000000, "ETH": 1000})
+        self.add_pool("eth-guard", PoolType.CONSTANT_PRODUCT, {"ETH": 1000, "GUARD": 2000000})
+        
+        quote = self.framework.quote_swap("USDC", "GUARD", Decimal('3000'))
+        assert quote.hops == 2
+        assert quote.legs[0].tokens == ["USDC", "ETH", "GUARD"]
+        eth = self.framework._calculate_swap_output(self.framework.pools["usdc-eth"], "USDC", "ETH", Decimal('3000'))
+        guard = self.framework._calculate_swap_output(self.framework.pools["eth-guard"], "ETH", "GUARD", eth)
+        assert quote.amount_out == guard
+        assert 0 < quote.price_impact < Decimal('0.01')
+    
+    def test_shallow_direct_pool_loses_to_deep_path(self):
+        """Test that a deep two-hop path is preferred over a shallow direct pool"""
+        self.add_pool("usdc-guard", PoolType.CONSTANT_PRODUCT, {"USDC": 1000, "GUARD": 667})
+        self.add_pool("usdc-eth", PoolType.CONSTANT_PRODUCT, {"USDC": 3000000, "ETH": 1000})
+        self.add_pool("eth-guard", PoolType.CONSTANT_PRODUCT, {"ETH": 1000, "GUARD": 2000000})
+        
+        quote = self.framework.quote_swap("USDC", "GUARD", Decimal('5000'), allow_split=False)
+        assert quote.legs[0].pools == ["usdc-eth", "eth-guard"]
+        assert quote.amount_out > self.router.price_path(("USDC", "GUARD"), ("usdc-guard",), Decimal('5000'))
+    
+    def test_stable_pool_float_search_matches_exact_price(self):
+        """Test that the vectorised StableSwap solve tracks the exact Decimal output"""
+        self.add_pool("usdc-usdt", PoolType.STABLE_SWAP, {"USDC": 1000000, "USDT": 800000}, amplification=50)
+        paths = self.router.candidate_paths("USDC", "USDT")
+        params = self.router._hop_parameters(paths)
+        amounts = [Decimal('10'), Decimal('10000'), Decimal('400000')]
+        floats = self.router._evaluate(params, np.array([[float(amount) for amount in amounts]]))[0]
+        for amount, estimate in zip(amounts, floats):
+            exact = self.router.price_path(*paths[0], amount)
+            assert abs(Decimal(estimate) - exact) <= exact * Decimal('1e-9')
+    
+    def test_execute_route_checks_before_swapping(self):
+        """Test that a failing slippage check leaves every pool untouched"""
+        self.add_pool("eth-guard-a", PoolType.CONSTANT_PRODUCT, {"ETH": 1000, "GUARD": 2000000})
+        self.add_pool("eth-guard-b", PoolType.CONSTANT_PRODUCT, {"ETH": 500, "GUARD": 1000000})
+        quote = self.framework.quote_swap("ETH", "GUARD", Decimal('20'))
+        before = {pool_id: dict(pool['reserves']) for pool_id, pool in self.framework.pools.items()}
+        
+        with pytest.raises(ValueError):
+            self.framework.execute_route(quote, "0xtrader", min_amount_out=quote.amount_out * 2)
+        assert {pool_id: pool['reserves'] for pool_id, pool in self.framework.pools.items()} == before
+        
+        swaps = self.framework.execute_route(quote, "0xtrader", min_amount_out=quote.amount_out)
+        assert sum(swap.amount_out for swap in swaps) == quote.amount_out
+    
+    def test_path_cache_invalidated_by_new_pool(self):
+        """Test that cached paths are rebuilt when a pool is created"""
+        self.add_pool("usdc-eth", PoolType.CONSTANT_PRODUCT, {"USDC": 3000000, "ETH": 1000})
+        with pytest.raises(ValueError):
+            self.framework.quote_swap("USDC", "GUARD", Decimal('100'))
+        
+        self.add_pool("eth-guard", PoolType.CONSTANT_PRODUCT, {"ETH": 1000, "GUARD": 2000000})
+        assert self.framework.quote_swap("USDC", "GUARD", Decimal('100')).hops == 2
+        with pytest.raises(ValueError):
+            self.framework.quote_swap("USDC", "USDC", Decimal('100'))
+
+
+class TestPoolSwapWindow:
+    """Test suite for rolling per-pool swap analytics"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        self.start = datetime(2026, 1, 1)
+        self.window = PoolSwapWindow(window_seconds=4 * 3600, bucket_seconds=3600)
+        self.swaps = []  # (timestamp, volume, fees, return or None)
+    
+    def record(self, timestamp, volume, price):
+        previous = self.window.last_price
+        self.window.record(timestamp, Decimal(volume), Decimal(volume) / 100, price)
+        self.swaps.append((timestamp, Decimal(volume), Decimal(volume) / 100,
+                           price / previous - 1 if previous else None))
+    
+    def live_swaps(self, now):
+        """Swaps whose hour bucket is among the last four ending at now"""
+        current = int(now.timestamp() // 3600)
+        return [swap for swap in self.swaps if int(swap[0].timestamp() // 3600) > current - 4]
+    
+    def test_totals_and_volatility_match_recompute(self):
+        """Test rolling totals and return variance against a full recompute as buckets expire"""
+        rng = random.Random(11)
+        price = 2000.0
+        for step in range(120):
+            timestamp = self.start + timedelta(minutes=7 * step)
+            price *= 1 + rng.gauss(0, 0.01)
+            self.record(timestamp, rng.randint(1, 5000), price)
+            
+            live = self.live_swaps(timestamp)
+            snapshot = self.window.snapshot(timestamp)
+            assert snapshot.count == len(live)
+            assert snapshot.volume == sum(volume for _, volume, _, _ in live)
+            assert snapshot.fees == sum(fees for _, _, fees, _ in live)
+            returns = [price_return for *_, price_return in live if price_return is not None]
+            expected = statistics.pstdev(returns) if len(returns) > 1 else 0.0
+            assert abs(self.window.volatility(timestamp) - expected) <= 1e-12
+    
+    def test_idle_window_empties(self):
+        """Test that every bucket expires after a quiet period"""
+        self.record(self.start, 100, 1.0)
+        self.record(self.start + timedelta(minutes=5), 100, 1.1)
+        later = self.start + timedelta(hours=5)
+        assert self.window.snapshot(later).count == 0
+        assert self.window.snapshot(later).volume == 0
+        assert self.window.volatility(later) == 0.0
+        assert not self.window.buckets
+    
+    def test_pool_analytics_use_window(self, tmp_path, monkeypatch):
+        """Test that pool analytics report the window's swap count and volume"""
+        framework = make_framework(tmp_path, monkeypatch)
+        framework.create_liquidity_pool("eth-guard", "ETH/GUARD", PoolType.CONSTANT_PRODUCT, ["ETH", "GUARD"],
+                                        {"ETH": Decimal('1000'), "GUARD": Decimal('2000000')})
+        for amount in ('1', '2', '3'):
+            framework.execute_swap("eth-guard", "0xtrader", "ETH", "GUARD", Decimal(amount))
+        
+        analytics = framework.get_pool_analytics("eth-guard")
+        assert analytics['total_swaps'] == 3
+        assert analytics['volume_24h'] == 6.0
+        assert analytics['volatility'] > 0
@@ -0,0 +1,139 @@
+"""
+test_price_oracle.py: Tests for the background-refreshed price oracle service
+"""
+import json
+import threading
+import time
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from price_oracle_service import (
+    CallablePriceSource, FilePriceSource, PriceOracleService, PriceSource, StaticPriceSource
+)
+
+
+def write_prices(path, prices):
+    path.write_text(json.dumps(prices))
+
+
+class TestPriceOracleService:
+    """Test suite for layered price sources and snapshot publication"""
+    
+    def setup_method(self):
+        """Setup test environment"""
+        self.fallback = StaticPriceSource("fallback", {'bitcoin': 45000.0, 'ethereum': 3200.0})
+    
+    def test_price_source_is_abstract(self):
+        """Test that a source must implement fetch"""
+        with pytest.raises(TypeError):
+            PriceSource("incomplete")
+    
+    def test_file_source_overlays_fallback(self, tmp_path):
+        """Test that file prices take priority and file changes are picked up"""
+        price_file = tmp_path / "prices.json"
+        write_prices(price_file, {'bitcoin': 50000.0})
+        file_source = FilePriceSource(str(price_file))
+        service = PriceOracleService([self.fallback, file_source])
+        service.start()
+        try:
+            snapshot = service.snapshot
+            assert snapshot.prices == {'bitcoin': 50000.0, 'ethereum': 3200.0}
+            assert snapshot.price_sources == {'bitcoin': 'file', 'ethereum': 'fallback'}
+            
+            write_prices(price_file, {'bitcoin': 51000.0})
+            assert service.refresh_source(file_source)
+            assert service.get_price('bitcoin') == 51000.0
+            assert service.snapshot.version > snapshot.version
+            assert snapshot.prices['bitcoin'] == 50000.0  # Published snapshots never change
+        finally:
+            service.stop()
+    
+    def test_stale_source_falls_back(self, tmp_path):
+        """Test that a failing source drops out once older than its max_age"""
+        price_file = tmp_path / "prices.json"
+        write_prices(price_file, {'bitcoin': 50000.0})
+        file_source = FilePriceSource(str(price_file), max_age=0.2)
+        service = PriceOracleService([self.fallback, file_source])
+        assert service.refresh_source(self.fallback)
+        assert service.refresh_source(file_source)
+        assert service.get_price('bitcoin') == 50000.0
+        
+        price_file.unlink()
+        assert not service.refresh_source(file_source)
+        assert service.get_price('bitcoin') == 50000.0  # Still within max_age
+        assert service.get_status()['sources']['file']['last_error']
+        
+        time.sleep(0.25)
+        assert service.get_price('bitcoin') == 45000.0
+        assert service.snapshot.price_sources['bitcoin'] == 'fallback'
+    
+    def test_add_source_replaces_same_name(self):
+        """Test that sources are unique by name and a replacement takes over its prices"""
+        service = PriceOracleService([self.fallback])
+        service.add_source(StaticPriceSource("override", {'bitcoin': 1.0}))
+        service.add_source(StaticPriceSource("override", {'bitcoin': 2.0}))
+        
+        assert [source.name for source in service.sources] == ["fallback", "override"]
+        assert service.get_price('bitcoin') == 2.0
+    
+    def test_remove_source_stops_its_thread(self):
+        """Test that a removed source stops refreshing and its prices drop out"""
+        fetched = threading.Event()
+        
+        def compute():
+            fetched.set()
+            return {'guard': 0.01}
+        
+        service = PriceOracleService([self.fallback, CallablePriceSource("guard", compute, interval=0.01)])
+        service.start()
+        thread = service.threads["guard"]
+        assert fetched.wait(1)
+        assert service.get_price('guard') == 0.01
+        
+        assert service.remove_source("guard")
+        thread.join(1)
+        assert not thread.is_alive()
+        assert service.get_price('guard') is None
+        assert service.get_price('bitcoin') == 45000.0
+        assert not service.remove_source("guard")
+    
+    def test_non_local_source_first_fetch_in_background(self):
+        """Test that start() does not wait for a non-local source's first fetch"""
+        release = threading.Event()
+        
+        def compute():
+            release.wait(1)
+            return {'guard': 0.01}
+        
+        service = PriceOracleService([self.fallback, CallablePriceSource("guard", compute, interval=60,
+                                                                         local=False)])
+        service.start()
+        try:
+            assert service.get_price('guard') is None
+            release.set()
+            deadline = time.time() + 1
+            while service.get_price('guard') is None and time.time() < deadline:
+                time.sleep(0.01)
+            assert service.get_price('guard') == 0.01
+        finally:
+            service.stop()
+    
+    def test_stop_and_restart(self):
+        """Test that stop ends every thread and start can resume refreshing"""
+        service = PriceOracleService([self.fallback, CallablePriceSource("guard", lambda: {'guard': 0.01},
+                                                                         interval=0.01)])
+        service.start()
+        threads = list(service.threads.values())
+        service.stop()
+        for thread in threads:
+            thread.join(1)
+            assert not thread.is_alive()
+        assert service.get_price('guard') == 0.01
+        
+        service.start()
+        assert service.threads["guard"].is_alive()
+        service.stop()
@@ -107,11 +107,14 @@ class TestRateLimiting:
         test_ip = "192.168.1.100"
         now = time.time()
         
-        # Add requests to simulate limit reached
-        middleware.clients[test_ip] = [now, now]
+        # Two requests fit in the window, the third is refused
+        assert middleware.store.hit(test_ip, middleware.calls, now)
+        assert middleware.store.hit(test_ip, middleware.calls, now)
+        assert not middleware.store.hit(test_ip, middleware.calls, now)
         
-        # Check that limit is reached
-        assert len(middleware.clients[test_ip]) >= middleware.calls
+        # Other clients are unaffected, and the limit recovers as the window slides
+        assert middleware.store.hit("192.168.1.101", middleware.calls, now)
+        assert middleware.store.hit(test_ip, middleware.calls, now + 2 * middleware.period)
 
 
 @pytest.mark.skipif(not API_AVAILABLE, reason="API modules not available")
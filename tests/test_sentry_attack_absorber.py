@@ -0,0 +1,129 @@
+"""
+test_sentry_attack_absorber.py: Tests for the GuardianShield Sentry attack absorber IP lists
+"""
+import ipaddress
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sentry_attack_absorber import IPPrefixTable, PatriciaTrie, SentryAttackAbsorber
+
+
+def brute_force_match(networks, ip):
+    """Value of the most specific network containing ip, by linear scan; later duplicates win"""
+    address = ipaddress.ip_address(ip)
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    best = None
+    for network, value in networks:
+        if address.version == network.version and address in network:
+            if best is None or network.prefixlen >= best[0].prefixlen:
+                best = (network, value)
+    return best[1] if best else None
+
+
+def random_networks(rng, version, count):
+    bits = 32 if version == 4 else 128
+    networks = []
+    for index in range(count):
+        prefix_len = rng.randint(0, bits)
+        address = ipaddress.ip_address(rng.getrandbits(bits)) if version == 6 else \
+            ipaddress.IPv4Address(rng.getrandbits(bits))
+        networks.append((ipaddress.ip_network(f"{address}/{prefix_len}", strict=False), index))
+    return networks
+
+
+class TestPatriciaTrie:
+    """Test suite for longest-prefix match over fixed-width keys"""
+    
+    def test_nested_prefixes(self):
+        """Test that the most specific of several nested prefixes wins"""
+        trie = PatriciaTrie(8)
+        trie.insert(0b10000000, 1, "half")
+        trie.insert(0b10100000, 3, "eighth")
+        trie.insert(0b10100110, 8, "host")
+        
+        assert trie.longest_match(0b10100110) == "host"
+        assert trie.longest_match(0b10100111) == "eighth"
+        assert trie.longest_match(0b11000000) == "half"
+        assert trie.longest_match(0b00000001) is None
+        assert trie.size == 3
+    
+    def test_reinsert_updates_value(self):
+        """Test that inserting an existing prefix replaces its value without growing the trie"""
+        trie = PatriciaTrie(32)
+        trie.insert(0x0a000000, 8, "old")
+        trie.insert(0x0a000000, 8, "new")
+        assert trie.longest_match(0x0a010203) == "new"
+        assert trie.size == 1
+    
+    def test_default_route(self):
+        """Test that a zero-length prefix matches every address"""
+        trie = PatriciaTrie(32)
+        trie.insert(0, 0, "default")
+        trie.insert(0xc0a80000, 16, "lan")
+        assert trie.longest_match(0x08080808) == "default"
+        assert trie.longest_match(0xc0a80101) == "lan"
+
+
+class TestIPPrefixTable:
+    """Test suite for the IPv4/IPv6 range tables"""
+    
+    def test_matches_brute_force(self):
+        """Test lookups against a linear containment scan over random ranges"""
+        rng = random.Random(1234)
+        networks = random_networks(rng, 4, 500) + random_networks(rng, 6, 200)
+        table = IPPrefixTable()
+        for network, value in networks:
+            table.add(str(network), value)
+        
+        probes = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(300)]
+        probes += [str(ipaddress.IPv6Address(rng.getrandbits(128))) for _ in range(100)]
+        # Addresses inside configured ranges, so most probes match something
+        probes += [str(network[rng.randrange(network.num_addresses)]) for network, _ in networks[::5]]
+        probes += [f"::ffff:{probe}" for probe in probes[:50]]
+        
+        for probe in probes:
+            assert table.lookup(probe) == brute_force_match(networks, probe), probe
+    
+    def test_invalid_input(self):
+        """Test that invalid ranges are counted and unparsable IPs do not match"""
+        table = IPPrefixTable()
+        assert table.bulk_load(["10.0.0.0/8", "not-a-range", "", "300.1.1.1/32", "2001:db8::/32"]) == 2
+        assert len(table) == 2
+        assert "10.1.2.3" in table
+        assert "2001:db8::1" in table
+        for ip in ("garbage", "10.1.2", "", None):
+            assert ip not in table
+
+
+class TestAbsorberIPLists:
+    """Test suite for compiled whitelist/blacklist loading and hot reload"""
+    
+    def test_feeds_and_hot_reload(self, tmp_path):
+        """Test that threat feeds load with comments and a changed feed is picked up"""
+        feed_path = tmp_path / "feed.txt"
+        feed_path.write_text("# threat feed\n203.0.113.0/24  # scanners\n\nbogus\n")
+        config_path = tmp_path / "attack-absorber.json"
+        config_path.write_text(json.dumps({
+            "whitelist_ips": ["127.0.0.1", "10.0.0.0/8"],
+            "blacklist_ips": ["198.51.100.7"],
+            "blacklist_feeds": [str(feed_path)]
+        }))
+        absorber = SentryAttackAbsorber(str(config_path))
+        
+        assert absorber.is_whitelisted("10.20.30.40")
+        assert not absorber.is_whitelisted("11.0.0.1")
+        assert absorber.is_blacklisted("198.51.100.7")
+        assert absorber.is_blacklisted("203.0.113.99")
+        assert not absorber.maybe_reload_ip_lists()
+        
+        feed_path.write_text("192.0.2.0/24\n")
+        stat = os.stat(feed_path)
+        os.utime(feed_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert absorber.maybe_reload_ip_lists()
+        assert absorber.is_blacklisted("192.0.2.1")
+        assert not absorber.is_blacklisted("203.0.113.99")
@@ -0,0 +1,309 @@
+"""
+test_sentry_rate_limiter.py: Tests for the GuardianShield Sentry rate limiter state handling
+"""
+import copy
+import json
+import time
+from unittest.mock import Mock
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sentry_rate_limiter import (
+    DEFAULT_CONFIG, LRUStateTable, RedisWriteBuffer, SentryRateLimiter, SlidingWindowCounter, SystemLoadSampler,
+    TokenBucket
+)
+
+
+def make_limiter(tmp_path, **overrides):
+    """Rate limiter with hot-path workers disabled and a mock Redis client"""
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config['hot_path']['background_load_sampling'] = False
+    config['hot_path']['batched_redis_writes'] = False
+    config.update(overrides)
+    config_path = tmp_path / "rate-limiter.json"
+    config_path.write_text(json.dumps(config))
+    return SentryRateLimiter(str(config_path), redis_client=Mock())
+
+
+class TestLRUStateTable:
+    """Test suite for the bounded LRU state table"""
+    
+    def test_evicts_least_recently_used(self):
+        """Test that reads refresh recency and the coldest key is evicted"""
+        table = LRUStateTable(2)
+        table['a'] = 1
+        table['b'] = 2
+        assert table['a'] == 1
+        table['c'] = 3
+        
+        assert 'b' not in table
+        assert list(table) == ['a', 'c']
+        assert table.evictions == 1
+    
+    def test_get_keeps_recency(self):
+        """Test that get() neither creates keys nor reorders the table"""
+        table = LRUStateTable(3, list)
+        table['a'].append(1)
+        table['b'].append(2)
+        assert table.get('a') == [1]
+        assert table.get('missing') is None
+        assert list(table) == ['a', 'b']
+
+
+class TestCleanupInactiveState:
+    """Test suite for periodic rate limiter maintenance"""
+    
+    def test_cleanup_with_several_endpoint_buckets(self, tmp_path):
+        """Test that idle endpoint buckets are dropped without mutating the table mid-walk"""
+        limiter = make_limiter(tmp_path)
+        now = time.time()
+        for index in range(4):
+            bucket = TokenBucket(10)
+            bucket.last_refill = now - 7200 if index % 2 == 0 else now
+            limiter.endpoint_buckets[f"10.0.0.{index}:/api/v1/blocks"] = bucket
+        
+        cleaned_ips, cleaned_endpoints = limiter.cleanup_inactive_state(now)
+        
+        assert cleaned_endpoints == 2
+        assert sorted(limiter.endpoint_buckets) == ["10.0.0.1:/api/v1/blocks", "10.0.0.3:/api/v1/blocks"]
+    
+    def test_cleanup_drops_idle_ip_buckets(self, tmp_path):
+        """Test that IP buckets are dropped by their own idle time, not by traffic history"""
+        limiter = make_limiter(tmp_path)
+        now = time.time()
+        for ip, idle in (("10.0.0.1", 7200), ("10.0.0.2", 0), ("10.0.0.3", 7200)):
+            bucket = TokenBucket(100)
+            bucket.last_refill = now - idle
+            limiter.ip_buckets[ip] = bucket
+        
+        cleaned_ips, _ = limiter.cleanup_inactive_state(now)
+        
+        assert cleaned_ips == 2
+        assert list(limiter.ip_buckets) == ["10.0.0.2"]
+        assert '10.0.0.1' not in limiter.traffic_patterns
+    
+    @pytest.mark.asyncio
+    async def test_evicted_traffic_history_keeps_bucket(self, tmp_path):
+        """Test that rotating IPs through traffic_patterns cannot reset an active IP's bucket"""
+        limiter = make_limiter(tmp_path, state_limits={
+            "max_ip_entries": 100, "max_endpoint_entries": 100, "max_tracked_ips": 2, "max_events_per_ip": 10
+        })
+        attacker = "198.51.100.1"
+        for _ in range(3):
+            assert await limiter.check_ip_rate_limit(attacker)
+            await limiter.record_request(attacker, "/", "GET")
+        for index in range(5):
+            await limiter.record_request(f"10.0.0.{index}", "/", "GET")
+        assert attacker not in limiter.traffic_patterns
+        
+        limiter.cleanup_inactive_state()
+        assert limiter.ip_buckets[attacker].tokens < limiter.ip_buckets[attacker].capacity
+    
+    @pytest.mark.asyncio
+    async def test_ip_statistics_flag_capped_history(self, tmp_path):
+        """Test that statistics say when the per-IP history cap truncated the counts"""
+        limiter = make_limiter(tmp_path, state_limits={
+            "max_ip_entries": 100, "max_endpoint_entries": 100, "max_tracked_ips": 10, "max_events_per_ip": 5
+        })
+        for _ in range(3):
+            await limiter.record_request("10.0.0.1", "/", "GET")
+        assert not limiter.get_ip_statistics("10.0.0.1")['history_capped']
+        
+        for _ in range(4):
+            await limiter.record_request("10.0.0.1", "/", "GET")
+        stats = limiter.get_ip_statistics("10.0.0.1")
+        assert stats['requests_last_minute'] == 5
+        assert stats['history_capped']
+        assert not limiter.get_ip_statistics("10.0.0.9")['history_capped']
+
+
+class TestSlidingWindowCounter:
+    """Test suite for the bucketed sliding window"""
+    
+    def test_count_matches_timestamp_window(self):
+        """Test that the count covers the window less at most one bucket of its oldest requests"""
+        counter = SlidingWindowCounter(60, buckets=10)
+        timestamps = []
+        for step in range(400):
+            now = 1000.0 + step * 0.7
+            timestamps.append(now)
+            counter.add(now)
+            newest = sum(1 for t in timestamps if t > now - 54)
+            window = sum(1 for t in timestamps if t >= now - 60)
+            assert newest <= counter.count(now) <= window
+    
+    def test_idle_window_resets(self):
+        """Test that a gap longer than the window clears every bucket"""
+        counter = SlidingWindowCounter(10, buckets=5)
+        assert counter.add(100.0, amount=7) == 7
+        assert counter.count(105.0) == 7
+        assert counter.count(111.0) == 0
+        assert counter.add(500.0) == 1
+    
+    def test_late_timestamp_counts_in_current_bucket(self):
+        """Test that a slightly out-of-order request does not rewind the window"""
+        counter = SlidingWindowCounter(10, buckets=5)
+        counter.add(100.0)
+        assert counter.add(99.0) == 2
+        assert counter.head_slot == 50
+
+
+class TestBurstDetection:
+    """Test suite for burst detection and penalties"""
+    
+    @pytest.mark.asyncio
+    async def test_burst_applies_local_penalty(self, tmp_path):
+        """Test that exceeding the burst threshold penalises the IP until it expires"""
+        burst_config = dict(DEFAULT_CONFIG['burst_detection'], window_seconds=1, threshold_multiplier=1)
+        ip_limits = dict(DEFAULT_CONFIG['ip_limits'], default_requests_per_second=3)
+        limiter = make_limiter(tmp_path, burst_detection=burst_config, ip_limits=ip_limits)
+        ip = "198.51.100.7"
+        
+        results = [await limiter.detect_burst_traffic(ip, "/api/v1/blocks") for _ in range(4)]
+        assert results == [False, False, False, True]
+        limiter.redis_client.setex.assert_called_once_with(f"burst_penalty:{ip}", 300, "penalized")
+        
+        # Rejected from local state while the penalty lasts
+        limiter.redis_client.reset_mock()
+        assert await limiter.detect_burst_traffic(ip, "/api/v1/blocks")
+        limiter.redis_client.setex.assert_not_called()
+        
+        limiter.burst_penalties[ip] = time.time() - 1
+        limiter.burst_detection[ip] = SlidingWindowCounter(1)
+        assert not await limiter.detect_burst_traffic(ip, "/api/v1/blocks")
+        assert ip not in limiter.burst_penalties
+        assert limiter.get_ip_statistics(ip)['burst_detections'] == 1
+
+
+class TestSystemLoadSampler:
+    """Test suite for the background system load sampler"""
+    
+    def test_sample_publishes_load_factor(self):
+        """Test that a sample publishes a load factor between zero and one"""
+        sampler = SystemLoadSampler()
+        sampler.sample()
+        assert sampler.samples == 1
+        assert 0.0 <= sampler.load_factor <= 1.0
+    
+    def test_start_and_stop(self):
+        """Test that the sampler thread samples until stopped"""
+        sampler = SystemLoadSampler(interval_ms=10)
+        sampler.start()
+        deadline = time.time() + 2
+        while sampler.samples < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        sampler.stop()
+        
+        assert sampler.samples >= 2
+        assert not sampler._thread.is_alive()
+    
+    @pytest.mark.asyncio
+    async def test_adaptive_limits_read_sampled_load(self, tmp_path):
+        """Test that adaptive limits use the published load instead of sampling per request"""
+        limiter = make_limiter(tmp_path)
+        limiter.load_sampler = Mock(load_factor=0.95)
+        limiter.ip_buckets["203.0.113.5"] = TokenBucket(100)
+        
+        assert await limiter.check_adaptive_limits("203.0.113.5")
+        assert limiter.ip_buckets["203.0.113.5"].capacity == 50
+        
+        limiter.load_sampler.load_factor = 0.1
+        assert not await limiter.check_adaptive_limits("203.0.113.5")
+
+
+class TestHotPathWorkers:
+    """Test suite for starting and stopping the limiter's background workers"""
+    
+    def test_constructor_starts_no_threads(self, tmp_path):
+        """Test that workers run only between start() and stop()"""
+        config_path = tmp_path / "rate-limiter.json"
+        config_path.write_text(json.dumps(DEFAULT_CONFIG))
+        limiter = SentryRateLimiter(str(config_path), redis_client=Mock())
+        assert limiter.load_sampler is None
+        assert limiter.redis_buffer is None
+        
+        limiter.start()
+        try:
+            assert limiter.load_sampler._thread.is_alive()
+            assert limiter.redis_buffer._thread.is_alive()
+            threads = (limiter.load_sampler._thread, limiter.redis_buffer._thread)
+        finally:
+            limiter.stop()
+        assert not any(thread.is_alive() for thread in threads)
+        assert limiter.load_sampler is None
+        assert limiter.redis_buffer is None
+    
+    def test_start_respects_hot_path_config(self, tmp_path):
+        """Test that disabled workers are not created by start()"""
+        limiter = make_limiter(tmp_path)
+        limiter.start()
+        assert limiter.load_sampler is None
+        assert limiter.redis_buffer is None
+
+
+class TestRedisWriteBuffer:
+    """Test suite for batched Redis statistics writes"""
+    
+    def test_flush_aggregates_into_one_pipeline(self):
+        """Test that repeated writes to a key become one command per key"""
+        redis_client = Mock()
+        pipe = redis_client.pipeline.return_value
+        buffer = RedisWriteBuffer(redis_client)
+        for _ in range(5):
+            buffer.incr("traffic_stats:10.0.0.1:1", ttl=3600)
+        buffer.lpush("rate_limit_violations", "a", ttl=86400)
+        buffer.lpush("rate_limit_violations", "b", ttl=86400)
+        
+        assert buffer.flush() == 7
+        
+        redis_client.pipeline.assert_called_once_with(transaction=False)
+        pipe.incrby.assert_called_once_with("traffic_stats:10.0.0.1:1", 5)
+        pipe.lpush.assert_called_once_with("rate_limit_violations", "a", "b")
+        assert pipe.expire.call_count == 2
+        pipe.execute.assert_called_once_with()
+        assert buffer.stats['commands_sent'] == 4
+        assert buffer.flush() == 0
+    
+    def test_flush_error_drops_batch(self):
+        """Test that a failed pipeline is counted and does not raise"""
+        redis_client = Mock()
+        redis_client.pipeline.return_value.execute.side_effect = ConnectionError("redis down")
+        buffer = RedisWriteBuffer(redis_client)
+        buffer.incr("a")
+        buffer.incr("b")
+        
+        assert buffer.flush() == 2
+        assert buffer.stats['flush_errors'] == 1
+        assert buffer.stats['dropped_writes'] == 2
+        assert buffer.pending_writes == 0
+    
+    def test_full_buffer_wakes_flusher(self):
+        """Test that reaching max_pending flushes before the interval elapses"""
+        redis_client = Mock()
+        buffer = RedisWriteBuffer(redis_client, flush_interval_ms=60000, max_pending=3)
+        buffer.start()
+        try:
+            for _ in range(3):
+                buffer.incr("a")
+            deadline = time.time() + 2
+            while buffer.stats['flushes'] < 1 and time.time() < deadline:
+                time.sleep(0.01)
+            assert buffer.stats['flushes'] == 1
+        finally:
+            buffer.stop()
+    
+    @pytest.mark.asyncio
+    async def test_limiter_buffers_statistics(self, tmp_path):
+        """Test that request statistics go through the buffer, not one Redis call each"""
+        limiter = make_limiter(tmp_path)
+        limiter.redis_buffer = RedisWriteBuffer(limiter.redis_client)
+        for _ in range(3):
+            await limiter.record_request("10.0.0.1", "/api/v1/blocks", "GET")
+        
+        limiter.redis_client.incr.assert_not_called()
+        assert limiter.redis_buffer.pending_writes == 3
+        assert len(limiter.redis_buffer.pending_counts) == 1
@@ -0,0 +1,122 @@
+"""
+test_staking_pool_system.py: Tests for staking reward accumulators in the advanced staking pool system
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import advanced_staking_pool_system as staking
+from advanced_staking_pool_system import AdvancedStakingPoolSystem, StakeStatus, StakingType
+
+START = datetime(2026, 1, 1)
+
+
+class FrozenDatetime(datetime):
+    """datetime whose now() only moves when a test advances it"""
+    current = START
+    
+    @classmethod
+    def now(cls, tz=None):
+        return cls.current
+
+
+def advance(days):
+    FrozenDatetime.current += timedelta(days=days)
+
+
+def per_position_reward(amount, apy, multiplier, days, token_count):
+    """Reward per token from the per-position APY formula the accumulators replace"""
+    seconds = Decimal(days * 24 * 3600)
+    return amount * apy * multiplier * seconds / staking.SECONDS_PER_YEAR / token_count
+
+
+def assert_close(actual, expected):
+    assert abs(actual - expected) <= Decimal('1e-15') * max(abs(expected), 1)
+
+
+class TestStakingRewardAccumulators:
+    """Test suite for reward-per-share accrual"""
+    
+    @pytest.fixture(autouse=True)
+    def setup_system(self, tmp_path, monkeypatch):
+        """Setup test environment with a frozen clock and a throwaway database"""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(staking, 'datetime', FrozenDatetime)
+        FrozenDatetime.current = START
+        self.system = AdvancedStakingPoolSystem()
+        self.apy = Decimal('0.12')
+        self.system.create_staking_pool("flex", "Flexible", "GUARD", ["GUARD", "ETH"],
+                                        StakingType.FLEXIBLE, self.apy)
+        self.system.create_staking_pool("gov", "Governance", "GUARD", ["GUARD"],
+                                        StakingType.GOVERNANCE, self.apy)
+    
+    def test_single_staker_matches_per_position_formula(self):
+        """Test APY accrual against the old per-position formula"""
+        position = self.system.stake_tokens("flex", "0xalice", Decimal('1000'))
+        advance(30)
+        
+        pending = self.system._calculate_pending_rewards(position.stake_id)
+        expected = per_position_reward(Decimal('1000'), self.apy, position.multiplier, 30, 2)
+        assert set(pending) == {"GUARD", "ETH"}
+        for token in pending:
+            assert_close(pending[token], expected)
+    
+    def test_stakers_joining_and_leaving(self):
+        """Test that each position earns only for the time and amount it was staked"""
+        alice = self.system.stake_tokens("flex", "0xalice", Decimal('1000'))
+        advance(10)
+        bob = self.system.stake_tokens("flex", "0xbob", Decimal('3000'))
+        advance(20)
+        self.system.unstake_tokens(alice.stake_id, Decimal('400'))
+        advance(5)
+        
+        expected_alice = (per_position_reward(Decimal('1000'), self.apy, alice.multiplier, 30, 2)
+                          + per_position_reward(Decimal('600'), self.apy, alice.multiplier, 5, 2))
+        expected_bob = per_position_reward(Decimal('3000'), self.apy, bob.multiplier, 25, 2)
+        assert_close(self.system._calculate_pending_rewards(alice.stake_id)["GUARD"], expected_alice)
+        assert_close(self.system._calculate_pending_rewards(bob.stake_id)["ETH"], expected_bob)
+    
+    def test_claim_pays_out_once(self):
+        """Test that claiming moves pending rewards into accumulated rewards"""
+        position = self.system.stake_tokens("flex", "0xalice", Decimal('1000'))
+        advance(7)
+        expected = per_position_reward(Decimal('1000'), self.apy, position.multiplier, 7, 2)
+        
+        claimed = self.system.claim_rewards(position.stake_id)
+        assert_close(claimed["GUARD"], expected)
+        assert position.accumulated_rewards == claimed
+        assert self.system._calculate_pending_rewards(position.stake_id)["GUARD"] == 0
+        assert self.system.claim_rewards(position.stake_id) == {}
+    
+    def test_distribute_rewards_pro_rata(self):
+        """Test that an epoch is split by weight and later stakers get none of it"""
+        alice = self.system.stake_tokens("flex", "0xalice", Decimal('1000'))
+        bob = self.system.stake_tokens("flex", "0xbob", Decimal('3000'))
+        self.system.distribute_rewards("flex", "ETH", Decimal('100'))
+        carol = self.system.stake_tokens("flex", "0xcarol", Decimal('5000'))
+        
+        assert_close(self.system._calculate_pending_rewards(alice.stake_id)["ETH"], Decimal('25'))
+        assert_close(self.system._calculate_pending_rewards(bob.stake_id)["ETH"], Decimal('75'))
+        assert self.system._calculate_pending_rewards(carol.stake_id)["ETH"] == 0
+        
+        with pytest.raises(ValueError):
+            self.system.distribute_rewards("flex", "BTC", Decimal('1'))
+        with pytest.raises(ValueError):
+            self.system.distribute_rewards("gov", "GUARD", Decimal('1'))
+    
+    def test_governance_power_index(self):
+        """Test that indexed governance power follows stakes and withdrawals"""
+        first = self.system.stake_tokens("gov", "0xalice", Decimal('1000'))
+        self.system.stake_tokens("gov", "0xbob", Decimal('500'))
+        assert self.system._get_user_governance_power("0xalice") == first.governance_power
+        
+        self.system.unstake_tokens(first.stake_id)
+        assert first.status == StakeStatus.WITHDRAWN
+        assert self.system._get_user_governance_power("0xalice") == 0
+        assert self.system._get_user_governance_power("0xbob") == Decimal('500') * Decimal('1.2')
+        assert [p['stake_id'] for p in self.system.get_user_positions("0xalice")] == [first.stake_id]